@@ -0,0 +1,72 @@
+import numpy as np
+from django.conf import settings
+from ai_models.models import FacialEmbedding
+
+EMBEDDING_DTYPES = ('float32', 'float16')
+
+
+def storage_dtype():
+    dtype = getattr(settings, 'FACE_EMBEDDING_DTYPE', 'float32')
+    if dtype not in EMBEDDING_DTYPES:
+        raise ValueError(f"Unsupported embedding dtype {dtype}, use one of {EMBEDDING_DTYPES}")
+    return dtype
+
+
+def pack_embedding(vector, dtype=None):
+    """(bytes, dtype name) for a single embedding, flattened to 1-D"""
+    dtype = dtype or storage_dtype()
+    return np.asarray(vector, dtype=dtype).reshape(-1).tobytes(), dtype
+
+
+def unpack_embedding(blob, dtype='float32'):
+    return np.frombuffer(blob, dtype=dtype).astype(np.float32)
+
+
+def embedding_fields(vector, dtype=None):
+    """Model field values for storing an embedding in the binary format"""
+    blob, dtype = pack_embedding(vector, dtype)
+    return {'embedding_blob': blob, 'embedding_dtype': dtype, 'embedding_vector': None}
+
+
+def instance_embedding(embedding):
+    """The float32 vector of a FacialEmbedding, whichever column it is stored in"""
+    if embedding.embedding_blob is not None:
+        return unpack_embedding(bytes(embedding.embedding_blob), embedding.embedding_dtype or 'float32')
+    return np.asarray(embedding.embedding_vector, dtype=np.float32).reshape(-1)
+
+
+def load_owner_embeddings(owner_id, ids=None):
+    """
+    An owner's embeddings (optionally only the given ids) as one (N, D) float32
+    matrix, plus the username and id of each row. Binary rows of the same dtype
+    are joined into a single buffer and decoded with one np.frombuffer call;
+    rows not yet backfilled from the old JSON column are decoded individually.
+    """
+    rows = FacialEmbedding.objects.filter(user_id=owner_id)
+    if ids is not None:
+        rows = rows.filter(id__in=ids)
+    rows = rows.values_list('id', 'embedding_blob', 'embedding_dtype', 'embedding_vector', 'user__username')
+
+    blobs = {}
+    legacy = []
+    for row_id, blob, dtype, vector, username in rows:
+        if blob is not None:
+            chunks, keys = blobs.setdefault(dtype or 'float32', ([], []))
+            chunks.append(blob)
+            keys.append((username, row_id))
+        elif vector is not None:
+            legacy.append((vector, (username, row_id)))
+
+    matrices = []
+    keys = []
+    for dtype, (chunks, dtype_keys) in blobs.items():
+        matrix = np.frombuffer(b''.join(chunks), dtype=dtype).reshape(len(chunks), -1)
+        matrices.append(matrix.astype(np.float32))
+        keys.extend(dtype_keys)
+    if legacy:
+        matrices.append(np.array([np.asarray(vector, dtype=np.float32).reshape(-1) for vector, _ in legacy]))
+        keys.extend(key for _, key in legacy)
+
+    if not matrices:
+        return np.empty((0, 512), dtype=np.float32), [], []
+    return np.concatenate(matrices), [username for username, _ in keys], [row_id for _, row_id in keys]
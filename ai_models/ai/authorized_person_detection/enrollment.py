@@ -0,0 +1,142 @@
+import io
+import os
+import zipfile
+import cv2
+import numpy as np
+from ai_models.ai.model_registry import get_facenet_model, get_yolo_model, inference_lock, get_device, FACE_DETECTION_WEIGHTS
+from ai_models.ai.pipeline.preprocess import prepare_batch
+from .gallery import normalize
+from .model import RECOGNITION_THRESHOLD
+from .utils import embed_faces, face_quality
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+
+
+def read_archive(archive, max_images):
+    """(name, bytes) for every image in a zip archive, skipping directories and other files"""
+    images = []
+    with zipfile.ZipFile(archive) as zf:
+        for info in zf.infolist():
+            if info.is_dir() or not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            if os.path.basename(info.filename).startswith('.'):
+                continue  # macOS resource forks and other hidden files
+            if len(images) >= max_images:
+                raise ValueError(f"Too many images, at most {max_images} can be enrolled at once")
+            if info.file_size > MAX_IMAGE_BYTES:
+                images.append((info.filename, None))
+                continue
+            images.append((info.filename, zf.read(info)))
+    return images
+
+
+def cluster_embeddings(embeddings, threshold=RECOGNITION_THRESHOLD):
+    """
+    Greedily group normalized embeddings whose cosine similarity to a cluster's
+    mean is above the recognition threshold. Returns a cluster index per row and
+    the normalized mean of each cluster.
+    """
+    assignments = np.empty(len(embeddings), dtype=np.int64)
+    sums = []
+    centers = np.empty((0, embeddings.shape[1]), dtype=np.float32)
+    for i, embedding in enumerate(embeddings):
+        if len(centers):
+            similarities = centers @ embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] > threshold:
+                assignments[i] = best
+                sums[best] = sums[best] + embedding
+                centers[best] = normalize(sums[best])[0]
+                continue
+        assignments[i] = len(sums)
+        sums.append(embedding.copy())
+        centers = np.vstack([centers, embedding])
+    return assignments, centers
+
+
+class BulkEnroller:
+    """
+    Enrolls faces from many images at once: decodes every image, runs the face
+    detector over them in batches, keeps the best usable face per image, embeds
+    all kept faces in batched FaceNet passes and reduces them to one averaged
+    embedding per cluster of similar faces.
+    """
+
+    def __init__(self, detect_batch_size=16, embed_batch_size=32):
+        self.device = get_device()
+        self.detector = get_yolo_model(FACE_DETECTION_WEIGHTS)
+        self.face_recognizer = get_facenet_model()
+        self.detect_batch_size = detect_batch_size
+        self.embed_batch_size = embed_batch_size
+
+    def enroll(self, images):
+        """
+        images: list of (name, encoded bytes or None). Returns (outcomes, representative
+        embeddings) where outcomes has one dict per image in input order.
+        """
+        outcomes = [{'image': name, 'status': 'pending'} for name, _ in images]
+        decoded = []
+        for i, (_, data) in enumerate(images):
+            image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR) if data else None
+            if image is None:
+                outcomes[i]['status'] = 'unreadable'
+            else:
+                decoded.append((i, image))
+
+        faces = []
+        for start in range(0, len(decoded), self.detect_batch_size):
+            chunk = decoded[start:start + self.detect_batch_size]
+            for (i, image), detections in zip(chunk, self.detect([image for _, image in chunk])):
+                face = self.best_face(image, detections)
+                if face is None:
+                    outcomes[i]['status'] = 'no_face' if len(detections) == 0 else 'unusable_face'
+                else:
+                    faces.append((i, face))
+
+        if not faces:
+            return outcomes, np.empty((0, 512), dtype=np.float32)
+
+        embeddings = normalize(embed_faces([face for _, face in faces], self.face_recognizer, self.device, self.embed_batch_size))
+        assignments, centers = cluster_embeddings(embeddings)
+        for (i, _), cluster in zip(faces, assignments):
+            outcomes[i]['status'] = 'enrolled'
+            outcomes[i]['cluster'] = int(cluster)
+        return outcomes, centers
+
+    def detect(self, images):
+        """(N, 5) boxes with confidence for each image, from one forward pass"""
+        batch = prepare_batch(images, self.device)
+        with inference_lock(self.detector):
+            results = self.detector.predict(batch.tensor, verbose=False)
+        detections = []
+        for i, result in enumerate(results):
+            boxes = batch.scale_boxes(i, result.boxes.xyxy.cpu().numpy())
+            confs = result.boxes.conf.cpu().numpy().reshape(-1, 1)
+            detections.append(np.hstack([boxes, confs]))
+        return detections
+
+    def best_face(self, image, detections):
+        """The crop of the highest quality usable face, or None"""
+        best, best_quality = None, 0.0
+        for x1, y1, x2, y2, conf in detections:
+            x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+            quality = face_quality(x1, y1, x2, y2, image, float(conf))
+            if quality > best_quality:
+                best, best_quality = image[y1:y2, x1:x2], quality
+        return best
+
+
+def images_from_request(files, max_images):
+    """(name, bytes) pairs from uploaded 'images' files and/or 'archive' zips"""
+    images = []
+    for upload in files.getlist('images'):
+        images.append((upload.name, upload.read() if upload.size <= MAX_IMAGE_BYTES else None))
+    for upload in files.getlist('archive'):
+        try:
+            images.extend(read_archive(io.BytesIO(upload.read()), max_images - len(images)))
+        except zipfile.BadZipFile:
+            raise ValueError(f"{upload.name} is not a zip archive")
+    if len(images) > max_images:
+        raise ValueError(f"Too many images, at most {max_images} can be enrolled at once")
+    return images
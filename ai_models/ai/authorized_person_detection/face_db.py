@@ -0,0 +1,146 @@
+import json
+import os
+import pickle
+import zlib
+import numpy as np
+from .gallery import EmbeddingGallery, normalize
+from .index import ExactIndex
+
+FACE_DB_FORMAT = 'face-db'
+FACE_DB_VERSION = 1
+EMBEDDINGS_FILE = 'embeddings.f32'
+TABLE_FILE = 'people.json'
+# A table can name an embeddings file that a concurrent write has just removed
+LOAD_RETRIES = 3
+
+
+class FaceDatabase:
+    """
+    Enrolled faces stored as a directory holding a flat, L2-normalized float32
+    matrix (embeddings.f32) and a JSON table of person ids and names
+    (people.json). Loading memory-maps the matrix read-only, so it takes the same
+    time for any number of people and worker processes share the same pages.
+
+    The table names the matrix file it belongs to along with its row count and
+    checksum. Each write puts the matrix in a new file named after its checksum
+    and then replaces the table, so the table is the single point where a new
+    version becomes visible and a reader never pairs a matrix with another
+    version's names.
+    """
+
+    def __init__(self, embeddings, ids, names, checksum=None):
+        self.embeddings = embeddings
+        self.ids = ids
+        self.names = names
+        self.checksum = checksum
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def load(cls, path):
+        for attempt in range(LOAD_RETRIES):
+            try:
+                return cls._load(path)
+            except FileNotFoundError:
+                # The matrix the table named was replaced by a newer write; read the new table
+                if attempt == LOAD_RETRIES - 1 or not os.path.exists(os.path.join(path, TABLE_FILE)):
+                    raise
+
+    @classmethod
+    def _load(cls, path):
+        with open(os.path.join(path, TABLE_FILE)) as f:
+            table = json.load(f)
+        if table.get('format') != FACE_DB_FORMAT or table.get('version') != FACE_DB_VERSION:
+            raise ValueError(f"{path} is not a version {FACE_DB_VERSION} face database")
+
+        count, dim = table['count'], table['dim']
+        if count != len(table['people']):
+            raise ValueError(f"{path}: table lists {len(table['people'])} people for {count} embeddings")
+        embeddings_path = os.path.join(path, table.get('embeddings', EMBEDDINGS_FILE))
+        if count:
+            # Cheap O(1) guard against a matrix of the wrong shape; the checksum is checked by verify()
+            size = os.path.getsize(embeddings_path)
+            if size != count * dim * 4:
+                raise ValueError(f"{embeddings_path} holds {size} bytes, expected {count} x {dim} float32")
+            embeddings = np.memmap(embeddings_path, dtype=np.float32, mode='r', shape=(count, dim))
+        else:
+            embeddings = np.empty((0, dim), dtype=np.float32)
+        people = table['people']
+        return cls(embeddings, [person['id'] for person in people], [person['name'] for person in people], table.get('checksum'))
+
+    def verify(self):
+        """Whether the matrix matches the checksum its table recorded (reads the whole matrix)"""
+        return self.checksum is None or embeddings_checksum(self.embeddings) == self.checksum
+
+    def gallery(self):
+        """An exact-search gallery over the memory-mapped matrix, without copying it"""
+        index = ExactIndex(dim=self.embeddings.shape[1])
+        index.vectors = self.embeddings
+        gallery = EmbeddingGallery(index=index)
+        gallery.labels = list(self.names)
+        gallery.ids = list(self.ids)
+        return gallery
+
+    def as_dict(self):
+        """The {person id: {"name", "embedding"}} mapping face_db.pkl used to hold (rows are views, not copies)"""
+        return {
+            person_id: {"name": name, "embedding": self.embeddings[i]}
+            for i, (person_id, name) in enumerate(zip(self.ids, self.names))
+        }
+
+
+def embeddings_checksum(embeddings):
+    return f"{zlib.crc32(np.ascontiguousarray(embeddings, dtype=np.float32).tobytes()):08x}"
+
+
+def write_face_db(path, ids, names, embeddings):
+    """
+    Write a face database directory. The matrix goes to a new file and the
+    table is swapped in last with a single os.replace, so readers see either
+    the old version or the new one, never a mix.
+    """
+    embeddings = normalize(embeddings)
+    if len(embeddings) != len(ids) or len(ids) != len(names):
+        raise ValueError("Expected one id and one name per embedding")
+
+    os.makedirs(path, exist_ok=True)
+    checksum = embeddings_checksum(embeddings)
+    embeddings_file = f"embeddings.{checksum}.f32"
+    embeddings_path = os.path.join(path, embeddings_file)
+    table_path = os.path.join(path, TABLE_FILE)
+
+    embeddings.tofile(embeddings_path + '.tmp')
+    os.replace(embeddings_path + '.tmp', embeddings_path)
+    with open(table_path + '.tmp', 'w') as f:
+        json.dump({
+            'format': FACE_DB_FORMAT,
+            'version': FACE_DB_VERSION,
+            'dtype': 'float32',
+            'count': len(ids),
+            'dim': int(embeddings.shape[1]),
+            'embeddings': embeddings_file,
+            'checksum': checksum,
+            'people': [{'id': str(person_id), 'name': name} for person_id, name in zip(ids, names)],
+        }, f, indent=2)
+        f.write('\n')
+    os.replace(table_path + '.tmp', table_path)
+
+    # Matrices of earlier versions; a reader still holding one keeps its mapping, and
+    # one that read the old table just before the swap retries with the new one
+    for name in os.listdir(path):
+        if name.startswith('embeddings') and name.endswith('.f32') and name != embeddings_file:
+            os.remove(os.path.join(path, name))
+
+
+def convert_pickle_face_db(pickle_path, path):
+    """Convert a legacy face_db.pkl ({person id: {"name", "embedding"}}) to the face database format"""
+    # Only ever unpickle a trusted file: unpickling can run arbitrary code
+    with open(pickle_path, 'rb') as f:
+        database = pickle.load(f)
+
+    ids = list(database.keys())
+    names = [database[person_id]['name'] for person_id in ids]
+    embeddings = np.array([np.asarray(database[person_id]['embedding'], dtype=np.float32).reshape(-1) for person_id in ids])
+    write_face_db(path, ids, names, embeddings)
+    return len(ids)
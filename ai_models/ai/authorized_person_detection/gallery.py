@@ -0,0 +1,116 @@
+import json
+import os
+import numpy as np
+from django.conf import settings
+from .index import ExactIndex, IVFIndex, load_index
+
+
+def normalize(embeddings):
+    """L2-normalize a (N, D) array of embeddings as contiguous float32"""
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if embeddings.ndim != 2:
+        # A single vector, or stored vectors that kept their (1, D) batch axis
+        embeddings = embeddings.reshape(-1, embeddings.shape[-1])
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+
+def distance_to_similarity(distance):
+    """Cosine similarity equivalent to a Euclidean distance between unit vectors"""
+    return 1.0 - (distance ** 2) / 2.0
+
+
+class EmbeddingGallery:
+    """
+    Enrolled face embeddings as L2-normalized float32 vectors with a label (and
+    optionally a database id) per row. Searching goes through a pluggable index:
+    ExactIndex scores a batch of query faces with a single matrix multiply,
+    IVFIndex only scores the clusters closest to each query.
+    """
+
+    def __init__(self, embeddings=None, labels=None, dim=512, index=None, ids=None):
+        self.index = index if index is not None else ExactIndex(dim)
+        self.labels = []
+        self.ids = []
+        if embeddings is not None and len(embeddings):
+            self.add(embeddings, labels, ids)
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def dim(self):
+        return self.index.dim
+
+    def add(self, embeddings, labels, ids=None):
+        embeddings = normalize(embeddings)
+        if len(embeddings) != len(labels):
+            raise ValueError("Expected one label per embedding")
+        # Labels first: a concurrent search must never see a row without one
+        self.labels.extend(labels)
+        self.ids.extend(ids if ids is not None else [None] * len(labels))
+        self.index.add(embeddings)
+
+    def copy(self):
+        """A gallery that shares this one's saved vectors but can be added to independently"""
+        gallery = EmbeddingGallery(index=self.index.copy())
+        gallery.labels = list(self.labels)
+        gallery.ids = list(self.ids)
+        return gallery
+
+    def search(self, queries, k=1):
+        """Top-k (indices, similarities) for each query row, best first; both shaped (Q, k)"""
+        return self.index.search(normalize(queries), k)
+
+    def identify(self, queries, threshold, unknown="Unknown"):
+        """Best label for each query, or `unknown` when its similarity is not above the threshold"""
+        indices, similarities = self.search(queries, k=1)
+        names = []
+        for row_indices, row_similarities in zip(indices, similarities):
+            if len(row_indices) and row_similarities[0] > threshold:
+                names.append(self.labels[row_indices[0]])
+            else:
+                names.append(unknown)
+        return names
+
+    def save(self, path):
+        """Persist the index and its labels to a directory (see load)"""
+        self.index.save(path)
+        with open(os.path.join(path, 'labels.json'), 'w') as f:
+            json.dump({'labels': self.labels, 'ids': [str(i) if i is not None else None for i in self.ids]}, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load a saved gallery; with mmap the vectors stay on disk and are shared between processes"""
+        gallery = cls(index=load_index(path, mmap=mmap))
+        with open(os.path.join(path, 'labels.json')) as f:
+            table = json.load(f)
+        gallery.labels = table['labels']
+        gallery.ids = table['ids']
+        return gallery
+
+
+def build_gallery(embeddings, labels, ids=None, kind=None):
+    """
+    A gallery with the index type from FACE_GALLERY_INDEX: 'exact', 'ivf', or
+    'auto' to switch to IVF once the gallery is large enough to benefit.
+    """
+    kind = kind or getattr(settings, 'FACE_GALLERY_INDEX', 'auto')
+    embeddings = normalize(embeddings)
+    if kind == 'auto':
+        kind = 'ivf' if len(embeddings) >= getattr(settings, 'FACE_GALLERY_IVF_MIN_SIZE', 2048) else 'exact'
+
+    if kind == 'ivf':
+        # Around 4 * sqrt(n) clusters keeps both the centroid scan and the probed lists small
+        index = IVFIndex(
+            dim=embeddings.shape[1],
+            nlist=max(1, int(4 * np.sqrt(len(embeddings)))),
+            nprobe=getattr(settings, 'FACE_GALLERY_IVF_NPROBE', 8)
+        ).build(embeddings)
+        gallery = EmbeddingGallery(index=index)
+        gallery.labels = list(labels)
+        gallery.ids = list(ids) if ids is not None else [None] * len(labels)
+        return gallery
+
+    return EmbeddingGallery(embeddings, list(labels), dim=embeddings.shape[1], ids=ids)
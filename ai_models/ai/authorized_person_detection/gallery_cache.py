@@ -0,0 +1,119 @@
+import os
+import threading
+from django.conf import settings
+from ai_models.models import FacialEmbedding
+from .embedding_store import load_owner_embeddings, instance_embedding
+from .gallery import EmbeddingGallery, build_gallery
+
+
+def gallery_index_path(owner_id):
+    """Where build_face_index saves an owner's gallery, or None if indexes aren't persisted"""
+    index_dir = getattr(settings, 'FACE_GALLERY_INDEX_DIR', None)
+    return os.path.join(index_dir, str(owner_id)) if index_dir else None
+
+
+class GalleryCache:
+    """
+    One EmbeddingGallery per owner, built from a single query the first time it
+    is needed and shared by every recognition stream of that owner. A gallery
+    saved by build_face_index is memory-mapped instead and topped up with any
+    embeddings created since. New embeddings are added to the cached gallery;
+    other changes invalidate it (see signals.py). Running FaceRecognitionSystems
+    notice the new version and swap it in.
+    """
+
+    def __init__(self):
+        self.galleries = {}
+        self.versions = {}
+        self.lock = threading.Lock()
+        self.build_locks = {}
+
+        # Stats
+        self.builds = 0
+        self.invalidations = 0
+
+    def version(self, owner_id):
+        return self.versions.get(owner_id, 0)
+
+    def get(self, owner_id):
+        """(gallery, version) for an owner"""
+        with self.lock:
+            entry = self.galleries.get(owner_id)
+            if entry is not None:
+                return entry
+            build_lock = self.build_locks.setdefault(owner_id, threading.Lock())
+
+        with build_lock:
+            with self.lock:
+                entry = self.galleries.get(owner_id)
+                version = self.versions.get(owner_id, 0)
+            if entry is not None:
+                return entry
+
+            gallery = self.build(owner_id)
+            with self.lock:
+                # Don't keep a gallery that was invalidated while it was being built
+                if self.versions.get(owner_id, 0) == version:
+                    self.galleries[owner_id] = (gallery, version)
+                self.builds += 1
+            return gallery, version
+
+    def build(self, owner_id):
+        path = gallery_index_path(owner_id)
+        if path and os.path.exists(os.path.join(path, 'index.json')):
+            gallery = self.load_saved(owner_id, path)
+            if gallery is not None:
+                return gallery
+
+        embeddings, usernames, ids = load_owner_embeddings(owner_id)
+        if not usernames:
+            return EmbeddingGallery()
+        return build_gallery(embeddings, usernames, ids=[str(row_id) for row_id in ids])
+
+    def load_saved(self, owner_id, path):
+        """The saved gallery plus embeddings created since, or None if rows it contains were deleted"""
+        gallery = EmbeddingGallery.load(path, mmap=True)
+        current = {str(row_id) for row_id in FacialEmbedding.objects.filter(user_id=owner_id).values_list('id', flat=True)}
+        saved = set(gallery.ids)
+        if saved - current:
+            print(f"Saved face index for {owner_id} is stale, rebuilding from the database")
+            return None
+
+        missing = current - saved
+        if missing:
+            embeddings, usernames, ids = load_owner_embeddings(owner_id, ids=missing)
+            gallery.add(embeddings, usernames, ids=[str(row_id) for row_id in ids])
+        return gallery
+
+    def add(self, embedding):
+        """Add a newly created FacialEmbedding to its owner's cached gallery without rebuilding it"""
+        owner_id = embedding.user_id
+        with self.lock:
+            entry = self.galleries.get(owner_id)
+            version = self.versions.get(owner_id, 0) + 1
+            self.versions[owner_id] = version
+            if entry is None:
+                # Nothing cached yet; the next get() builds it including this row
+                return
+            # Copy so streams searching the current gallery are never affected mid-frame
+            gallery = entry[0].copy()
+            gallery.add(instance_embedding(embedding), [embedding.user.username], ids=[str(embedding.pk)])
+            self.galleries[owner_id] = (gallery, version)
+
+    def invalidate(self, owner_id):
+        with self.lock:
+            self.galleries.pop(owner_id, None)
+            self.versions[owner_id] = self.versions.get(owner_id, 0) + 1
+            self.invalidations += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                'owners': len(self.galleries),
+                'embeddings': sum(len(gallery) for gallery, _ in self.galleries.values()),
+                'builds': self.builds,
+                'invalidations': self.invalidations,
+            }
+
+
+gallery_cache = GalleryCache()
@@ -0,0 +1,171 @@
+import json
+import os
+import numpy as np
+
+INDEX_FORMAT_VERSION = 1
+
+
+def top_k(similarities, k):
+    """Indices and values of the k largest entries of each row, best first"""
+    k = min(k, similarities.shape[1])
+    if k == 0:
+        empty = np.empty((len(similarities), 0))
+        return empty.astype(np.int64), empty.astype(np.float32)
+    if k < similarities.shape[1]:
+        top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    else:
+        top = np.tile(np.arange(similarities.shape[1]), (len(similarities), 1))
+    values = np.take_along_axis(similarities, top, axis=1)
+    order = np.argsort(-values, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(values, order, axis=1)
+
+
+class ExactIndex:
+    """
+    Brute-force cosine search over normalized vectors. Vectors saved with the
+    index are memory-mapped on load; vectors added afterwards are kept in memory
+    as `pending` rows (numbered after the saved ones) until the next save.
+    """
+    kind = 'exact'
+
+    def __init__(self, dim=512):
+        self.dim = dim
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self.pending = np.empty((0, dim), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.vectors) + len(self.pending)
+
+    def add(self, vectors):
+        """Add normalized (N, dim) float32 vectors"""
+        self.pending = np.ascontiguousarray(np.vstack([self.pending, vectors]), dtype=np.float32)
+
+    def copy(self):
+        index = self.__class__.__new__(self.__class__)
+        index.__dict__.update(self.__dict__)
+        return index
+
+    def search(self, queries, k=1):
+        """Top-k (row indices, similarities) for each normalized query, best first; both shaped (Q, k)"""
+        return top_k(self._similarities(queries), k)
+
+    def _similarities(self, queries):
+        return np.hstack([queries @ self.vectors.T, queries @ self.pending.T])
+
+    def all_vectors(self):
+        return np.vstack([np.asarray(self.vectors), self.pending])
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'vectors.npy'), self.all_vectors())
+        self._write_meta(path, {})
+
+    def _write_meta(self, path, extra):
+        meta = {'format_version': INDEX_FORMAT_VERSION, 'kind': self.kind, 'dim': self.dim, 'size': len(self)}
+        meta.update(extra)
+        with open(os.path.join(path, 'index.json'), 'w') as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, path, meta, mmap=True):
+        index = cls(dim=meta['dim'])
+        index.vectors = np.load(os.path.join(path, 'vectors.npy'), mmap_mode='r' if mmap else None)
+        return index
+
+
+class IVFIndex(ExactIndex):
+    """
+    Inverted-file index: vectors are clustered with spherical k-means and a
+    query is only scored against the members of its `nprobe` closest clusters.
+    Rows added after the index was built are searched exactly until it is
+    saved again, at which point they are assigned to their nearest cluster.
+    """
+    kind = 'ivf'
+
+    def __init__(self, dim=512, nlist=64, nprobe=8):
+        super().__init__(dim)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.centroids = None
+        self.order = np.empty(0, dtype=np.int64)    # saved rows sorted by cluster
+        self.offsets = np.zeros(1, dtype=np.int64)  # order[offsets[c]:offsets[c + 1]] are cluster c
+
+    def build(self, vectors, iterations=10, seed=0):
+        """Train the clusters on `vectors` and make them the saved rows of the index"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        nlist = max(1, min(self.nlist, len(vectors)))
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(len(vectors), nlist, replace=False)]
+
+        for _ in range(iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, vectors)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Keep the old centroid for a cluster that lost all its members
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+
+        self.centroids = centroids.astype(np.float32)
+        self.vectors = vectors
+        self.pending = np.empty((0, self.dim), dtype=np.float32)
+        self._set_assignments(np.argmax(vectors @ self.centroids.T, axis=1))
+        return self
+
+    def _set_assignments(self, assignments):
+        self.order = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=len(self.centroids))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def search(self, queries, k=1):
+        if self.centroids is None:
+            return super().search(queries, k)
+
+        nprobe = min(self.nprobe, len(self.centroids))
+        probes, _ = top_k(queries @ self.centroids.T, nprobe)
+        saved = len(self.vectors)
+
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        similarities = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for i, query in enumerate(queries):
+            # Sorted rows keep reads from a memory-mapped matrix sequential
+            saved_rows = np.sort(np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in probes[i]]))
+            rows = np.concatenate([saved_rows, saved + np.arange(len(self.pending))])
+            if len(rows) == 0:
+                continue
+            candidates = np.vstack([self.vectors[saved_rows], self.pending])
+            found, scores = top_k((candidates @ query).reshape(1, -1), k)
+            indices[i, :found.shape[1]] = rows[found[0]]
+            similarities[i, :found.shape[1]] = scores[0]
+
+        # Drop columns no query could fill (fewer candidates than k)
+        filled = np.isfinite(similarities).any(axis=0)
+        return indices[:, filled], similarities[:, filled]
+
+    def save(self, path):
+        if self.centroids is None:
+            self.build(self.all_vectors())
+        os.makedirs(path, exist_ok=True)
+        vectors = self.all_vectors()
+        np.save(os.path.join(path, 'vectors.npy'), vectors)
+        np.save(os.path.join(path, 'centroids.npy'), self.centroids)
+        np.save(os.path.join(path, 'assignments.npy'), np.argmax(vectors @ self.centroids.T, axis=1))
+        self._write_meta(path, {'nlist': len(self.centroids), 'nprobe': self.nprobe})
+
+    @classmethod
+    def load(cls, path, meta, mmap=True):
+        index = cls(dim=meta['dim'], nlist=meta['nlist'], nprobe=meta['nprobe'])
+        index.vectors = np.load(os.path.join(path, 'vectors.npy'), mmap_mode='r' if mmap else None)
+        index.centroids = np.load(os.path.join(path, 'centroids.npy'))
+        index._set_assignments(np.load(os.path.join(path, 'assignments.npy')))
+        return index
+
+
+INDEX_TYPES = {ExactIndex.kind: ExactIndex, IVFIndex.kind: IVFIndex}
+
+
+def load_index(path, mmap=True):
+    with open(os.path.join(path, 'index.json')) as f:
+        meta = json.load(f)
+    if meta.get('format_version') != INDEX_FORMAT_VERSION:
+        raise ValueError(f"Unsupported index format version {meta.get('format_version')} in {path}")
+    return INDEX_TYPES[meta['kind']].load(path, meta, mmap=mmap)
@@ -1,106 +1,139 @@
 import cv2
 import torch
 import numpy as np
-from ultralytics import YOLO
 from deep_sort_realtime.deepsort_tracker import DeepSort
-from facenet_pytorch import InceptionResnetV1
-from ai_models.models import FacialEmbedding
+from django.conf import settings
+from ai_models.ai.model_registry import get_yolo_model, get_facenet_model, inference_lock
+from ai_models.ai.pipeline.zones import ZoneMask, shift_detections
+from .gallery import EmbeddingGallery, distance_to_similarity
+from .gallery_cache import gallery_cache
+from .track_cache import TrackEmbeddingCache
+from .utils import face_quality, embed_faces
+
+# Same decision as the old Euclidean check (distance < 0.7) on normalized embeddings
+RECOGNITION_THRESHOLD = distance_to_similarity(0.7)
 
 class FaceRecognitionSystem:
-    def __init__(self, yolo_model_path, device, owner=None):
+    def __init__(self, yolo_model_path, device, owner=None, max_batch_size=None, zones=None):
         self.device = device
         self.owner = owner
+        # Faces are only detected inside the camera's zones, if it has any
+        self.zones = zones or ZoneMask()
+        # Upper bound on face crops per FaceNet forward pass
+        self.max_batch_size = max_batch_size or getattr(settings, 'FACE_EMBEDDING_BATCH_SIZE', 32)
         
-        # Load models
-        self.detector = YOLO(yolo_model_path).to(device)
+        # Models are shared across the process; only the tracker is per instance
+        self.detector = get_yolo_model(yolo_model_path)
         self.tracker = DeepSort(max_age=30)
-        self.face_recognizer = InceptionResnetV1(pretrained='vggface2').eval().to(device)
+        self.face_recognizer = get_facenet_model()
         
-        # Initialize empty lists
-        self.database = {}
-        self.embeddings = []
-        self.usernames = []
+        # Enrolled embeddings of the owner's authorized people, shared through gallery_cache
+        self.gallery = EmbeddingGallery()
+        self.gallery_version = None
         
         # Load embeddings from database
         self.load_database_embeddings()
         
         # Track recognized faces
-        self.recognized_tracks = {}
+        self.track_cache = TrackEmbeddingCache()
         self.recognized_names_set = set()
 
     def load_database_embeddings(self):
-        """Load facial embeddings for the current user from the database"""
+        """Load facial embeddings for the current user from the shared gallery cache"""
         try:
             # Get embeddings for the current user
             if self.owner:
-                embedding_objects = FacialEmbedding.objects.filter(user=self.owner)
-                
-                for obj in embedding_objects:
-                    username = obj.user.username
-                    embedding = np.array(obj.embedding_vector)
-                    self.database[username] = embedding
-                    self.embeddings.append(embedding)
-                    self.usernames.append(username)
-                
-                if self.embeddings:
-                    self.embeddings = np.array(self.embeddings)
-                    print(f"Loaded {len(self.embeddings)} embeddings for user {self.owner.username}")
+                self.gallery, self.gallery_version = gallery_cache.get(self.owner.pk)
+                if len(self.gallery):
+                    print(f"Loaded {len(self.gallery)} embeddings for user {self.owner.username}")
                 else:
                     print(f"No embeddings found for user {self.owner.username}")
             else:
                 print("No owner specified for loading embeddings")
         except Exception as e:
             print(f"Error loading embeddings: {str(e)}")
-            self.embeddings = np.array([])
-            self.usernames = []
+            self.gallery = EmbeddingGallery()
+
+    def refresh_gallery(self):
+        """Swap in the owner's gallery if embeddings were added or removed, and re-match live tracks"""
+        if not self.owner or gallery_cache.version(self.owner.pk) == self.gallery_version:
+            return False
+
+        self.load_database_embeddings()
+        track_ids = list(self.track_cache.entries)
+        if track_ids:
+            embeddings = np.stack([self.track_cache.entries[track_id]["embedding"] for track_id in track_ids])
+            names = self.match_embeddings(embeddings) if len(self.gallery) else ["Unknown"] * len(track_ids)
+            for track_id, name in zip(track_ids, names):
+                self.track_cache.set_name(track_id, name)
+        return True
 
     def recognize_face(self, face_img):
         """Recognize a face using the stored embeddings"""
-        if len(self.embeddings) == 0:
-            return "Unknown"
+        return self.recognize_faces([face_img])[0]
+
+    def recognize_faces(self, face_imgs):
+        """Recognize a list of face crops with batched embedding and matching"""
+        if len(self.gallery) == 0 or not face_imgs:
+            return ["Unknown"] * len(face_imgs)
 
         try:
-            # Preprocess face
-            face = cv2.resize(face_img, (160, 160))
-            face = cv2.cvtColor(face, cv2.COLOR_BGR2RGB)
-            face = face / 255.0
-            face = (face - 0.5) / 0.5
-            face_tensor = torch.tensor(face.transpose(2, 0, 1)).unsqueeze(0).float().to(self.device)
-
-            # Generate embedding
-            with torch.no_grad():
-                embedding = self.face_recognizer(face_tensor)
-                embedding = embedding.cpu().numpy()
-
-            # Compare with database
-            distances = np.linalg.norm(self.embeddings - embedding, axis=1)
-            min_dist_idx = np.argmin(distances)
-            min_dist = distances[min_dist_idx]
-
-            # Threshold for recognition
-            if min_dist < 0.7:  # Adjust this threshold as needed
-                return self.usernames[min_dist_idx]
-
-            return "Unknown"
+            return self.match_embeddings(self.embed_faces(face_imgs))
         except Exception as e:
             print(f"Error in face recognition: {str(e)}")
-            return "Unknown"
+            return ["Unknown"] * len(face_imgs)
 
-    def process_frame(self, frame):
-        results = self.detector(frame)
-        detections = []
+    def embed_faces(self, face_imgs):
+        """FaceNet embeddings for BGR face crops, at most max_batch_size crops per forward pass"""
+        return embed_faces(face_imgs, self.face_recognizer, self.device, self.max_batch_size)
+
+    def match_embeddings(self, embeddings):
+        """Names for a batch of face embeddings ("Unknown" when nothing is close enough)"""
+        return self.gallery.identify(embeddings, RECOGNITION_THRESHOLD)
 
-        for result in results:
-            for box in result.boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                w, h = x2 - x1, y2 - y1
-                conf = float(box.conf[0])
-                detections.append(([x1, y1, w, h], conf, None, None))
+    def detect_batch(self, batch):
+        """Detect faces on every frame of a PreparedBatch in a single forward pass"""
+        with inference_lock(self.detector):
+            results = self.detector.predict(batch.tensor, verbose=False)
+        detections = []
+        for i, result in enumerate(results):
+            xyxy = batch.scale_boxes(i, result.boxes.xyxy.cpu().numpy())
+            confs = result.boxes.conf.cpu().numpy()
+            frame_detections = []
+            for box, conf in zip(xyxy, confs):
+                x1, y1, x2, y2 = map(int, box)
+                frame_detections.append(([x1, y1, x2 - x1, y2 - y1], float(conf), None, None))
+            detections.append(frame_detections)
+        return detections
+
+    def process_frame(self, frame, detections=None):
+        """Track and recognize faces; pass detections from detect_batch to skip the detector pass"""
+        # Frames from a FrameBus are shared and read-only; draw on our own copy
+        if not frame.flags.writeable:
+            frame = frame.copy()
+
+        if detections is None:
+            crop, offset = self.zones.crop(frame)
+            with inference_lock(self.detector):
+                results = self.detector(crop)
+            detections = []
+
+            for result in results:
+                for box in result.boxes:
+                    x1, y1, x2, y2 = map(int, box.xyxy[0])
+                    w, h = x2 - x1, y2 - y1
+                    conf = float(box.conf[0])
+                    detections.append(([x1, y1, w, h], conf, None, None))
+            detections = self.zones.filter_detections(shift_detections(detections, offset))
 
         tracks = self.tracker.update_tracks(detections, frame=frame)
+        self.refresh_gallery()
 
         authorized = []
         unauthorized = []
+        visible = []
+        pending = []
+        frame_h, frame_w = frame.shape[:2]
 
         for track in tracks:
             if not track.is_confirmed():
@@ -109,22 +142,38 @@ class FaceRecognitionSystem:
             track_id = track.track_id
             ltrb = track.to_ltrb()
             x1, y1, x2, y2 = map(int, ltrb)
+            x1, y1 = max(0, x1), max(0, y1)
+            x2, y2 = min(frame_w, x2), min(frame_h, y2)
             face_crop = frame[y1:y2, x1:x2]
 
             if face_crop.size == 0:
                 continue
 
-            if track_id not in self.recognized_tracks:
-                self.recognized_tracks[track_id] = {"name": "Unknown", "counter": 0}
-
-            self.recognized_tracks[track_id]["counter"] += 1
-
-            # Re-run recognition every 10 frames
-            if self.recognized_tracks[track_id]["counter"] % 10 == 0 or self.recognized_tracks[track_id]["name"] == "Unknown":
-                name = self.recognize_face(face_crop)
-                self.recognized_tracks[track_id]["name"] = name
-            
-            name_to_display = self.recognized_tracks[track_id]["name"]
+            visible.append((track_id, (x1, y1, x2, y2)))
+
+            # Only embed the face again when this frame has a better view of it.
+            # Tracks without a fresh detection this frame have no confidence to judge by.
+            conf = track.get_det_conf()
+            quality = face_quality(x1, y1, x2, y2, frame, conf) if conf is not None else 0.0
+            if self.track_cache.get(track_id) is None or (conf is not None and self.track_cache.needs_refresh(track_id, quality)):
+                pending.append((track_id, face_crop, quality))
+
+        # Embed and match every face that needs recognition in one batch
+        if pending:
+            try:
+                embeddings = self.embed_faces([face_crop for _, face_crop, _ in pending])
+                averaged = [self.track_cache.update(track_id, embedding, quality)
+                            for (track_id, _, quality), embedding in zip(pending, embeddings)]
+                names = self.match_embeddings(np.stack(averaged)) if len(self.gallery) else ["Unknown"] * len(pending)
+                for (track_id, _, _), name in zip(pending, names):
+                    self.track_cache.set_name(track_id, name)
+            except Exception as e:
+                print(f"Error in face recognition: {str(e)}")
+
+        self.track_cache.expire({track.track_id for track in self.tracker.tracker.tracks})
+
+        for track_id, (x1, y1, x2, y2) in visible:
+            name_to_display = self.track_cache.name(track_id)
             if name_to_display != "Unknown":
                 self.recognized_names_set.add(name_to_display)
                 authorized.append(name_to_display)
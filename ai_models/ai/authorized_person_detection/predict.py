@@ -2,32 +2,45 @@ import cv2
 import torch
 from .model import FaceRecognitionSystem
 from ai_models.utils.save_detection_event import save_detection_event
+from ai_models.ai.pipeline.motion import motion_gate
+from ai_models.ai.pipeline.sampler import frame_sampler
 
-def run_recognition(video_path=None, owner=None):
+def run_recognition(video_path=None, owner=None, cap=None, zones=None):
     device = torch.device('cuda:0' if torch.cuda.is_available() else 'cpu')
     print(f"Using device: {device}")
 
     recognition_system = FaceRecognitionSystem(
         yolo_model_path='ai_models/ai/authorized_person_detection/face_detection.pt',
         device=device,
-        owner=owner
+        owner=owner,
+        zones=zones
     )
     
-    cap = cv2.VideoCapture(video_path)
+    # Reuse an already open capture (e.g. a FrameBus subscription) when given
+    if cap is None:
+        cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         print("Error: Could not open video source.")
         return
 
+    # Skips face detection while nothing in the scene changes
+    gate = motion_gate('person')
+    # Skips frames to stay at the live edge when recognition is slower than the source
+    sampler = frame_sampler(cap)
+
     # Create a single window
     cv2.namedWindow("Face Detection and Recognition", cv2.WINDOW_NORMAL)
     cv2.resizeWindow("Face Detection and Recognition", 1280, 720)
 
     try:
         while True:
-            ret, frame = cap.read()
+            ret, frame = sampler.read(cap)
             if not ret:
                 break
 
+            if not gate.should_infer(frame):
+                continue
+
             processed_frame, authorized, unauthorized = recognition_system.process_frame(frame)
             
             # Display the processed frame
@@ -53,6 +66,8 @@ def run_recognition(video_path=None, owner=None):
         print(f"Error in face recognition: {str(e)}")
         yield {"event": "error", "message": str(e)}
     finally:
+        print(f"Person detection motion gate: {gate.stats()}")
+        print(f"Person detection sampling: {sampler.stats()}")
         cap.release()
         cv2.destroyAllWindows()
 
@@ -0,0 +1,66 @@
+import numpy as np
+
+
+class TrackEmbeddingCache:
+    """
+    Face embeddings per DeepSort track. Each entry keeps a running average of
+    the track's good embeddings and the best crop quality seen so far, so a
+    face is only embedded again when a clearly better view of it turns up
+    rather than on every frame. Entries go away when DeepSort drops the track.
+    """
+
+    def __init__(self):
+        self.entries = {}
+
+        # Stats
+        self.refreshes = 0
+        self.reuses = 0
+        self.expired = 0
+
+    def get(self, track_id):
+        return self.entries.get(track_id)
+
+    def name(self, track_id):
+        entry = self.entries.get(track_id)
+        return entry["name"] if entry else "Unknown"
+
+    def needs_refresh(self, track_id, quality):
+        """A new track always gets one embedding; after that only a better crop does"""
+        entry = self.entries.get(track_id)
+        if entry is None or quality > entry["quality"]:
+            return True
+        self.reuses += 1
+        return False
+
+    def update(self, track_id, embedding, quality):
+        """Fold a new embedding into the track's average and return the result"""
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        entry = self.entries.get(track_id)
+        if entry is None or entry["quality"] == 0:
+            # Nothing yet, or only an unusable crop: start over from this one
+            entry = {"embedding": embedding, "samples": 1, "quality": quality, "name": "Unknown"}
+        else:
+            samples = entry["samples"]
+            average = (entry["embedding"] * samples + embedding) / (samples + 1)
+            entry = {"embedding": average, "samples": samples + 1, "quality": quality, "name": entry["name"]}
+        self.entries[track_id] = entry
+        self.refreshes += 1
+        return entry["embedding"]
+
+    def set_name(self, track_id, name):
+        if track_id in self.entries:
+            self.entries[track_id]["name"] = name
+
+    def expire(self, live_track_ids):
+        """Forget tracks the tracker no longer has"""
+        for track_id in [track_id for track_id in self.entries if track_id not in live_track_ids]:
+            del self.entries[track_id]
+            self.expired += 1
+
+    def stats(self):
+        return {
+            'tracks': len(self.entries),
+            'refreshes': self.refreshes,
+            'reuses': self.reuses,
+            'expired': self.expired,
+        }
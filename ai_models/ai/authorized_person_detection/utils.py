@@ -1,8 +1,8 @@
-from sklearn.metrics.pairwise import cosine_similarity
-import pickle
 import numpy as np
 import torch
 import cv2
+from .face_db import FaceDatabase
+
 def preprocess_face(face_crop, device):
     face_crop = cv2.resize(face_crop, (160, 160))
     face_crop = face_crop.astype(np.float32) / 255.0
@@ -10,28 +10,39 @@ def preprocess_face(face_crop, device):
     face_crop = torch.tensor(face_crop.transpose(2, 0, 1)).unsqueeze(0).float().to(device)
     return face_crop
 
-def recognize_face(face_crop, facenet_model, all_embeddings, database, device):
+def embed_faces(face_crops, facenet_model, device, max_batch_size=32):
+    """FaceNet embeddings for BGR face crops, at most max_batch_size crops per forward pass"""
+    # Preprocess faces into one NCHW array
+    faces = np.stack([cv2.cvtColor(cv2.resize(face_crop, (160, 160)), cv2.COLOR_BGR2RGB) for face_crop in face_crops])
+    faces = (faces.astype(np.float32) / 255.0 - 0.5) / 0.5
+    faces = np.ascontiguousarray(faces.transpose(0, 3, 1, 2))
+
+    embeddings = []
+    with torch.no_grad():
+        for start in range(0, len(faces), max_batch_size):
+            face_tensor = torch.from_numpy(faces[start:start + max_batch_size]).to(device)
+            embeddings.append(facenet_model(face_tensor).cpu().numpy())
+    return np.concatenate(embeddings)
+
+def recognize_face(face_crop, facenet_model, gallery, device, threshold=0.6):
     face_crop = cv2.cvtColor(face_crop, cv2.COLOR_BGR2RGB)
     preprocessed_face = preprocess_face(face_crop, device)
     with torch.no_grad():
         embedding = facenet_model(preprocessed_face)
-    embedding = embedding.cpu().numpy().flatten()
-
-    similarities = cosine_similarity(embedding.reshape(1, -1), all_embeddings)
-    best_idx = np.argmax(similarities)
-    best_similarity = similarities[0][best_idx]
-    best_personId = list(database.keys())[best_idx]
+    embedding = embedding.cpu().numpy()
 
-    if best_similarity > 0.6:
-        return database[best_personId]["name"]
-    else:
-        return "Unknown"
+    return gallery.identify(embedding, threshold)[0]
 
-def load_database(pickle_path):
-    with open(pickle_path, 'rb') as f:
-        database = pickle.load(f)
-    all_embeddings = np.array([np.squeeze(data['embedding']) for data in database.values()])
-    return database, all_embeddings
+def load_database(path):
+    """
+    Load a face database directory (see face_db.FaceDatabase). Pickled
+    databases are no longer read here; convert them once with
+    `manage.py convert_face_db`.
+    """
+    if str(path).endswith('.pkl'):
+        raise ValueError(f"{path} is a pickled face database; convert it with 'manage.py convert_face_db {path}'")
+    face_db = FaceDatabase.load(path)
+    return face_db.as_dict(), face_db.gallery()
 
 def is_face_big_enough(x1, y1, x2, y2, min_area=10000):
     width = x2 - x1
@@ -39,21 +50,26 @@ def is_face_big_enough(x1, y1, x2, y2, min_area=10000):
     area = width * height
     return area >= min_area
 def is_face_usable(x1, y1, x2, y2, frame, conf, conf_thresh=0.6, area_thresh=0.005, blur_thresh=50.0):
+    return face_quality(x1, y1, x2, y2, frame, conf, conf_thresh, area_thresh, blur_thresh) > 0
+
+def face_quality(x1, y1, x2, y2, frame, conf, conf_thresh=0.6, area_thresh=0.005, blur_thresh=50.0):
+    """0 for a face that fails is_face_usable, otherwise a score that grows with confidence, size and sharpness"""
     frame_h, frame_w = frame.shape[:2]
     face_area = (x2 - x1) * (y2 - y1)
     frame_area = frame_w * frame_h
 
     if conf < conf_thresh:
-        return False
+        return 0.0
     if (face_area / frame_area) < area_thresh:
-        return False
+        return 0.0
 
     face_crop = frame[y1:y2, x1:x2]
     if face_crop.size == 0:
-        return False
+        return 0.0
     gray = cv2.cvtColor(face_crop, cv2.COLOR_BGR2GRAY)
     lap_var = cv2.Laplacian(gray, cv2.CV_64F).var()
     if lap_var < blur_thresh:
-        return False
+        return 0.0
 
-    return True
+    # Sharpness stops mattering once well past the blur threshold
+    return conf * (face_area / frame_area) * min(lap_var / blur_thresh, 4.0)
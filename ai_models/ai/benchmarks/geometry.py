@@ -0,0 +1,109 @@
+"""
+Microbenchmarks of the batched kernels in ai_models.ai.geometry against the
+per-box helpers the pipelines used to loop over.
+
+    python -m ai_models.ai.benchmarks.geometry [--sizes 10 100 1000] [--history 30]
+"""
+import argparse
+import time
+import numpy as np
+from ai_models.ai import geometry
+from ai_models.ai.car_tracking.utils import calculate_movement, find_closest_detection
+from ai_models.ai.intrusion_detection.utils import calculate_iou, calculate_movement_speed
+
+FRAME_SIZE = (1920, 1080)
+
+
+def random_boxes(rng, count):
+    """(count, 4) xyxy boxes of 20-200 pixels inside a 1080p frame"""
+    w, h = FRAME_SIZE
+    sizes = rng.uniform(20, 200, size=(count, 2))
+    corners = rng.uniform(0, 1, size=(count, 2)) * (np.array([w, h]) - sizes)
+    return np.hstack([corners, corners + sizes]).astype(np.float32)
+
+
+def random_histories(rng, count, length):
+    """(count, length, 4) track histories drifting a few pixels per frame"""
+    start = random_boxes(rng, count)
+    steps = rng.normal(0, 3, size=(count, length, 2)).cumsum(axis=1)
+    return (start[:, None, :] + np.concatenate([steps, steps], axis=2)).astype(np.float32)
+
+
+def timed(function, min_time=0.2):
+    """Best seconds per call of function(), repeating until min_time has passed"""
+    best, total = float('inf'), 0.0
+    while total < min_time or best == float('inf'):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best, total = min(best, elapsed), total + elapsed
+    return best
+
+
+def cases(rng, count, history):
+    """(name, scalar, batched, same results) for every kernel at count boxes"""
+    boxes, others = random_boxes(rng, count), random_boxes(rng, count)
+    box_lists, other_lists = boxes.tolist(), others.tolist()
+    ltwh = geometry.xyxy_to_ltwh(boxes)
+    detections = [(box, 2, 0.9) for box in ltwh.tolist()]
+    target = (FRAME_SIZE[0] / 2, FRAME_SIZE[1] / 2)
+    histories = random_histories(rng, count, history)
+    history_lists = [track.tolist() for track in histories]
+
+    def iou_scalar():
+        return [[calculate_iou(a, b) for b in other_lists] for a in box_lists]
+
+    def iou_batched():
+        return geometry.box_iou(boxes, others)
+
+    def movement_scalar():
+        return [calculate_movement(a, b) for a, b in zip(box_lists, other_lists)]
+
+    def movement_batched():
+        return geometry.paired_center_distances(boxes, others)
+
+    def closest_scalar():
+        return find_closest_detection(detections, *target)
+
+    def closest_batched():
+        return geometry.nearest_box(geometry.ltwh_to_xyxy(ltwh), target)
+
+    def speed_scalar():
+        return [calculate_movement_speed(track) for track in history_lists]
+
+    def speed_batched():
+        return geometry.track_speeds(histories)
+
+    closest_index = geometry.nearest_box(boxes, target)[0]
+    return [
+        ('pairwise iou', iou_scalar, iou_batched,
+         np.allclose(iou_scalar(), iou_batched(), atol=1e-5)),
+        ('movement', movement_scalar, movement_batched,
+         np.allclose(movement_scalar(), movement_batched(), atol=1e-3)),
+        ('closest detection', closest_scalar, closest_batched,
+         np.allclose(closest_scalar()[0], ltwh[closest_index], atol=1e-3)),
+        (f'track speed ({history} frames)', speed_scalar, speed_batched,
+         np.allclose(speed_scalar(), speed_batched(), rtol=1e-4)),
+    ]
+
+
+def run(sizes=(10, 100, 1000), history=30, seed=0):
+    rng = np.random.default_rng(seed)
+    print(f"{'kernel':<26}{'boxes':>7}{'scalar':>13}{'batched':>13}{'speedup':>10}  match")
+    results = []
+    for count in sizes:
+        for name, scalar, batched, match in cases(rng, count, history):
+            scalar_time, batched_time = timed(scalar), timed(batched)
+            speedup = scalar_time / batched_time
+            results.append((name, count, scalar_time, batched_time, speedup, match))
+            print(f"{name:<26}{count:>7}{scalar_time * 1e6:>11.1f}us{batched_time * 1e6:>11.1f}us{speedup:>9.1f}x  {'yes' if match else 'NO'}")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--history', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    run(args.sizes, args.history, args.seed)
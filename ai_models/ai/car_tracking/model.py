@@ -1,48 +1,71 @@
-from ultralytics import YOLO
 from deep_sort_realtime.deepsort_tracker import DeepSort
-import torch
+from ai_models.ai.model_registry import get_device, get_yolo_model, inference_lock, CAR_TRACKING_WEIGHTS
+from ai_models.ai.pipeline.preprocess import prepare_batch
+from ai_models.ai.pipeline.executor import get_inference_executor
 
 class YoloDetector:
     def __init__(self, confidence=0.5):
-        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        self.model = YOLO("ai_models/ai/car_tracking/car_movement_tracking.pt")
+        self.device = get_device()
         self.classList = ['car', 'bike']
         self.confidence = confidence
 
-        if self.device == 'cuda':
-            print("CUDA Available:", torch.cuda.is_available())
-            print("GPU:", torch.cuda.get_device_name(0))
-            self.model.to("cuda")
-            # Enable half precision for faster inference
-            self.model.fuse()
-        else:
-            print("CUDA not available, using CPU.")
+    @property
+    def model(self):
+        # Loaded once per process on first use and shared by every detector
+        return get_yolo_model(CAR_TRACKING_WEIGHTS)
 
     def detect(self, image):
         # Use a smaller inference size for faster processing
-        results = self.model.predict(
-            image, 
-            conf=self.confidence, 
-            device=0 if self.device == 'cuda' else 'cpu',
-            verbose=False,  # Disable verbose output
-            imgsz=640  # Use a smaller image size for inference
-        )
+        with inference_lock(self.model):
+            results = self.model.predict(
+                image, 
+                conf=self.confidence, 
+                device=0 if self.device == 'cuda' else 'cpu',
+                verbose=False,  # Disable verbose output
+                imgsz=640  # Use a smaller image size for inference
+            )
         result = results[0]
         return self.make_detections(result)
 
-    def make_detections(self, result):
+    def detect_batch(self, batch):
+        """Detect on every frame of a PreparedBatch in a single forward pass"""
+        with inference_lock(self.model):
+            results = self.model.predict(
+                batch.tensor,
+                conf=self.confidence,
+                device=0 if self.device == 'cuda' else 'cpu',
+                verbose=False
+            )
+        return [
+            self.make_detections(result, batch.scale_boxes(i, result.boxes.xyxy.cpu().numpy()))
+            for i, result in enumerate(results)
+        ]
+
+    def detect_frames(self, frames):
+        """Detect on a list of frames in a single forward pass"""
+        return self.detect_batch(prepare_batch(frames, self.device))
+
+    @property
+    def executor(self):
+        # Batches single-frame calls from every tracking session in the process
+        return get_inference_executor(f"{CAR_TRACKING_WEIGHTS}@{self.confidence}", self.detect_frames)
+
+    def make_detections(self, result, xyxy=None):
+        if xyxy is None:
+            xyxy = result.boxes.xyxy.cpu().numpy()
+        classes = result.boxes.cls.cpu().numpy()
+        confs = result.boxes.conf.cpu().numpy()
+
         detections = []
-        for box in result.boxes:
-            x1, y1, x2, y2 = box.xyxy[0]
-            x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+        for box, cls, conf in zip(xyxy, classes, confs):
+            x1, y1, x2, y2 = map(int, box)
             w, h = x2 - x1, y2 - y1
-            class_number = int(box.cls[0])
+            class_number = int(cls)
 
             if result.names[class_number] not in self.classList:
                 continue
 
-            conf = float(box.conf[0])
-            detections.append(([x1, y1, w, h], class_number, conf))
+            detections.append(([x1, y1, w, h], class_number, float(conf)))
         return detections
 
 # class Tracker:
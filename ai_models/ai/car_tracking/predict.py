@@ -1,138 +1,213 @@
-import math
 import cv2
+import numpy as np
 from .model import YoloDetector, Tracker
-from .utils import find_closest_detection, calculate_movement
+from .utils import calculate_movement
+from ai_models.ai.geometry import box_iou, ltwh_to_xyxy, nearest_box, point_box_distance
 from ai_models.utils.save_detection_event import save_detection_event
-detector = YoloDetector(confidence=0.5)
-tracker = Tracker()
+from ai_models.ai.pipeline.motion import motion_gate
+from ai_models.ai.pipeline.sampler import frame_sampler
+from ai_models.ai.pipeline.zones import ZoneMask, shift_detections
+
+
+class VehicleTrackingSession:
+    """
+    Everything one vehicle-tracking stream needs to keep to itself: its DeepSort
+    tracker, the selected track and the movement/alert state. Model weights are
+    shared process-wide; with use_executor (the default) single-frame detection
+    goes through the model's InferenceExecutor, so concurrent sessions are
+    batched together instead of calling the model from many threads. With
+    zones, detection runs on the crop covering them and only vehicles inside
+    a zone are tracked.
+    """
+
+    def __init__(self, confidence=0.5, use_executor=True, zones=None):
+        self.detector = YoloDetector(confidence=confidence)
+        self.tracker = Tracker()
+        self.use_executor = use_executor
+        self.zones = zones or ZoneMask()
+        # Skips detection while the scene is static
+        self.gate = motion_gate('car')
+        self.selected_tracking_id = None
+        self.initial_box = None
+
+        # Movement detection parameters
+        self.prev_box = None
+        self.movement_history = []  # Store recent movements
+        self.history_size = 5  # Number of frames to consider
+        self.cumulative_threshold = 8  # Total movement threshold
+        self.frame_threshold = 2  # Minimum movement per frame to consider
+        self.last_alert_time = 0  # Track when we last sent an alert
+        self.alert_cooldown = 30  # Frames to wait before sending another alert
+        self.movement = 0
+        self.cumulative_movement = 0
+
+    def select(self, cap, vehicle_location_x, vehicle_location_y, buffer_size=4, max_frames=None):
+        self.selected_tracking_id, self.initial_box = select_vehicle(
+            cap, vehicle_location_x, vehicle_location_y, self.tracker, self.detector,
+            buffer_size=buffer_size, max_frames=max_frames, zones=self.zones
+        )
+        return self.selected_tracking_id
+
+    def detect(self, frame):
+        crop, offset = self.zones.crop(frame)
+        if self.use_executor:
+            detections = self.detector.executor(crop)
+        else:
+            detections = self.detector.detect(crop)
+        return self.zones.filter_detections(shift_detections(detections, offset))
+
+    def update(self, frame, frame_count):
+        """
+        Track one frame. Returns (selected box or None, whether the vehicle moved
+        enough to alert).
+        """
+        tracking_ids, boxes = self.tracker.track(self.detect(frame), frame)
 
-def initialize_tracking_with_buffer( video_path, vehicle_location_x, vehicle_location_y):
-        cap = cv2.VideoCapture(video_path)
+        for track_id, bbox in zip(tracking_ids, boxes):
+            if track_id != self.selected_tracking_id:
+                continue
+
+            should_alert = False
+            if self.prev_box is not None:
+                self.movement = calculate_movement(self.prev_box, bbox)
+
+                # Add movement to history
+                self.movement_history.append(self.movement)
+                if len(self.movement_history) > self.history_size:
+                    self.movement_history.pop(0)
+
+                # Calculate cumulative movement
+                self.cumulative_movement = sum(self.movement_history)
+
+                # Check if we should alert
+                should_alert = (
+                    self.cumulative_movement > self.cumulative_threshold and  # Total movement threshold
+                    self.movement > self.frame_threshold and  # Current frame movement threshold
+                    (frame_count - self.last_alert_time) > self.alert_cooldown  # Cooldown period
+                )
+                if should_alert:
+                    self.last_alert_time = frame_count
+                    self.movement_history.clear()  # Reset history after alert
+
+            self.prev_box = bbox
+            return bbox, should_alert
+
+        return None, False
+
+
+def initialize_tracking_with_buffer( video_path, vehicle_location_x, vehicle_location_y, cap=None, session=None):
+        """Open the video (unless cap is given) and select the vehicle. Returns (cap, session)."""
+        # Reuse an already open capture (e.g. a FrameBus subscription) when given
+        if cap is None:
+            cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
             raise ValueError("Error: Unable to open video or stream.")
 
+        # The session's tracker is left warm for track_vehicle_realtime
+        session = session or VehicleTrackingSession()
+        session.select(cap, vehicle_location_x, vehicle_location_y)
+        return cap, session
+
+def select_vehicle(cap, vehicle_location_x, vehicle_location_y, tracker, detector, buffer_size=4, max_frames=None, max_distance=50, min_iou=0.3, zones=None):
+    """
+    Find the tracking id of the vehicle at the selected location.
+    Frames are read from `cap` buffer_size at a time, detected in one batched
+    forward pass and fed to `tracker` in order, so DeepSort sees the consecutive
+    hits it needs to confirm a track (n_init) and the frames are never detected
+    twice. The tracker keeps its state, so the caller can go on tracking with it
+    from the next frame of the same capture.
+
+    The target is the detection nearest the selected point among those within
+    max_distance pixels of it (0 when the point is inside the box). Selection
+    waits until that detection belongs to a confirmed track (IoU >= min_iou),
+    so a neighbouring vehicle confirmed a frame earlier is never picked.
+    With zones (a ZoneMask), detection runs on the crop covering them and
+    only vehicles inside a zone are tracked or selected, as when tracking.
+    Returns (tracking_id, box), or (None, None) if the stream ended or max_frames
+    were read first.
+    """
+    zones = zones or ZoneMask()
+    frame_count = 0
+    while max_frames is None or frame_count < max_frames:
         frame_buffer = []
-        frame_count = 0
-        tracking_initialized = False
-        selected_tracking_id = None
-        initial_box = None
-
-        while True:
+        while len(frame_buffer) < buffer_size:
             ret, frame = cap.read()
             if not ret:
-                break  # End of video
-
-            frame_buffer.append(frame)
-            frame_count += 1
-            print("Frame Count is ", frame_count)
-            if frame_count < 3:
-                continue  # Wait until we have 3 frames to initialize tracking
-
-            # Once we have 3 frames, start detecting and tracking
-            if not tracking_initialized:
-                detections = detect_and_select_vehicle(frame_buffer, vehicle_location_x, vehicle_location_y)
-                if detections:
-                    print("Detection is : ")
-                    selected_tracking_id, initial_box = detections
-                    tracking_initialized = True
-
-            if tracking_initialized:
                 break
-
-        return cap, selected_tracking_id, initial_box
-
-def detect_and_select_vehicle(frame_buffer, vehicle_location_x, vehicle_location_y):
-    detections = []
-    print("In this detect function")
-    print(detections)
-    for frame in frame_buffer:
-        frame_detections = detector.detect(frame)
-        closest_detection = find_closest_detection(frame_detections, vehicle_location_x, vehicle_location_y)
-        if closest_detection:
-            detections.append(closest_detection)
-    print("length of detection: ", len(detections))
-    if len(detections) >= 3:  # Ensure we have detections across 3 frames
-        selected_bbox, selected_class, selected_conf = detections[0]
-        selected_detections = [(selected_bbox, selected_class, selected_conf)]
-        tracking_ids, boxes = tracker.track(selected_detections, frame_buffer[0])  # Initialize tracking with the first frame
-        print("Tracking Id is: ", tracking_ids)
-        print(boxes)
-        
-        if tracking_ids:
-            print("Tracking Ids: ", tracking_ids)
-            return tracking_ids[0], boxes[0]
-
-    return None
-
-def track_vehicle_realtime(cap, selected_tracking_id, vehicle, owner):
-    prev_box = None
-    frame_count = 0
-    skip_frames = 2  # Process every 3rd frame
+            frame_buffer.append(frame)
+        if not frame_buffer:
+            break
+        frame_count += len(frame_buffer)
+
+        crops, offsets = zip(*(zones.crop(frame) for frame in frame_buffer))
+        detections = [
+            zones.filter_detections(shift_detections(frame_detections, offset))
+            for frame_detections, offset in zip(detector.detect_frames(list(crops)), offsets)
+        ]
+        for frame, frame_detections in zip(frame_buffer, detections):
+            tracking_ids, boxes = tracker.track(frame_detections, frame)
+            target = target_detection(frame_detections, vehicle_location_x, vehicle_location_y, max_distance)
+            if target is None or not tracking_ids:
+                continue
+            overlaps = box_iou(target, boxes)[0]
+            best = int(np.argmax(overlaps))
+            if overlaps[best] >= min_iou:
+                print(f"Selected vehicle tracking ID {tracking_ids[best]} after {frame_count} frames")
+                return tracking_ids[best], boxes[best]
+
+        if len(frame_buffer) < buffer_size:
+            break  # End of video
+
+    return None, None
+
+def target_detection(detections, target_x, target_y, max_distance=50):
+    """The xyxy box of the ([left, top, w, h], ...) detection nearest the selected location, or None if none is within max_distance"""
+    if not detections:
+        return None
+    boxes = ltwh_to_xyxy([bbox for bbox, *_ in detections])
+    near = point_box_distance((target_x, target_y), boxes)[0] <= max_distance
+    if not near.any():
+        return None
+    index, _ = nearest_box(boxes[near], (target_x, target_y))
+    return boxes[near][index]
+
+def track_vehicle_realtime(cap, session, vehicle, owner):
     show_frames = True  # Enable visualization for testing
-    
-    # Movement detection parameters
-    movement_history = []  # Store recent movements
-    history_size = 5  # Number of frames to consider
-    cumulative_threshold = 8  # Total movement threshold
-    frame_threshold = 2  # Minimum movement per frame to consider
-    last_alert_time = 0  # Track when we last sent an alert
-    alert_cooldown = 30  # Frames to wait before sending another alert
-    movement = 0  # Initialize movement
-    cumulative_movement = 0  # Initialize cumulative movement
+    # Skips more frames when tracking falls behind the source, fewer when it keeps up
+    sampler = frame_sampler(cap)
 
     while True:
-        ret, frame = cap.read()
+        ret, frame = sampler.read(cap)
         if not ret:
             break
 
-        frame_count += 1
-        if frame_count % skip_frames != 0:
-            continue  # Skip frames to improve performance
+        frame_count = sampler.frame_index
+
+        if not session.gate.should_infer(frame):
+            continue  # Nothing has changed since the last detection
+
+        # Detect and track objects in the current frame
+        bbox, should_alert = session.update(frame, frame_count)
+
+        if should_alert:
+            yield {"event": "vehicle_moved", "message": "Vehicle has moved significantly."}
+            save_detection_event(vehicle=vehicle, owner=owner, event_type="CAR_MOVEMENT", description="Car moved from its position.", video_frame=frame)
 
-        # Detect objects in the current frame
-        detections = detector.detect(frame)
-        tracking_ids, boxes = tracker.track(detections, frame)
+        if not show_frames:
+            continue
 
         # Create a copy of the frame for visualization
         display_frame = frame.copy()
 
-        for track_id, bbox in zip(tracking_ids, boxes):
-            if track_id == selected_tracking_id:
-                if prev_box is not None:
-                    movement = calculate_movement(prev_box, bbox)
-                    
-                    # Add movement to history
-                    movement_history.append(movement)
-                    if len(movement_history) > history_size:
-                        movement_history.pop(0)
-                    
-                    # Calculate cumulative movement
-                    cumulative_movement = sum(movement_history)
-                    
-                    # Check if we should alert
-                    should_alert = (
-                        cumulative_movement > cumulative_threshold and  # Total movement threshold
-                        movement > frame_threshold and  # Current frame movement threshold
-                        (frame_count - last_alert_time) > alert_cooldown  # Cooldown period
-                    )
-                    
-                    if should_alert:
-                        yield {"event": "vehicle_moved", "message": "Vehicle has moved significantly."}
-                        save_detection_event(vehicle=vehicle, owner=owner, event_type="CAR_MOVEMENT", description="Car moved from its position.", video_frame=frame)
-                        last_alert_time = frame_count
-                        movement_history.clear()  # Reset history after alert
-                
-                prev_box = bbox
-
-                # Draw tracking visualization
-                x1, y1, x2, y2 = map(int, bbox)
-                cv2.rectangle(display_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                cv2.putText(display_frame, f"ID: {track_id}", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-                
-                # Add movement information
-                if prev_box is not None:
-                    cv2.putText(display_frame, f"Current Movement: {movement:.2f}", (x1, y1 - 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-                    cv2.putText(display_frame, f"Cumulative: {cumulative_movement:.2f}", (x1, y1 - 50), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        if bbox is not None:
+            # Draw tracking visualization
+            x1, y1, x2, y2 = map(int, bbox)
+            cv2.rectangle(display_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            cv2.putText(display_frame, f"ID: {session.selected_tracking_id}", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+
+            # Add movement information
+            cv2.putText(display_frame, f"Current Movement: {session.movement:.2f}", (x1, y1 - 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+            cv2.putText(display_frame, f"Cumulative: {session.cumulative_movement:.2f}", (x1, y1 - 50), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
 
         # Resize frame for display
         display_frame = cv2.resize(display_frame, (640, 640))
@@ -144,9 +219,7 @@ def track_vehicle_realtime(cap, selected_tracking_id, vehicle, owner):
         if cv2.waitKey(1) & 0xFF == ord('q'):
             break
 
+    print(f"Vehicle tracking motion gate: {session.gate.stats()}")
+    print(f"Vehicle tracking sampling: {sampler.stats()}")
     cap.release()
     cv2.destroyAllWindows()
-
-
-
-    
@@ -1,14 +1,20 @@
 import cv2
 import torch
+from django.conf import settings
 from ai_models.ai.car_tracking.model import YoloDetector, Tracker
 from ai_models.ai.fire_smoke_detection.model import FireSmokeDetector
+from ai_models.ai.fire_smoke_detection.temporal import fire_confirmer
 from ai_models.ai.authorized_person_detection.model import FaceRecognitionSystem
-# from ai_models.ai.intrusion_detection.model import IntrusionDetector
+from ai_models.ai.intrusion_detection.model import IntrusionDetector
 from ai_models.utils.save_detection_event import save_detection_event
 from ai_models.ai.car_tracking.utils import calculate_movement
+from ai_models.ai.pipeline.preprocess import prepare_batch
+from ai_models.ai.pipeline.frame_bus import get_frame_bus, BLOCK, DROP_OLDEST
+from ai_models.ai.pipeline.sampler import frame_sampler
+from ai_models.ai.pipeline.zones import ZoneMask
 
 class CombinedDetector:
-    def __init__(self):
+    def __init__(self, owner=None, zones=None):
         print("Initializing CombinedDetector...")
         self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
         print(f"Using device: {self.device}")
@@ -21,11 +27,16 @@ class CombinedDetector:
         print("Initializing person detector...")
         self.person_detector = FaceRecognitionSystem(
             yolo_model_path='ai_models/ai/authorized_person_detection/face_detection.pt',
-            face_db_path='ai_models/ai/authorized_person_detection/face_db.pkl',
-            device=self.device
+            device=self.device,
+            owner=owner
         )
-        # self.intrusion_detector = IntrusionDetector(confidence=0.5)
+        print("Initializing intrusion detector...")
+        self.intrusion_detector = IntrusionDetector(confidence=0.5) if getattr(settings, 'INTRUSION_DETECTION', True) else None
         self.tracker = Tracker()
+        # Fire/smoke alerts need several frames' agreement; also decides which frames fire/smoke runs on
+        self.fire_confirmer = fire_confirmer()
+        # Camera zones: models only look at the crop covering them and keep detections inside them
+        self.zones = zones or ZoneMask()
         
         # Alert cooldown parameters
         self.frame_count = 0
@@ -40,7 +51,69 @@ class CombinedDetector:
         self.prev_box = None
         print("CombinedDetector initialization complete.")
 
+    def infer_batch(self, frames, track_car=True, run_fire=None, zones=None):
+        """
+        Run every model over a list of frames. The frames are letterboxed into a
+        single tensor once and each model does one forward pass over the whole
+        batch. run_fire optionally says per frame whether to run fire/smoke
+        detection on it (see fire_schedule). zones gives each frame's ZoneMask
+        (default: this detector's): frames are cropped to their zones before
+        inference and detections outside them are dropped. Returns
+        (car_detections, fire_detections, face_detections, intrusion_detections)
+        per frame, None for models not run.
+        """
+        zones = zones or [self.zones] * len(frames)
+        crops, offsets = [], []
+        for frame, zone in zip(frames, zones):
+            crop, offset = zone.crop(frame)
+            crops.append(crop)
+            offsets.append(offset)
+        # The batch shares one input size; use the largest any camera needs
+        size = max(zone.input_size(frame.shape) for frame, zone in zip(frames, zones))
+        batch = prepare_batch(crops, self.device, size=size, offsets=offsets)
+
+        car_detections = [None] * len(frames)
+        if track_car:
+            car_detections = [zone.filter_detections(d) for zone, d in zip(zones, self.car_detector.detect_batch(batch))]
+
+        fire_detections = [None] * len(frames)
+        fire_indices = [i for i in range(len(frames)) if run_fire is None or run_fire[i]]
+        if fire_indices:
+            fire_batch = batch if len(fire_indices) == len(frames) else batch.select(fire_indices)
+            if self.fire_detector.roi:
+                # Reuses the letterboxed batch as the low-resolution pass; each camera's zones are tiled at full resolution
+                results = self.fire_detector.detect_frames_roi(
+                    [frames[i] for i in fire_indices], zones=[zones[i].rectangles() for i in fire_indices], batch=fire_batch
+                )
+            else:
+                results = self.fire_detector.detect_batch(fire_batch)
+            for i, detections in zip(fire_indices, results):
+                fire_detections[i] = zones[i].filter_boxes(*detections)
+        face_detections = [zone.filter_detections(d) for zone, d in zip(zones, self.person_detector.detect_batch(batch))]
+
+        intrusion_detections = [None] * len(frames)
+        if self.intrusion_detector is not None:
+            intrusion_detections = [zone.filter_detections(d) for zone, d in zip(zones, self.intrusion_detector.detect_batch(batch))]
+        return list(zip(car_detections, fire_detections, face_detections, intrusion_detections))
+
+    def process_batch(self, frames, selected_tracking_id=None, vehicle=None, owner=None):
+        """Process consecutive frames of one stream with batched inference; returns (display_frame, events) per frame"""
+        outputs = self.infer_batch(frames, track_car=bool(selected_tracking_id), run_fire=self.fire_schedule(len(frames)))
+        return [
+            self.handle_detections(frame, output, selected_tracking_id=selected_tracking_id, vehicle=vehicle, owner=owner)
+            for frame, output in zip(frames, outputs)
+        ]
+
     def process_frame(self, frame, selected_tracking_id=None, vehicle=None, owner=None):
+        return self.process_batch([frame], selected_tracking_id=selected_tracking_id, vehicle=vehicle, owner=owner)[0]
+
+    def fire_schedule(self, count=1):
+        """Which of this stream's next `count` frames fire/smoke detection should run on"""
+        return self.fire_confirmer.schedule(count)
+
+    def handle_detections(self, frame, detections, selected_tracking_id=None, vehicle=None, owner=None):
+        """Update trackers and alert state for one frame given its output from infer_batch"""
+        car_detections, fire_detections, face_detections, intrusion_detections = detections
         self.frame_count += 1
         display_frame = frame.copy()
         events = []
@@ -48,7 +121,6 @@ class CombinedDetector:
         # Car Tracking
         if selected_tracking_id:
             print(f"Processing car tracking for ID: {selected_tracking_id}")
-            car_detections = self.car_detector.detect(frame)
             car_tracking_ids, car_boxes = self.tracker.track(car_detections, frame)
             print(f"Car tracking results - IDs: {car_tracking_ids}, Boxes: {car_boxes}")
             
@@ -81,38 +153,36 @@ class CombinedDetector:
                     self.prev_box = bbox
 
         # Fire/Smoke Detection
-        print("Processing fire/smoke detection...")
-        fire_results, custom_names = self.fire_detector.detect(frame)
-        if fire_results and fire_results[0].boxes is not None:
-            boxes = fire_results[0].boxes.xyxy.cpu().numpy()
-            scores = fire_results[0].boxes.conf.cpu().numpy()
-            classes = fire_results[0].boxes.cls.cpu().numpy()
-            
-            for box, score, cls in zip(boxes, scores, classes):
-                class_id = int(cls)
-                label = custom_names.get(class_id, "Unknown")
+        if fire_detections is None:
+            self.fire_confirmer.skip()
+        else:
+            print("Processing fire/smoke detection...")
+            custom_names = self.fire_detector.custom_names
+            boxes, scores, classes = fire_detections
+            labels = [custom_names.get(int(cls), "Unknown") for cls in classes]
+            for box, score, label in zip(boxes, scores, labels):
                 x1, y1, x2, y2 = map(int, box)
                 color = (0, 0, 255) if label == "fire" else (0, 165, 255)
                 cv2.rectangle(display_frame, (x1, y1), (x2, y2), color, 2)
                 cv2.putText(display_frame, label, (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
                 print(f"Detected {label} with confidence {score:.2f}")
-                
-                if self.frame_count - self.last_alert_time > self.alert_cooldown:
-                    if label == "fire":
-                        event = {"event": "fire_detected", "message": "Fire detected!"}
-                        print(f"Fire detection event: {event}")
-                        events.append(event)
-                        save_detection_event(vehicle=None, owner=owner, event_type="ENVIRONMENTAL_HAZARD", description="A fire has occurred", video_frame=frame)
-                    elif label == "smoke":
-                        event = {"event": "smoke_detected", "message": "Smoke detected!"}
-                        print(f"Smoke detection event: {event}")
-                        events.append(event)
-                        save_detection_event(vehicle=None, owner=owner, event_type="ENVIRONMENTAL_HAZARD", description="Smoke has occurred", video_frame=frame)
-                    self.last_alert_time = self.frame_count
+
+            # One alert per newly confirmed kind of hazard, not one per box
+            confirmed_labels = {region.label for region in self.fire_confirmer.update(boxes, scores, labels)}
+            if "fire" in confirmed_labels:
+                event = {"event": "fire_detected", "message": "Fire detected!"}
+                print(f"Fire detection event: {event}")
+                events.append(event)
+                save_detection_event(vehicle=None, owner=owner, event_type="ENVIRONMENTAL_HAZARD", description="A fire has occurred", video_frame=frame)
+            if "smoke" in confirmed_labels:
+                event = {"event": "smoke_detected", "message": "Smoke detected!"}
+                print(f"Smoke detection event: {event}")
+                events.append(event)
+                save_detection_event(vehicle=None, owner=owner, event_type="ENVIRONMENTAL_HAZARD", description="Smoke has occurred", video_frame=frame)
 
         # Person Detection
         print("Processing person detection...")
-        processed_frame, authorized, unauthorized = self.person_detector.process_frame(frame)
+        processed_frame, authorized, unauthorized = self.person_detector.process_frame(frame, detections=face_detections)
         if authorized:
             event = {"event": "authorized", "message": authorized}
             print(f"Authorized person event: {event}")
@@ -123,22 +193,28 @@ class CombinedDetector:
             events.append(event)
             save_detection_event(vehicle=None, owner=owner, event_type="UNAUTHORIZED_ACCESS", description="An unauthorized person is detected", video_frame=frame)
 
-        # # Intrusion Detection (commented out for now)
-        # tracks, suspicious_events = self.intrusion_detector.detect(frame)
-        # for event in suspicious_events:
-        #     if self.frame_count - self.last_alert_time > self.alert_cooldown:
-        #         if event['type'] == 'suspicious_loitering':
-        #             message = f"Suspicious activity detected: Person {event['person_id']} loitering near vehicle {event['car_id']}"
-        #             events.append({"event": "suspicious_activity", "message": message})
-        #             save_detection_event(vehicle=None, owner=owner, event_type="SUSPICIOUS_ACTIVITY", description=message, video_frame=frame)
-        #             self.last_alert_time = self.frame_count
+        # Intrusion Detection
+        if intrusion_detections is not None:
+            _, suspicious_events = self.intrusion_detector.track(intrusion_detections, frame)
+            # The detector reports each loitering spell once, so no extra cooldown is needed here
+            for suspicious_event in suspicious_events:
+                if suspicious_event['type'] == 'suspicious_loitering':
+                    message = f"Suspicious activity detected: Person {suspicious_event['person_id']} loitering near vehicle {suspicious_event['car_id']} for {suspicious_event['duration']} frames"
+                    event = {"event": "suspicious_activity", "message": message}
+                    print(f"Suspicious activity event: {event}")
+                    events.append(event)
+                    save_detection_event(vehicle=None, owner=owner, event_type="SUSPICIOUS_ACTIVITY", description=message, video_frame=frame)
 
         print(f"Total events generated: {len(events)}")
         return display_frame, events
 
-def run_combined_detection(video_path, vehicle_location_x=None, vehicle_location_y=None, vehicle=None, owner=None):
+def run_combined_detection(video_path, vehicle_location_x=None, vehicle_location_y=None, vehicle=None, owner=None, batch_size=1, zones=None):
+    """
+    Run every detector over a video. With batch_size > 1, that many sampled frames
+    are stacked into one forward pass per model, trading a little latency for throughput.
+    """
     print(f"Starting combined detection with video: {video_path}")
-    detector = CombinedDetector()
+    detector = CombinedDetector(owner=owner, zones=zones)
     cap = cv2.VideoCapture(video_path)
     
     if not cap.isOpened():
@@ -148,49 +224,123 @@ def run_combined_detection(video_path, vehicle_location_x=None, vehicle_location
     selected_tracking_id = None
     if vehicle_location_x is not None and vehicle_location_y is not None:
         print(f"Initializing car tracking at coordinates: ({vehicle_location_x}, {vehicle_location_y})")
-        from ai_models.ai.car_tracking.predict import initialize_tracking_with_buffer
-        cap_car, selected_tracking_id, initial_box = initialize_tracking_with_buffer(
-            video_path, vehicle_location_x, vehicle_location_y
+        from ai_models.ai.car_tracking.predict import select_vehicle
+        # Select on the main capture with the detector's own tracker, so tracking
+        # carries on from the next frame instead of re-opening the video
+        selected_tracking_id, initial_box = select_vehicle(
+            cap, vehicle_location_x, vehicle_location_y, detector.tracker, detector.car_detector,
+            zones=detector.zones
         )
-        cap_car.release()
         print(f"Car tracking initialized with ID: {selected_tracking_id}")
 
-    # Skip frames for better performance
-    skip_frames = 2
-    frame_count = 0
+    # Skip frames adaptively so the detectors keep up with the source
+    sampler = frame_sampler(cap)
+    pending_frames = []
 
     while True:
-        ret, frame = cap.read()
+        ret, frame = sampler.read(cap)
         if not ret:
             print("End of video stream")
             break
 
-        frame_count += 1
-        if frame_count % skip_frames != 0:
+        frame_count = sampler.frame_index
+
+        pending_frames.append(frame)
+        if len(pending_frames) < batch_size:
             continue
 
-        print(f"\nProcessing frame {frame_count}")
-        # Process frame with all detectors
-        display_frame, events = detector.process_frame(
-            frame, 
+        print(f"\nProcessing frames up to {frame_count}")
+        # Process the batch with all detectors
+        outputs = detector.process_batch(
+            pending_frames,
             selected_tracking_id=selected_tracking_id,
             vehicle=vehicle,
             owner=owner
         )
+        pending_frames = []
 
-        # Show the combined frame
-        display_frame = cv2.resize(display_frame, (640, 640))
-        cv2.imshow("Combined Detection", display_frame)
-        
-        # Yield any events
-        for event in events:
-            print(f"Yielding event: {event}")
-            yield event
+        for display_frame, events in outputs:
+            # Show the combined frame
+            display_frame = cv2.resize(display_frame, (640, 640))
+            cv2.imshow("Combined Detection", display_frame)
+
+            # Yield any events
+            for event in events:
+                print(f"Yielding event: {event}")
+                yield event
 
         if cv2.waitKey(1) & 0xFF == ord('q'):
             print("User requested to quit")
             break
 
+    # Flush a partially filled batch at the end of the video
+    if pending_frames:
+        for display_frame, events in detector.process_batch(pending_frames, selected_tracking_id=selected_tracking_id, vehicle=vehicle, owner=owner):
+            for event in events:
+                yield event
+
+    print(f"Combined detection sampling: {sampler.stats()}")
     print("Cleaning up resources")
     cap.release()
-    cv2.destroyAllWindows() 
\ No newline at end of file
+    cv2.destroyAllWindows()
+
+def start_video_detectors(video_path, vehicle_location_x=None, vehicle_location_y=None, vehicle=None, owner=None, detectors=('car', 'fire', 'person'), zones=None, video_type='upload'):
+    """
+    Open a video once and start the selected detectors on it, restricted to
+    the video's zones if a ZoneMask is given. video_type is the Video's
+    ('upload' or 'stream'). Returns the producers for merge_event_streams
+    and a callable that stops them.
+    """
+    from ai_models.ai.car_tracking.predict import initialize_tracking_with_buffer, track_vehicle_realtime, VehicleTrackingSession
+    from ai_models.ai.fire_smoke_detection.predict import detect_fire_smoke
+    from ai_models.ai.authorized_person_detection.predict import run_recognition
+
+    # Decode the source once and fan the frames out to every detector.
+    # Uploaded files keep every frame, so the slowest detector sets the pace.
+    # Live cameras share the process-wide decoder and drop stale frames, so a
+    # slow detector can't stall the others or fall behind real time.
+    if video_type == 'stream':
+        bus = get_frame_bus(video_path)
+        frame_options = {'maxsize': 2, 'drop_policy': DROP_OLDEST}
+    else:
+        bus = get_frame_bus(video_path, shared=False)
+        frame_options = {'maxsize': 32, 'drop_policy': BLOCK}
+    bus.open()
+
+    subscriptions = []
+    producers = {}
+
+    if 'car' in detectors and vehicle_location_x is not None and vehicle_location_y is not None:
+        car_frames = bus.subscribe("car_tracking", **frame_options)
+        subscriptions.append(car_frames)
+
+        def car_tracking():
+            # Select the vehicle from the shared stream instead of re-opening the source
+            cap, session = initialize_tracking_with_buffer(
+                video_path, vehicle_location_x, vehicle_location_y, cap=car_frames,
+                session=VehicleTrackingSession(zones=zones)
+            )
+            if not session.selected_tracking_id:
+                car_frames.release()
+                return
+            yield from track_vehicle_realtime(cap, session, vehicle, owner)
+
+        producers["Car tracking"] = car_tracking
+
+    if 'fire' in detectors:
+        fire_frames = bus.subscribe("fire_smoke", **frame_options)
+        subscriptions.append(fire_frames)
+        producers["Fire detection"] = lambda: detect_fire_smoke(video_path, owner, cap=fire_frames, zones=zones)
+
+    if 'person' in detectors:
+        person_frames = bus.subscribe("person", **frame_options)
+        subscriptions.append(person_frames)
+        producers["Person detection"] = lambda: run_recognition(video_path, owner, cap=person_frames, zones=zones)
+
+    def stop():
+        # Ending the subscriptions ends the detector loops
+        for subscription in subscriptions:
+            subscription.release()
+
+    bus.start()
+    return producers, stop
@@ -1,20 +1,109 @@
-from ultralytics import YOLO
-import torch
+import numpy as np
+from django.conf import settings
+from ai_models.ai.model_registry import get_device, get_yolo_model, inference_lock, FIRE_SMOKE_WEIGHTS
+from ai_models.ai.pipeline.preprocess import prepare_batch, INPUT_SIZE
+from ai_models.ai.pipeline.executor import get_inference_executor
+from ai_models.ai.geometry import nms
+from .utils import roi_crops
 
 class FireSmokeDetector:
-    def __init__(self, confidence=0.5):
-        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        self.model = YOLO("ai_models/ai/fire_smoke_detection/fire_smoke_detection.pt")
+    def __init__(self, confidence=0.5, roi=None, max_crops=None):
+        self.device = get_device()
         self.custom_names = {0: "smoke", 1: "fire", 2: "none"}
         self.confidence = confidence
-        
-        if self.device == 'cuda':
-            print("CUDA Available:", torch.cuda.is_available())
-            print("GPU:", torch.cuda.get_device_name(0))
-            self.model.to("cuda")
-        else:
-            print("CUDA not available, using CPU.")
+        # ROI mode: re-run full-resolution crops around weak full-frame candidates (and zones)
+        self.roi = getattr(settings, 'FIRE_SMOKE_ROI', True) if roi is None else roi
+        self.max_crops = max_crops or getattr(settings, 'FIRE_SMOKE_ROI_MAX_CROPS', 4)
+        # Small plumes score low once the frame is downscaled, so candidates are taken at half confidence
+        self.candidate_confidence = confidence / 2
+
+    @property
+    def model(self):
+        # Loaded once per process on first use and shared by every detector
+        return get_yolo_model(FIRE_SMOKE_WEIGHTS)
 
     def detect(self, frame):
-        results = self.model.predict(frame, conf=self.confidence)
+        with inference_lock(self.model):
+            results = self.model.predict(frame, conf=self.confidence)
         return results, self.custom_names
+
+    def detect_batch(self, batch, confidence=None):
+        """
+        Detect on every frame of a PreparedBatch in a single forward pass.
+        Returns (boxes, scores, classes) arrays per frame, boxes in frame coordinates.
+        """
+        with inference_lock(self.model):
+            results = self.model.predict(batch.tensor, conf=confidence or self.confidence, verbose=False)
+        detections = []
+        for i, result in enumerate(results):
+            boxes = batch.scale_boxes(i, result.boxes.xyxy.cpu().numpy())
+            scores = result.boxes.conf.cpu().numpy()
+            classes = result.boxes.cls.cpu().numpy()
+            detections.append((boxes, scores, classes))
+        return detections
+
+    def detect_frames(self, frames):
+        """Detect on a list of frames in a single forward pass"""
+        return self.detect_batch(prepare_batch(frames, self.device))
+
+    def detect_frames_roi(self, frames, zones=None, batch=None):
+        """
+        Two-pass detection for large frames: a downscaled full-frame pass finds
+        candidates at low confidence, then crops around them (and tiles over
+        each frame's zones, a list of xyxy rectangles per frame) are detected
+        at full resolution in one more batched pass. Pass `batch` when the
+        frames were already prepared. Returns (boxes, scores, classes) per frame.
+        """
+        batch = batch if batch is not None else prepare_batch(frames, self.device)
+        coarse = self.detect_batch(batch, confidence=self.candidate_confidence)
+        return self.refine(frames, coarse, zones)
+
+    def refine(self, frames, coarse, zones=None):
+        """Merge full-frame candidates with full-resolution detections on crops around them"""
+        crops, crop_frames, offsets = [], [], []
+        for i, (frame, (boxes, scores, _)) in enumerate(zip(frames, coarse)):
+            order = np.argsort(-scores)
+            for x1, y1, x2, y2 in roi_crops(frame.shape, boxes[order], zones[i] if zones else None, INPUT_SIZE, self.max_crops):
+                crops.append(frame[y1:y2, x1:x2])
+                crop_frames.append(i)
+                offsets.append((x1, y1))
+
+        crop_detections = self.detect_frames(crops) if crops else []
+
+        merged = []
+        for i, (boxes, scores, classes) in enumerate(coarse):
+            # Weak candidates only count once a full-resolution crop confirms them
+            keep = scores >= self.confidence
+            all_boxes, all_scores, all_classes = [boxes[keep]], [scores[keep]], [classes[keep]]
+            for frame_index, (x, y), (crop_boxes, crop_scores, crop_classes) in zip(crop_frames, offsets, crop_detections):
+                if frame_index == i and len(crop_boxes):
+                    all_boxes.append(crop_boxes + np.array([x, y, x, y], dtype=np.float32))
+                    all_scores.append(crop_scores)
+                    all_classes.append(crop_classes)
+
+            boxes, scores, classes = np.concatenate(all_boxes), np.concatenate(all_scores), np.concatenate(all_classes)
+            keep = nms(boxes, scores, classes)
+            merged.append((boxes[keep], scores[keep], classes[keep]))
+        return merged
+
+    def detect_items_roi(self, items):
+        """detect_frames_roi over (frame, zones) pairs, as submitted to the ROI executor"""
+        return self.detect_frames_roi([frame for frame, _ in items], zones=[zones for _, zones in items])
+
+    def detect_shared(self, frame, zones=None):
+        """
+        Detect on one frame through the process-wide executor. zones are xyxy
+        rectangles in frame coordinates to tile at full resolution in ROI mode.
+        Returns (boxes, scores, classes).
+        """
+        if self.roi:
+            return self.executor((frame, zones))
+        return self.executor(frame)
+
+    @property
+    def executor(self):
+        # Batches single-frame calls from every fire/smoke stream in the process.
+        # In ROI mode each item is a (frame, zones) pair.
+        if self.roi:
+            return get_inference_executor(f"{FIRE_SMOKE_WEIGHTS}@{self.confidence}:roi", self.detect_items_roi)
+        return get_inference_executor(f"{FIRE_SMOKE_WEIGHTS}@{self.confidence}", self.detect_frames)
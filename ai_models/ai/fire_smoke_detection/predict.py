@@ -3,44 +3,61 @@
 import cv2
 from ai_models.ai.fire_smoke_detection.model import FireSmokeDetector  # assuming you saved the class here
 from ai_models.utils.save_detection_event import save_detection_event
-# Initialize once
-fire_smoke_detector = FireSmokeDetector(confidence=0.4)
+from ai_models.ai.pipeline.motion import motion_gate
+from ai_models.ai.pipeline.sampler import frame_sampler
+from ai_models.ai.fire_smoke_detection.temporal import fire_confirmer
+from ai_models.ai.pipeline.zones import ZoneMask, shift_boxes
 
-def detect_fire_smoke(video_path, owner):
-    cap = cv2.VideoCapture(video_path)
+def detect_fire_smoke(video_path, owner, cap=None, zones=None):
+    # Reuse an already open capture (e.g. a FrameBus subscription) when given
+    if cap is None:
+        cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
             raise ValueError("Error: Unable to open video or stream.")
+
+    # Weights are shared; frames from every stream are batched through the model's executor
+    fire_smoke_detector = FireSmokeDetector(confidence=0.4)
+    custom_names = fire_smoke_detector.custom_names
+    # Static scenes are still checked at a heartbeat rate
+    gate = motion_gate('fire')
+    # Skips frames to stay at the live edge when detection is slower than the source
+    sampler = frame_sampler(cap)
+    # Only alerts on fire/smoke seen on several of the last frames
+    confirmer = fire_confirmer()
+    # Only look inside the camera's zones, if it has any
+    zones = zones or ZoneMask()
     
     while True:
-        ret, frame = cap.read()
+        # Sample sparsely while quiet, every frame while a candidate region is being confirmed
+        sampler.set_min_stride(1 if confirmer.active else confirmer.quiet_stride)
+        ret, frame = sampler.read(cap)
         if not ret:
             break
 
-        # Detect fire or smoke
-        results, custom_names = fire_smoke_detector.detect(frame)
+        # A candidate is followed up even if the scene stopped moving
+        if not gate.should_infer(frame) and not confirmer.active:
+            continue
 
-        fire_detected = False
-        smoke_detected = False
+        # Frames from a FrameBus are shared and read-only; draw on our own copy
+        frame = frame.copy()
 
-        if results and results[0].boxes is not None:
-            boxes = results[0].boxes.xyxy.cpu().numpy()  # (x1, y1, x2, y2)
-            scores = results[0].boxes.conf.cpu().numpy()
-            classes = results[0].boxes.cls.cpu().numpy()
+        # Detect fire or smoke
+        crop, offset = zones.crop(frame)
+        boxes, scores, classes = fire_smoke_detector.detect_shared(crop, zones.rectangles(offset))
+        boxes, scores, classes = zones.filter_boxes(shift_boxes(boxes, offset), scores, classes)
+        labels = [custom_names.get(int(cls), "Unknown") for cls in classes]
+        confirmed = confirmer.update(boxes, scores, labels)
 
-            for box, score, cls in zip(boxes, scores, classes):
-                class_id = int(cls)
-                label = custom_names.get(class_id, "Unknown")
-                x1, y1, x2, y2 = map(int, box)
+        for box, label in zip(boxes, labels):
+            x1, y1, x2, y2 = map(int, box)
 
-                if label == "fire":
-                    fire_detected = True
-                elif label == "smoke":
-                    smoke_detected = True
+            # Draw boxes
+            color = (0, 0, 255) if label == "fire" else (0, 165, 255)
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(frame, label, (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 1, color, 2)
 
-                # Draw boxes
-                color = (0, 0, 255) if label == "fire" else (0, 165, 255)
-                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                cv2.putText(frame, label, (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 1, color, 2)
+        fire_detected = bool(confirmer.confirmed("fire"))
+        smoke_detected = bool(confirmer.confirmed("smoke"))
 
         # --- Draw Dialog if detected ---
         if fire_detected or smoke_detected:
@@ -57,12 +74,16 @@ def detect_fire_smoke(video_path, owner):
         if cv2.waitKey(1) & 0xFF == ord('q'):
             break
 
-        # Send event if detected
-        if fire_detected:
+        # Send one event per newly confirmed kind of hazard
+        confirmed_labels = {region.label for region in confirmed}
+        if "fire" in confirmed_labels:
             yield {"event": "fire_detected", "message": "Fire detected!"}
             save_detection_event(vehicle=None, owner=owner, event_type="ENVIRONMENTAL_HAZARD", description="A fire has occoured", video_frame=frame)
-        if smoke_detected:
+        if "smoke" in confirmed_labels:
             yield {"event": "smoke_detected", "message": "Smoke detected!"}
             save_detection_event(vehicle=None, owner=owner, event_type="ENVIRONMENTAL_HAZARD", description="Smoke has occoured", video_frame=frame)
+    print(f"Fire/smoke motion gate: {gate.stats()}")
+    print(f"Fire/smoke sampling: {sampler.stats()}")
+    print(f"Fire/smoke confirmation: {confirmer.stats()}")
     cap.release()
-    cv2.destroyAllWindows()
+    cv2.destroyAllWindows()
\ No newline at end of file
@@ -0,0 +1,137 @@
+from collections import deque
+import numpy as np
+from django.conf import settings
+from ai_models.ai.geometry import box_iou
+
+
+class Region:
+    """
+    One place in the frame where fire or smoke has been seen, with the best
+    detection score it got on each of the last `window` analysed frames (0 when
+    it was not detected there).
+    """
+
+    def __init__(self, label, box, window):
+        self.label = label
+        self.box = np.asarray(box, dtype=np.float32)
+        self.scores = deque(maxlen=window)
+        self.confirmed = False
+
+    @property
+    def hits(self):
+        return sum(1 for score in self.scores if score > 0)
+
+    @property
+    def score(self):
+        """Mean score over the frames the region was detected on"""
+        hits = [score for score in self.scores if score > 0]
+        return float(np.mean(hits)) if hits else 0.0
+
+
+class TemporalConfirmer:
+    """
+    Turns per-frame fire/smoke boxes into alerts by sliding-window voting: a
+    region is confirmed once it has been detected on `required` of the last
+    `window` analysed frames, and is forgotten after a whole window without a
+    detection. Flickering single-frame false positives never reach `required`,
+    and a fire that stays lit alerts once instead of on every frame.
+
+    While no region is being watched, schedule() only asks for inference on
+    every `quiet_stride`-th frame; as soon as a candidate appears it asks for
+    every frame until the region is confirmed or forgotten.
+    """
+
+    def __init__(self, window=8, required=4, iou_threshold=0.1, quiet_stride=5):
+        self.window = window
+        self.required = min(required, window)
+        self.iou_threshold = iou_threshold
+        self.quiet_stride = max(1, quiet_stride)
+        self.regions = []
+        self.frames_since_inference = 0
+
+        # Stats
+        self.frames_inferred = 0
+        self.frames_skipped = 0
+        self.candidates = 0
+        self.confirmations = 0
+
+    @property
+    def active(self):
+        """Whether any region is being watched"""
+        return bool(self.regions)
+
+    def confirmed(self, label=None):
+        return [r for r in self.regions if r.confirmed and (label is None or r.label == label)]
+
+    def schedule(self, count=1):
+        """Whether to run fire/smoke inference on each of the next `count` frames"""
+        if self.active:
+            return [True] * count
+        due = []
+        since = self.frames_since_inference
+        for _ in range(count):
+            run = since + 1 >= self.quiet_stride
+            due.append(run)
+            since = 0 if run else since + 1
+        return due
+
+    def skip(self):
+        """Record a frame fire/smoke inference did not run on"""
+        self.frames_since_inference += 1
+        self.frames_skipped += 1
+
+    def update(self, boxes, scores, labels):
+        """
+        Vote with one analysed frame's detections (xyxy boxes, scores and class
+        labels). Returns the regions confirmed by this frame.
+        """
+        self.frames_since_inference = 0
+        self.frames_inferred += 1
+        frame_scores = {}  # region -> best score on this frame
+
+        for box, score, label in zip(np.asarray(boxes).reshape(-1, 4), scores, labels):
+            candidates = [r for r in self.regions if r.label == label]
+            region = None
+            if candidates:
+                overlaps = box_iou(box, [r.box for r in candidates])[0]
+                best = int(np.argmax(overlaps))
+                if overlaps[best] >= self.iou_threshold:
+                    region = candidates[best]
+                    # Follow smoke that spreads or drifts
+                    region.box = 0.5 * region.box + 0.5 * np.asarray(box, dtype=np.float32)
+            if region is None:
+                region = Region(label, box, self.window)
+                self.regions.append(region)
+                self.candidates += 1
+            frame_scores[region] = max(frame_scores.get(region, 0.0), float(score))
+
+        confirmed = []
+        for region in self.regions:
+            region.scores.append(frame_scores.get(region, 0.0))
+            if not region.confirmed and region.hits >= self.required:
+                region.confirmed = True
+                self.confirmations += 1
+                confirmed.append(region)
+
+        # Forget regions that went a whole window without a detection
+        self.regions = [r for r in self.regions if len(r.scores) < self.window or r.hits > 0]
+        return confirmed
+
+    def stats(self):
+        return {
+            'regions': len(self.regions),
+            'confirmed_regions': len(self.confirmed()),
+            'frames_inferred': self.frames_inferred,
+            'frames_skipped': self.frames_skipped,
+            'candidates': self.candidates,
+            'confirmations': self.confirmations,
+        }
+
+
+def fire_confirmer():
+    """A TemporalConfirmer configured from the FIRE_CONFIRM_* settings"""
+    return TemporalConfirmer(
+        window=getattr(settings, 'FIRE_CONFIRM_WINDOW', 8),
+        required=getattr(settings, 'FIRE_CONFIRM_REQUIRED', 4),
+        quiet_stride=getattr(settings, 'FIRE_QUIET_STRIDE', 5),
+    )
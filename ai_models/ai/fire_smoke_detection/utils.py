@@ -0,0 +1,47 @@
+import numpy as np
+
+
+def roi_crops(frame_shape, boxes, zones=None, crop_size=640, max_crops=4, min_scale=1.5):
+    """
+    Square crops (x1, y1, x2, y2) of crop_size frame pixels to re-run detection
+    on at full resolution: one centered on each candidate box (best first),
+    then tiles covering each configured zone. Candidates already inside an
+    earlier crop, or too big to gain from more resolution, get no crop of
+    their own. Returns no crops when the frame is only slightly larger than
+    crop_size (less than min_scale), since the full-frame pass was already
+    close to native resolution.
+    """
+    h, w = frame_shape[:2]
+    if max(h, w) < crop_size * min_scale:
+        return []
+    size_x, size_y = min(crop_size, w), min(crop_size, h)
+
+    def crop_at(cx, cy):
+        x1 = int(min(max(cx - size_x / 2, 0), w - size_x))
+        y1 = int(min(max(cy - size_y / 2, 0), h - size_y))
+        return (x1, y1, x1 + size_x, y1 + size_y)
+
+    def covered(box, crops):
+        return any(c[0] <= box[0] and c[1] <= box[1] and box[2] <= c[2] and box[3] <= c[3] for c in crops)
+
+    crops = []
+    for box in np.asarray(boxes, dtype=np.float32).reshape(-1, 4):
+        if len(crops) >= max_crops:
+            return crops
+        if box[2] - box[0] > crop_size / 2 or box[3] - box[1] > crop_size / 2:
+            continue
+        if not covered(box, crops):
+            crops.append(crop_at((box[0] + box[2]) / 2, (box[1] + box[3]) / 2))
+
+    for zone in zones or []:
+        zx1, zy1, zx2, zy2 = zone
+        # Tiles overlap by an eighth so objects on a seam are whole in one of them
+        step_x, step_y = size_x * 7 // 8, size_y * 7 // 8
+        for y in range(int(zy1), max(int(zy1) + 1, int(zy2) - size_y // 8), step_y):
+            for x in range(int(zx1), max(int(zx1) + 1, int(zx2) - size_x // 8), step_x):
+                if len(crops) >= max_crops:
+                    return crops
+                tile = crop_at(x + size_x / 2, y + size_y / 2)
+                if tile not in crops:
+                    crops.append(tile)
+    return crops
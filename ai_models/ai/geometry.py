@@ -0,0 +1,137 @@
+"""
+Batched box geometry shared by the detection pipelines. Boxes are (N, 4)
+float32 arrays of xyxy corners unless a function says otherwise; pairwise
+functions return an (N, M) matrix for N boxes against M others.
+"""
+import numpy as np
+
+
+def as_boxes(boxes):
+    """Any box or sequence of boxes as an (N, 4) float32 array"""
+    return np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+
+
+def ltwh_to_xyxy(boxes):
+    """Convert (N, 4) left, top, width, height boxes to xyxy"""
+    boxes = as_boxes(boxes).copy()
+    boxes[:, 2:] += boxes[:, :2]
+    return boxes
+
+
+def xyxy_to_ltwh(boxes):
+    boxes = as_boxes(boxes).copy()
+    boxes[:, 2:] -= boxes[:, :2]
+    return boxes
+
+
+def box_areas(boxes):
+    boxes = as_boxes(boxes)
+    return (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+
+def box_centers(boxes):
+    """(N, 2) center points"""
+    boxes = as_boxes(boxes)
+    return (boxes[:, :2] + boxes[:, 2:]) / 2
+
+
+def box_iou(boxes, others):
+    """(N, M) intersection-over-union"""
+    boxes, others = as_boxes(boxes), as_boxes(others)
+    x1 = np.maximum(boxes[:, None, 0], others[None, :, 0])
+    y1 = np.maximum(boxes[:, None, 1], others[None, :, 1])
+    x2 = np.minimum(boxes[:, None, 2], others[None, :, 2])
+    y2 = np.minimum(boxes[:, None, 3], others[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    union = box_areas(boxes)[:, None] + box_areas(others)[None, :] - intersection
+    return intersection / np.maximum(union, 1e-6)
+
+
+def center_distances(boxes, others):
+    """(N, M) distance between box centers"""
+    delta = box_centers(boxes)[:, None, :] - box_centers(others)[None, :, :]
+    return np.hypot(delta[..., 0], delta[..., 1])
+
+
+def paired_center_distances(boxes, others):
+    """(N,) distance between the centers of boxes[i] and others[i], e.g. a track's movement between frames"""
+    delta = box_centers(boxes) - box_centers(others)
+    return np.hypot(delta[:, 0], delta[:, 1])
+
+
+def point_box_distance(points, boxes):
+    """(N, M) distance from each (x, y) point to the nearest edge of each box; 0 inside it"""
+    points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+    boxes = as_boxes(boxes)
+    px, py = points[:, 0:1], points[:, 1:2]
+    dx = np.maximum(np.maximum(boxes[None, :, 0] - px, px - boxes[None, :, 2]), 0)
+    dy = np.maximum(np.maximum(boxes[None, :, 1] - py, py - boxes[None, :, 3]), 0)
+    return np.hypot(dx, dy)
+
+
+def nearest_box(boxes, point):
+    """Index of the box whose center is closest to an (x, y) point and that distance, or (-1, inf) without boxes"""
+    boxes = as_boxes(boxes)
+    if len(boxes) == 0:
+        return -1, float('inf')
+    delta = box_centers(boxes) - np.asarray(point, dtype=np.float32)
+    distances = np.hypot(delta[:, 0], delta[:, 1])
+    best = int(np.argmin(distances))
+    return best, float(distances[best])
+
+
+def points_in_polygon(points, polygon):
+    """Whether each (x, y) point lies inside a polygon given as (K, 2) vertices (even-odd rule)"""
+    points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+    polygon = np.asarray(polygon, dtype=np.float32).reshape(-1, 2)
+    x, y = points[:, 0:1], points[:, 1:2]
+    x1, y1 = polygon[:, 0], polygon[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    # Edges that straddle the point's horizontal line and cross it to the right of the point
+    straddles = (y1 > y) != (y2 > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crossing_x = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    crossings = straddles & (x < crossing_x)
+    return np.count_nonzero(crossings, axis=1) % 2 == 1
+
+
+def nms(boxes, scores, classes, iou_threshold=0.5):
+    """Class-aware non-maximum suppression; returns the indices of the boxes to keep, best first"""
+    boxes = as_boxes(boxes)
+    scores = np.asarray(scores, dtype=np.float32)
+    classes = np.asarray(classes)
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    # Shift every class into its own region so boxes of different classes never overlap
+    shifted = boxes + classes.astype(np.float32)[:, None] * (boxes.max() + 1)
+    overlaps = box_iou(shifted, shifted)
+
+    order = np.argsort(-scores, kind='stable')
+    suppressed = np.zeros(len(boxes), dtype=bool)
+    keep = []
+    for i in order:
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        suppressed |= overlaps[i] > iou_threshold
+    return np.array(keep, dtype=np.int64)
+
+
+def path_lengths(histories):
+    """
+    Distance travelled by the center of each track over its history. histories
+    is (N, T, 4); rows of a shorter history are padded with NaN.
+    """
+    histories = np.asarray(histories, dtype=np.float32)
+    centers = (histories[..., :2] + histories[..., 2:]) / 2
+    steps = np.diff(centers, axis=1)
+    return np.nansum(np.hypot(steps[..., 0], steps[..., 1]), axis=1)
+
+
+def track_speeds(histories, fps=30):
+    """Speed of each track in pixels per second from (N, T, 4) histories (NaN padded)"""
+    histories = np.asarray(histories, dtype=np.float32)
+    lengths = np.count_nonzero(~np.isnan(histories[..., 0]), axis=1)
+    elapsed = lengths / fps
+    return np.where(lengths >= 2, path_lengths(histories) / np.maximum(elapsed, 1e-12), 0.0)
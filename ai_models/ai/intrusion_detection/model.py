@@ -1,30 +1,81 @@
-from ultralytics import YOLO
-import torch
 import numpy as np
 from deep_sort_realtime.deepsort_tracker import DeepSort
+from ai_models.ai.model_registry import get_device, get_yolo_model, inference_lock, INTRUSION_DETECTION_WEIGHTS
+from ai_models.ai.pipeline.preprocess import prepare_batch
+from ai_models.ai.geometry import box_centers
+from .utils import SpatialGrid, appearance_embeddings
+
+class TrackState:
+    """
+    Loitering state of the confirmed tracks as parallel numpy arrays, one row
+    per track, so a frame's update is a handful of array operations instead
+    of a Python loop per track.
+    """
+
+    def __init__(self):
+        self.ids = []
+        self.rows = {}  # track_id -> row
+        self.positions = np.empty((0, 4), dtype=np.float32)  # ltrb
+        self.class_ids = np.empty(0, dtype=np.int64)
+        self.loitering = np.empty(0, dtype=np.int64)  # consecutive frames without movement
+        self.alerted = np.empty(0, dtype=bool)  # already reported during this loitering spell
+
+    def __len__(self):
+        return len(self.ids)
+
+    def update(self, ids, positions, class_ids, movement_threshold=5):
+        """
+        Replace the state with this frame's tracks; tracks that are gone are
+        dropped. Returns the movement of each track since the last frame.
+        """
+        positions = np.asarray(positions, dtype=np.float32).reshape(-1, 4)
+        previous = np.array([self.rows.get(track_id, -1) for track_id in ids], dtype=np.int64)
+        known = previous >= 0
+
+        movement = np.zeros(len(ids), dtype=np.float32)
+        delta = positions[known, :2] - self.positions[previous[known], :2]
+        movement[known] = np.hypot(delta[:, 0], delta[:, 1])
+
+        # Tracks that barely moved keep counting; anything else (or a new track) starts over
+        still = known & (movement < movement_threshold)
+        loitering = np.zeros(len(ids), dtype=np.int64)
+        loitering[still] = self.loitering[previous[still]] + 1
+        alerted = np.zeros(len(ids), dtype=bool)
+        alerted[still] = self.alerted[previous[still]]
+
+        self.ids = list(ids)
+        self.rows = {track_id: row for row, track_id in enumerate(ids)}
+        self.positions = positions
+        self.class_ids = np.asarray(class_ids, dtype=np.int64).reshape(-1)
+        self.loitering = loitering
+        self.alerted = alerted
+        return movement
 
 class IntrusionDetector:
-    def __init__(self, confidence=0.5):
-        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        self.model = YOLO("ai_models/ai/intrusion_detection/intrusion_detection.pt")
-        self.tracker = DeepSort(max_age=30)
+    def __init__(self, confidence=0.5, vehicle_classes=(2,)):
+        self.device = get_device()
+        # Loitering only needs tracks to stay put, so a colour histogram replaces DeepSort's
+        # mobilenet embedder, which would cost a second CNN pass per frame next to the vehicle tracker
+        self.tracker = DeepSort(max_age=30, embedder=None)
         self.confidence = confidence
-        
+        # Model classes counted as vehicles; every other tracked class can loiter near one
+        self.vehicle_classes = np.array(vehicle_classes, dtype=np.int64)
+
         # Tracking data
-        self.tracked_objects = {}  # track_id -> {class_id, last_position, loitering_time}
+        self.state = TrackState()
         self.loitering_threshold = 30  # frames to consider as loitering
         self.proximity_threshold = 100  # pixels to consider as "near" vehicle
-        
-        if self.device == 'cuda':
-            print("CUDA Available:", torch.cuda.is_available())
-            print("GPU:", torch.cuda.get_device_name(0))
-            self.model.to("cuda")
-        else:
-            print("CUDA not available, using CPU.")
+        self.movement_threshold = 5  # pixels per frame still considered "not moving"
+
+    @property
+    def model(self):
+        # Loaded once per process on first use and shared by every detector
+        return get_yolo_model(INTRUSION_DETECTION_WEIGHTS)
 
     def detect(self, frame):
         # Detect objects
-        results = self.model.predict(frame, conf=self.confidence)
+        with inference_lock(self.model):
+            results = self.model.predict(frame, conf=self.confidence)
         detections = []
 
         # Process detections
@@ -36,77 +87,61 @@ class IntrusionDetector:
                 class_id = int(box.cls[0])
                 detections.append(([x1, y1, w, h], conf, class_id, None))
 
-        # Track objects
-        tracks = self.tracker.update_tracks(detections, frame=frame)
-        
-        # Update tracking data and check for suspicious behavior
+        return self.track(detections, frame)
+
+    def detect_batch(self, batch):
+        """Detect on every frame of a PreparedBatch in one forward pass; returns tracker detections per frame"""
+        with inference_lock(self.model):
+            results = self.model.predict(batch.tensor, conf=self.confidence, verbose=False)
+        detections = []
+        for i, result in enumerate(results):
+            frame_detections = []
+            xyxy = batch.scale_boxes(i, result.boxes.xyxy.cpu().numpy())
+            for box, conf, cls in zip(xyxy, result.boxes.conf.cpu().numpy(), result.boxes.cls.cpu().numpy()):
+                x1, y1, x2, y2 = map(int, box)
+                frame_detections.append(([x1, y1, x2 - x1, y2 - y1], float(conf), int(cls), None))
+            detections.append(frame_detections)
+        return detections
+
+    def detect_frames(self, frames):
+        return self.detect_batch(prepare_batch(frames, self.device))
+
+    def track(self, detections, frame):
+        """Track one frame's detections and check for suspicious behavior; returns (tracks, suspicious_events)"""
+        tracks = self.tracker.update_tracks(detections, embeds=appearance_embeddings(frame, detections), frame=frame)
         suspicious_events = self.update_tracking_data(tracks)
-        
         return tracks, suspicious_events
 
     def update_tracking_data(self, tracks):
-        suspicious_events = []
-        current_tracks = set()
+        confirmed = [track for track in tracks if track.is_confirmed()]
+        ids = [track.track_id for track in confirmed]
+        positions = [track.to_ltrb() for track in confirmed]
+        class_ids = [track.det_class if track.det_class is not None else -1 for track in confirmed]
 
-        for track in tracks:
-            if not track.is_confirmed():
-                continue
+        state = self.state
+        state.update(ids, positions, class_ids, self.movement_threshold)
 
-            track_id = track.track_id
-            current_tracks.add(track_id)
-            ltrb = track.to_ltrb()
-            class_id = track.det_class  # Changed from get_class() to det_class
-
-            # Initialize tracking data for new tracks
-            if track_id not in self.tracked_objects:
-                self.tracked_objects[track_id] = {
-                    'class_id': class_id,
-                    'last_position': ltrb,
-                    'loitering_time': 0
-                }
-            else:
-                # Update existing track
-                track_data = self.tracked_objects[track_id]
-                
-                # Check for movement
-                last_pos = track_data['last_position']
-                current_pos = ltrb
-                movement = np.sqrt(
-                    (current_pos[0] - last_pos[0])**2 + 
-                    (current_pos[1] - last_pos[1])**2
-                )
-
-                # Update loitering time if minimal movement
-                if movement < 5:  # threshold for considering as "not moving"
-                    track_data['loitering_time'] += 1
-                else:
-                    track_data['loitering_time'] = 0
-
-                # Check for suspicious behavior
-                if track_data['loitering_time'] > self.loitering_threshold:
-                    # Check if near any vehicle
-                    for other_track in tracks:
-                        if other_track.track_id != track_id and other_track.det_class == 2:  # Assuming 2 is vehicle class
-                            other_ltrb = other_track.to_ltrb()
-                            distance = np.sqrt(
-                                (current_pos[0] - other_ltrb[0])**2 + 
-                                (current_pos[1] - other_ltrb[1])**2
-                            )
-                            
-                            if distance < self.proximity_threshold:
-                                suspicious_events.append({
-                                    'type': 'suspicious_loitering',
-                                    'person_id': track_id,
-                                    'car_id': other_track.track_id
-                                })
-                                break
-
-                # Update position
-                track_data['last_position'] = current_pos
-
-        # Clean up old tracks
-        for track_id in list(self.tracked_objects.keys()):
-            if track_id not in current_tracks:
-                del self.tracked_objects[track_id]
-
-        return suspicious_events 
\ No newline at end of file
+        is_vehicle = np.isin(state.class_ids, self.vehicle_classes)
+        loiterers = np.flatnonzero((state.loitering > self.loitering_threshold) & ~is_vehicle & ~state.alerted)
+        vehicles = np.flatnonzero(is_vehicle)
+        if len(loiterers) == 0 or len(vehicles) == 0:
+            return []
+
+        # Only vehicles in the grid cell of a loiterer are measured against it
+        grid = SpatialGrid(state.positions[vehicles], self.proximity_threshold)
+        centers = box_centers(state.positions[loiterers])
+        nearest, _ = grid.nearest(centers)
+
+        suspicious_events = []
+        for row, vehicle_index in zip(loiterers, nearest):
+            if vehicle_index < 0:
+                continue
+            # Report each loitering spell once
+            state.alerted[row] = True
+            suspicious_events.append({
+                'type': 'suspicious_loitering',
+                'person_id': state.ids[row],
+                'car_id': state.ids[vehicles[vehicle_index]],
+                'duration': int(state.loitering[row])
+            })
+        return suspicious_events
@@ -2,13 +2,13 @@ import cv2
 from .model import IntrusionDetector
 from ai_models.utils.save_detection_event import save_detection_event
 
-# Initialize detector
-intrusion_detector = IntrusionDetector(confidence=0.5)
-
 def detect_intrusion(video_path, owner):
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         raise ValueError("Error: Unable to open video or stream.")
+
+    # Weights are shared; the tracker and loitering state belong to this stream
+    intrusion_detector = IntrusionDetector(confidence=0.5)
     
     frame_count = 0
     last_alert_time = 0
@@ -34,15 +34,15 @@ def detect_intrusion(video_path, owner):
                 
             track_id = track.track_id
             ltrb = track.to_ltrb()
-            class_id = track.get_class()
+            class_id = track.det_class
             
             # Get color based on class and suspicious behavior
-            if class_id == 2:  # Person
-                color = (0, 0, 255)  # Red for person
-                label = f"Person {track_id}"
-            else:  # Car or bike
+            if class_id in intrusion_detector.vehicle_classes:
                 color = (0, 255, 0)  # Green for vehicle
                 label = f"Vehicle {track_id}"
+            else:  # Person
+                color = (0, 0, 255)  # Red for person
+                label = f"Person {track_id}"
             
             # Draw box
             x1, y1, x2, y2 = map(int, ltrb)
@@ -1,5 +1,6 @@
 import numpy as np
 import cv2
+from ai_models.ai.geometry import as_boxes, point_box_distance
 
 def calculate_iou(box1, box2):
     """
@@ -69,6 +70,69 @@ def is_suspicious_movement(track_history, fps=30, speed_threshold=50):
     speed = calculate_movement_speed(track_history, fps)
     return speed > speed_threshold
 
+def appearance_embeddings(frame, detections, bins=(8, 8)):
+    """
+    Cheap appearance features for DeepSort: an L2-normalized hue/saturation
+    histogram of each ([left, top, w, h], ...) detection's crop.
+    """
+    h, w = frame.shape[:2]
+    size = bins[0] * bins[1]
+    embeddings = []
+    for (left, top, box_w, box_h), *_ in detections:
+        x1, y1 = max(int(left), 0), max(int(top), 0)
+        x2, y2 = min(int(left + box_w), w), min(int(top + box_h), h)
+        crop = frame[y1:y2, x1:x2]
+        if crop.size == 0:
+            # Nothing to look at; a flat histogram matches every track equally
+            embeddings.append(np.full(size, 1 / np.sqrt(size), dtype=np.float32))
+            continue
+        hsv = cv2.cvtColor(crop, cv2.COLOR_BGR2HSV)
+        histogram = cv2.calcHist([hsv], [0, 1], None, list(bins), [0, 180, 0, 256]).reshape(-1)
+        norm = np.linalg.norm(histogram)
+        embeddings.append(histogram / norm if norm > 0 else np.full(size, 1 / np.sqrt(size), dtype=np.float32))
+    return embeddings
+
+class SpatialGrid:
+    """
+    Uniform grid of square cells over a set of xyxy boxes. Every box is listed
+    in each cell its `radius`-expanded extent touches, so the boxes within
+    radius of a point are always among those listed in the point's cell.
+    """
+
+    def __init__(self, boxes, radius, cell_size=None):
+        self.boxes = as_boxes(boxes)
+        self.radius = radius
+        self.cell_size = cell_size or max(radius, 1)
+        self.cells = {}
+
+        expanded = self.boxes + np.array([-radius, -radius, radius, radius], dtype=np.float32)
+        first = np.floor(expanded[:, :2] / self.cell_size).astype(int)
+        last = np.floor(expanded[:, 2:] / self.cell_size).astype(int)
+        for index, ((cx1, cy1), (cx2, cy2)) in enumerate(zip(first, last)):
+            for cx in range(cx1, cx2 + 1):
+                for cy in range(cy1, cy2 + 1):
+                    self.cells.setdefault((cx, cy), []).append(index)
+
+    def nearest(self, points):
+        """
+        For each (x, y) point, the index of the closest box within radius and
+        its distance, or (-1, inf) when there is none.
+        """
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        indices = np.full(len(points), -1, dtype=np.int64)
+        distances = np.full(len(points), np.inf, dtype=np.float32)
+        cells = np.floor(points / self.cell_size).astype(int)
+        for i, (point, cell) in enumerate(zip(points, cells)):
+            candidates = self.cells.get(tuple(cell))
+            if not candidates:
+                continue
+            candidate_distances = point_box_distance(point, self.boxes[candidates])[0]
+            best = int(np.argmin(candidate_distances))
+            if candidate_distances[best] <= self.radius:
+                indices[i] = candidates[best]
+                distances[i] = candidate_distances[best]
+        return indices, distances
+
 def draw_tracking_info(frame, track_id, class_name, box, color, additional_info=None):
     """
     Draw tracking information on the frame.
@@ -0,0 +1,133 @@
+import threading
+import time
+from contextlib import contextmanager
+import torch
+
+try:
+    import psutil
+except ImportError:  # memory reporting falls back to parameter sizes only
+    psutil = None
+
+CAR_TRACKING_WEIGHTS = 'ai_models/ai/car_tracking/car_movement_tracking.pt'
+FIRE_SMOKE_WEIGHTS = 'ai_models/ai/fire_smoke_detection/fire_smoke_detection.pt'
+FACE_DETECTION_WEIGHTS = 'ai_models/ai/authorized_person_detection/face_detection.pt'
+INTRUSION_DETECTION_WEIGHTS = 'ai_models/ai/intrusion_detection/intrusion_detection.pt'
+FACENET = 'facenet:vggface2'
+
+
+def get_device():
+    return 'cuda' if torch.cuda.is_available() else 'cpu'
+
+
+def _module_bytes(model):
+    """Size of a model's parameters and buffers in bytes"""
+    module = getattr(model, 'model', model)  # ultralytics YOLO wraps the nn.Module
+    if not isinstance(module, torch.nn.Module):
+        return 0
+    total = 0
+    for tensor in list(module.parameters()) + list(module.buffers()):
+        total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def _rss():
+    return psutil.Process().memory_info().rss if psutil else 0
+
+
+class ModelRegistry:
+    """
+    Loads each set of weights at most once per process, on first use, and shares
+    the instance between every view and pipeline. Loading is thread-safe: concurrent
+    requests for the same model wait for a single load instead of racing.
+    """
+
+    def __init__(self):
+        self.models = {}
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.load_locks = {}
+        self.inference_locks = {}
+
+    def get(self, key, loader):
+        model = self.models.get(key)
+        if model is not None:
+            return model
+
+        with self.lock:
+            load_lock = self.load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            model = self.models.get(key)
+            if model is not None:
+                return model
+
+            print(f"Loading model {key}...")
+            rss_before = _rss()
+            start = time.perf_counter()
+            model = loader()
+            load_time = time.perf_counter() - start
+
+            with self.lock:
+                self.models[key] = model
+                self.inference_locks[id(model)] = threading.Lock()
+                self.stats[key] = {
+                    'load_time_seconds': round(load_time, 3),
+                    'parameter_bytes': _module_bytes(model),
+                    'rss_delta_bytes': max(0, _rss() - rss_before),
+                    'device': get_device(),
+                }
+            print(f"Loaded model {key} in {load_time:.2f}s")
+            return model
+
+    def inference_lock(self, model):
+        with self.lock:
+            return self.inference_locks.setdefault(id(model), threading.Lock())
+
+    def get_stats(self):
+        with self.lock:
+            return {key: dict(value) for key, value in self.stats.items()}
+
+
+registry = ModelRegistry()
+
+
+def _load_yolo(weights_path):
+    from ultralytics import YOLO
+
+    model = YOLO(weights_path)
+    if get_device() == 'cuda':
+        print("GPU:", torch.cuda.get_device_name(0))
+        model.to('cuda')
+        # Every caller only runs inference, so the shared model is always fused
+        model.fuse()
+    return model
+
+
+def _load_facenet():
+    from facenet_pytorch import InceptionResnetV1
+
+    return InceptionResnetV1(pretrained='vggface2').eval().to(get_device())
+
+
+def get_yolo_model(weights_path):
+    """Shared ultralytics YOLO model for a weights file"""
+    return registry.get(weights_path, lambda: _load_yolo(weights_path))
+
+
+def get_facenet_model():
+    """Shared InceptionResnetV1 (VGGFace2) face embedding model"""
+    return registry.get(FACENET, _load_facenet)
+
+
+@contextmanager
+def inference_lock(model):
+    """
+    Serialize calls into a shared model. Ultralytics predictors keep per-call
+    state on the model object, so two threads must not run it at once.
+    """
+    with registry.inference_lock(model):
+        yield
+
+
+def get_registry_stats():
+    return registry.get_stats()
@@ -0,0 +1,266 @@
+import asyncio
+import threading
+from queue import Queue, Empty, Full
+
+# Put on a subscription's queue when its channel closes
+END = object()
+
+
+class StreamLimitReached(RuntimeError):
+    """Raised when starting a SharedEventStream would exceed its slots"""
+
+
+class EventSubscription:
+    """One consumer of an EventChannel. Events that arrive while its queue is full replace the oldest ones."""
+
+    def __init__(self, channel, maxsize=100):
+        self.channel = channel
+        self.queue = Queue(maxsize=maxsize)
+        self.closed = False
+        self.events_dropped = 0
+
+    def _put(self, item):
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except Full:
+                try:
+                    self.queue.get_nowait()
+                    self.events_dropped += 1
+                except Empty:
+                    pass
+
+    def get(self, timeout=None):
+        """Return the next event, or None on timeout or once the channel has closed (see .closed)."""
+        if self.closed:
+            return None
+        try:
+            item = self.queue.get(timeout=timeout)
+        except Empty:
+            return None
+        if item is END:
+            self.closed = True
+            return None
+        return item
+
+    def close(self):
+        self.channel.unsubscribe(self)
+
+    def __iter__(self):
+        while not self.closed:
+            event = self.get()
+            if event is not None:
+                yield event
+
+
+class AsyncEventSubscription:
+    """
+    An EventChannel consumer for async views. Events are handed to the event
+    loop thread-safely, so an idle subscriber costs no thread at all.
+    """
+
+    def __init__(self, channel, loop, maxsize=100):
+        self.channel = channel
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.closed = False
+        self.events_dropped = 0
+
+    def _put(self, item):
+        try:
+            self.loop.call_soon_threadsafe(self._put_nowait, item)
+        except RuntimeError:
+            pass  # the event loop has already shut down
+
+    def _put_nowait(self, item):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.events_dropped += 1
+        self.queue.put_nowait(item)
+
+    async def get(self, timeout=None):
+        """Return the next event, or None on timeout or once the channel has closed (see .closed)."""
+        if self.closed:
+            return None
+        try:
+            item = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if item is END:
+            self.closed = True
+            return None
+        return item
+
+    def close(self):
+        self.channel.unsubscribe(self)
+
+
+class EventChannel:
+    """Broadcasts detection events from one producer to any number of subscribers."""
+
+    def __init__(self, name=None):
+        self.name = name
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def subscribe(self, maxsize=100):
+        return self._add(EventSubscription(self, maxsize=maxsize))
+
+    def subscribe_async(self, loop=None, maxsize=100):
+        """Subscribe from a coroutine; events are delivered on the given (or running) event loop"""
+        return self._add(AsyncEventSubscription(self, loop or asyncio.get_running_loop(), maxsize=maxsize))
+
+    def _add(self, subscription):
+        with self.lock:
+            if self.closed:
+                subscription._put(END)
+            else:
+                self.subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            if subscription in self.subscribers:
+                self.subscribers.remove(subscription)
+        subscription._put(END)
+
+    def subscriber_count(self):
+        with self.lock:
+            return len(self.subscribers)
+
+    def publish(self, event):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            subscription._put(event)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            subscribers, self.subscribers = self.subscribers, []
+        for subscription in subscribers:
+            subscription._put(END)
+
+
+def merge_event_streams(producers, executor=None):
+    """
+    Run each producer on its own thread (or on the given executor) and yield
+    their events as they arrive. `producers` maps a name to a callable returning
+    an iterable of events. The consumer blocks on a single queue, so it wakes as
+    soon as any producer has a result, and the merge ends once every producer
+    has finished.
+    """
+    queue = Queue()
+
+    def run(name, producer):
+        try:
+            for event in producer():
+                queue.put(event)
+        except Exception as e:
+            queue.put({"event": "error", "message": f"{name} error: {str(e)}"})
+        finally:
+            queue.put(END)
+
+    for name, producer in producers.items():
+        if executor is not None:
+            executor.submit(run, name, producer)
+        else:
+            threading.Thread(target=run, args=(name, producer), name=f"EventProducer({name})", daemon=True).start()
+
+    remaining = len(producers)
+    while remaining:
+        item = queue.get()
+        if item is END:
+            remaining -= 1
+            continue
+        yield item
+
+
+class SharedEventStream:
+    """
+    One run of a set of detectors whose events are broadcast to every client
+    watching the same video. The detectors start with the first subscriber and
+    are stopped when the last one leaves.
+
+    When `slots` (a BoundedSemaphore) is given, a running stream holds one of
+    them from start until its detectors finish, and start() raises
+    StreamLimitReached instead of waiting when none is free.
+    """
+
+    def __init__(self, key, start_producers, executor=None, slots=None):
+        # start_producers() -> (producers for merge_event_streams, callable that stops them)
+        self.key = key
+        self.start_producers = start_producers
+        self.executor = executor
+        self.slots = slots
+        self.channel = EventChannel(name=key)
+        self.stop_producers = None
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return self
+            if self.slots is not None and not self.slots.acquire(blocking=False):
+                raise StreamLimitReached(f"No free slot to start {self.key}")
+            try:
+                producers, self.stop_producers = self.start_producers()
+            except Exception:
+                self._release_slot()
+                raise
+            self.thread = threading.Thread(target=self._run, args=(producers,), name=f"SharedEventStream({self.key})", daemon=True)
+            self.thread.start()
+        return self
+
+    def _run(self, producers):
+        try:
+            for event in merge_event_streams(producers, executor=self.executor):
+                self.channel.publish(event)
+        finally:
+            self.channel.close()
+            _forget_stream(self)
+            self._release_slot()
+
+    def _release_slot(self):
+        if self.slots is not None:
+            self.slots.release()
+
+    def subscribe(self):
+        return self.channel.subscribe()
+
+    def subscribe_async(self, loop=None):
+        return self.channel.subscribe_async(loop)
+
+    def unsubscribe(self, subscription):
+        subscription.close()
+        if self.channel.subscriber_count() == 0:
+            self.stop()
+
+    def stop(self):
+        _forget_stream(self)
+        if self.stop_producers:
+            self.stop_producers()
+        self.channel.close()
+
+
+_streams = {}
+_streams_lock = threading.Lock()
+
+
+def get_shared_event_stream(key, start_producers, executor=None, slots=None):
+    """Return the running stream for key, or a new (not yet started) one"""
+    with _streams_lock:
+        stream = _streams.get(key)
+        if stream is None or stream.channel.closed:
+            stream = SharedEventStream(key, start_producers, executor=executor, slots=slots)
+            _streams[key] = stream
+        return stream
+
+
+def _forget_stream(stream):
+    with _streams_lock:
+        if _streams.get(stream.key) is stream:
+            del _streams[stream.key]
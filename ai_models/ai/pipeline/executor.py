@@ -0,0 +1,100 @@
+import threading
+import time
+from concurrent.futures import Future
+from queue import Queue, Empty
+
+
+class InferenceExecutor:
+    """
+    Owns every call into one shared model. Sessions submit single frames from
+    any thread and get a Future back; a worker thread collects whatever has
+    been submitted (up to max_batch_size, waiting at most max_wait seconds for
+    more after the first) and runs them through batch_fn as one forward pass.
+    Concurrent streams therefore never call the model at the same time, and
+    under load their frames share batches instead of queueing on a lock.
+    """
+
+    def __init__(self, batch_fn, name="inference", max_batch_size=8, max_wait=0.005):
+        # batch_fn(frames) -> one result per frame, in order
+        self.batch_fn = batch_fn
+        self.name = name
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self.queue = Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+        # Stats
+        self.frames = 0
+        self.batches = 0
+        self.errors = 0
+
+    def submit(self, frame):
+        self._ensure_started()
+        future = Future()
+        self.queue.put((frame, future))
+        return future
+
+    def __call__(self, frame):
+        """Run one frame and wait for its result"""
+        return self.submit(frame).result()
+
+    def _ensure_started(self):
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name=f"InferenceExecutor({self.name})", daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            pending = [self.queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(pending) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    pending.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+                except Empty:
+                    break
+
+            try:
+                results = self.batch_fn([frame for frame, _ in pending])
+            except Exception as e:
+                self.errors += 1
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+
+            self.frames += len(pending)
+            self.batches += 1
+            for (_, future), result in zip(pending, results):
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            'queue_depth': self.queue.qsize(),
+            'frames': self.frames,
+            'batches': self.batches,
+            'mean_batch_size': round(self.frames / self.batches, 2) if self.batches else 0,
+            'errors': self.errors,
+        }
+
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_inference_executor(key, batch_fn, **kwargs):
+    """The process-wide executor for a model, created with batch_fn on first use"""
+    with _executors_lock:
+        executor = _executors.get(key)
+        if executor is None:
+            executor = InferenceExecutor(batch_fn, name=key, **kwargs)
+            _executors[key] = executor
+        return executor
+
+
+def get_executor_stats():
+    with _executors_lock:
+        return {key: executor.stats() for key, executor in _executors.items()}
@@ -0,0 +1,247 @@
+import threading
+from collections import deque
+import cv2
+
+# What a subscription does when a new frame arrives and its buffer is full
+DROP_OLDEST = 'drop_oldest'  # keep the most recent frames (live cameras)
+DROP_NEWEST = 'drop_newest'  # keep what is queued, ignore new frames
+BLOCK = 'block'              # wait for the subscriber (every frame is processed)
+
+
+class FrameSubscription:
+    """
+    A single consumer's view of a FrameBus.
+
+    Exposes the same read()/isOpened()/release() interface as cv2.VideoCapture
+    so the existing detector loops can consume it without changes. Frames are
+    shared read-only numpy arrays, so callers must copy() before drawing.
+    """
+
+    def __init__(self, bus, name=None, maxsize=2, drop_policy=DROP_OLDEST):
+        if drop_policy not in (DROP_OLDEST, DROP_NEWEST, BLOCK):
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.bus = bus
+        self.name = name
+        self.maxsize = max(1, maxsize)
+        self.drop_policy = drop_policy
+        self.frames = deque()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.frames_received = 0
+        self.frames_dropped = 0
+        self.frames_skipped = 0
+
+    def _offer(self, frame_index, frame):
+        with self.condition:
+            if self.closed:
+                return
+            if len(self.frames) >= self.maxsize:
+                if self.drop_policy == DROP_OLDEST:
+                    self.frames.popleft()
+                    self.frames_dropped += 1
+                elif self.drop_policy == DROP_NEWEST:
+                    self.frames_dropped += 1
+                    return
+                else:
+                    while len(self.frames) >= self.maxsize and not self.closed:
+                        self.condition.wait(0.5)
+                    if self.closed:
+                        return
+            self.frames.append((frame_index, frame))
+            self.frames_received += 1
+            self.condition.notify_all()
+
+    def _end(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def get(self, timeout=None):
+        """Return the next (frame_index, frame) pair, or None once the source has ended."""
+        with self.condition:
+            while not self.frames and not self.closed:
+                if not self.condition.wait(timeout):
+                    return None
+            if not self.frames:
+                return None
+            item = self.frames.popleft()
+            self.condition.notify_all()
+            return item
+
+    def read(self):
+        item = self.get()
+        if item is None:
+            return False, None
+        return True, item[1]
+
+    def grab(self):
+        """Skip the next frame, like cv2.VideoCapture.grab(); frees its slot for the bus"""
+        if self.get() is None:
+            return False
+        self.frames_skipped += 1
+        return True
+
+    def skip_stale(self):
+        """Drop every queued frame but the newest without waiting for new ones; returns how many were dropped"""
+        with self.condition:
+            stale = max(0, len(self.frames) - 1)
+            for _ in range(stale):
+                self.frames.popleft()
+            self.frames_skipped += stale
+            if stale:
+                self.condition.notify_all()
+            return stale
+
+    def isOpened(self):
+        with self.condition:
+            return bool(self.frames) or not self.closed
+
+    def qsize(self):
+        with self.condition:
+            return len(self.frames)
+
+    def release(self):
+        self.bus.unsubscribe(self)
+
+    def __iter__(self):
+        while True:
+            item = self.get()
+            if item is None:
+                return
+            yield item
+
+
+class FrameBus:
+    """
+    Decodes a video source once on a background thread and fans every frame
+    out to all subscribed detectors.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.cap = None
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stopped = threading.Event()
+        self.frame_count = 0
+        self.fps = 0.0
+
+    def open(self):
+        """Open the underlying capture. Raises ValueError if the source cannot be read."""
+        if self.cap is None:
+            self.cap = cv2.VideoCapture(self.source)
+            if not self.cap.isOpened():
+                self.cap.release()
+                self.cap = None
+                raise ValueError("Error: Unable to open video or stream.")
+            self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 0.0
+        return self
+
+    def subscribe(self, name=None, maxsize=2, drop_policy=DROP_OLDEST):
+        subscription = FrameSubscription(self, name=name, maxsize=maxsize, drop_policy=drop_policy)
+        with self.lock:
+            if self.stopped.is_set():
+                subscription._end()
+            else:
+                self.subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription._end()
+        with self.lock:
+            if subscription in self.subscribers:
+                self.subscribers.remove(subscription)
+            no_subscribers = not self.subscribers
+        if no_subscribers:
+            self.stop()
+            # Never started, so the decode thread won't release the capture for us
+            if self.thread is None and self.cap is not None:
+                self.cap.release()
+
+    def start(self):
+        """Start decoding. Subscribe every consumer first so none of them misses the opening frames."""
+        self.open()
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name=f"FrameBus({self.source})", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            subscription._end()
+
+    def join(self, timeout=None):
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+
+    def _run(self):
+        try:
+            while not self.stopped.is_set():
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+
+                # Every subscriber gets the same buffer; make it read-only so no detector
+                # can draw on a frame another detector is still looking at.
+                frame.flags.writeable = False
+                self.frame_count += 1
+
+                with self.lock:
+                    subscribers = list(self.subscribers)
+                for subscription in subscribers:
+                    subscription._offer(self.frame_count, frame)
+        except Exception as e:
+            print(f"Error in frame bus for {self.source}: {str(e)}")
+        finally:
+            self.cap.release()
+            self.stop()
+            _forget_bus(self)
+
+    def stats(self):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        return {
+            'source': self.source,
+            'frames_decoded': self.frame_count,
+            'source_fps': self.fps,
+            'subscribers': [
+                {
+                    'name': s.name,
+                    'queue_depth': s.qsize(),
+                    'frames_received': s.frames_received,
+                    'frames_dropped': s.frames_dropped,
+                    'frames_skipped': s.frames_skipped,
+                }
+                for s in subscribers
+            ],
+        }
+
+
+# One bus per source per process, so two views of the same camera share a decoder
+_buses = {}
+_buses_lock = threading.Lock()
+
+
+def get_frame_bus(source, shared=True):
+    """
+    Return the running bus for a source, creating (but not starting) one if needed.
+    Uploaded files should pass shared=False so every request reads from the start.
+    """
+    if not shared:
+        return FrameBus(source)
+    with _buses_lock:
+        bus = _buses.get(source)
+        if bus is None or bus.stopped.is_set():
+            bus = FrameBus(source)
+            _buses[source] = bus
+        return bus
+
+
+def _forget_bus(bus):
+    with _buses_lock:
+        if _buses.get(bus.source) is bus:
+            del _buses[bus.source]
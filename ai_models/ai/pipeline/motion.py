@@ -0,0 +1,124 @@
+import cv2
+import numpy as np
+from django.conf import settings
+
+
+class MotionDetector:
+    """
+    Cheap change detection for deciding whether a frame is worth running a
+    model on. Frames are shrunk to a small grayscale image and compared against
+    a running-average background; a frame counts as moving when enough pixels
+    differ from it.
+    """
+
+    def __init__(self, width=160, pixel_threshold=25, min_motion_ratio=0.002, background_rate=0.05):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_motion_ratio = min_motion_ratio
+        self.background_rate = background_rate
+        self.background = None
+        self.motion_ratio = 0.0
+
+    def update(self, frame):
+        """Feed a frame; returns True if it differs enough from the background"""
+        h, w = frame.shape[:2]
+        small = cv2.resize(frame, (self.width, max(1, int(h * self.width / w))), interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+        if self.background is None or self.background.shape != gray.shape:
+            self.background = gray.astype(np.float32)
+            self.motion_ratio = 1.0
+            return True
+
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+        cv2.accumulateWeighted(gray, self.background, self.background_rate)
+        self.motion_ratio = np.count_nonzero(diff > self.pixel_threshold) / diff.size
+        return self.motion_ratio >= self.min_motion_ratio
+
+
+class MotionPolicy:
+    """
+    When a detector runs relative to motion: on every moving frame, for `hold`
+    frames after motion stops (so trackers see objects come to rest), and once
+    every `heartbeat` frames while the scene is static (None: never).
+    """
+
+    def __init__(self, heartbeat=None, hold=25):
+        self.heartbeat = heartbeat
+        self.hold = hold
+
+
+# Fire and smoke can start without much visible motion, so they keep a fast heartbeat.
+# A parked car only needs an occasional check that its track is still there.
+MOTION_POLICIES = {
+    'car': MotionPolicy(heartbeat=50, hold=25),
+    'fire': MotionPolicy(heartbeat=10, hold=25),
+    'person': MotionPolicy(heartbeat=75, hold=25),
+}
+
+
+class MotionGate:
+    """
+    Sits in front of one detector and decides per frame whether to run it,
+    following a MotionPolicy. Counts the frames it let through and skipped.
+    """
+
+    def __init__(self, policy, motion=None, enabled=True):
+        self.policy = MOTION_POLICIES[policy] if isinstance(policy, str) else policy
+        self.motion = motion or MotionDetector()
+        self.enabled = enabled
+        self.frames_since_motion = None
+        self.frames_since_inference = 0
+
+        # Stats
+        self.frames_seen = 0
+        self.frames_inferred = 0
+        self.frames_skipped = 0
+        self.motion_frames = 0
+
+    def should_infer(self, frame, moving=None):
+        """
+        Whether to run the detector on this frame. Pass `moving` when motion
+        was already computed for the frame (e.g. by a gate sharing the detector).
+        """
+        self.frames_seen += 1
+        if not self.enabled:
+            self.frames_inferred += 1
+            return True
+
+        if moving is None:
+            moving = self.motion.update(frame)
+
+        if moving:
+            self.motion_frames += 1
+            self.frames_since_motion = 0
+        elif self.frames_since_motion is not None:
+            self.frames_since_motion += 1
+
+        infer = (
+            moving
+            or (self.frames_since_motion is not None and self.frames_since_motion <= self.policy.hold)
+            or (self.policy.heartbeat is not None and self.frames_since_inference + 1 >= self.policy.heartbeat)
+        )
+
+        if infer:
+            self.frames_inferred += 1
+            self.frames_since_inference = 0
+        else:
+            self.frames_skipped += 1
+            self.frames_since_inference += 1
+        return infer
+
+    def stats(self):
+        return {
+            'frames_seen': self.frames_seen,
+            'frames_inferred': self.frames_inferred,
+            'frames_skipped': self.frames_skipped,
+            'motion_frames': self.motion_frames,
+            'motion_ratio': round(float(self.motion.motion_ratio), 4),
+        }
+
+
+def motion_gate(policy):
+    """A MotionGate for a detector loop, switched on or off by the MOTION_GATING setting"""
+    return MotionGate(policy, enabled=getattr(settings, 'MOTION_GATING', True))
@@ -0,0 +1,87 @@
+import cv2
+import numpy as np
+import torch
+
+# All of our YOLO models are trained and run at 640x640
+INPUT_SIZE = 640
+PAD_COLOR = (114, 114, 114)
+
+
+def letterbox(frame, size=INPUT_SIZE):
+    """
+    Resize a frame to fit in a size x size square, keeping its aspect ratio,
+    and pad the rest the same way ultralytics does.
+    Returns the padded image, the resize ratio and the (left, top) padding.
+    """
+    h, w = frame.shape[:2]
+    ratio = min(size / h, size / w)
+    new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+
+    if (new_w, new_h) != (w, h):
+        frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+    pad_x = (size - new_w) / 2
+    pad_y = (size - new_h) / 2
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    image = cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=PAD_COLOR)
+    return image, ratio, (left, top)
+
+
+class PreparedBatch:
+    """
+    N frames letterboxed and stacked into a single normalized BCHW tensor,
+    ready to be fed to any of the YOLO models without further preprocessing.
+    """
+
+    def __init__(self, tensor, ratios, pads, shapes, offsets=None):
+        self.tensor = tensor
+        self.ratios = ratios
+        self.pads = pads
+        self.shapes = shapes
+        # Where each image sits in its frame, when the images are crops
+        self.offsets = offsets or [(0, 0)] * len(shapes)
+
+    def __len__(self):
+        return len(self.shapes)
+
+    def select(self, indices):
+        """A batch of only the given frames, for models that skip some of them"""
+        indices = list(indices)
+        return PreparedBatch(
+            self.tensor[indices],
+            [self.ratios[i] for i in indices],
+            [self.pads[i] for i in indices],
+            [self.shapes[i] for i in indices],
+            [self.offsets[i] for i in indices],
+        )
+
+    def scale_boxes(self, index, boxes):
+        """Map (N, 4) xyxy boxes from the model input back onto the original frame."""
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4).copy()
+        left, top = self.pads[index]
+        h, w = self.shapes[index]
+        x, y = self.offsets[index]
+        boxes[:, [0, 2]] = (boxes[:, [0, 2]] - left) / self.ratios[index]
+        boxes[:, [1, 3]] = (boxes[:, [1, 3]] - top) / self.ratios[index]
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, w) + x
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, h) + y
+        return boxes
+
+
+def prepare_batch(frames, device, size=INPUT_SIZE, offsets=None):
+    """
+    Letterbox, BGR->RGB and normalize a list of frames into one tensor on the given device.
+    When the frames are crops, pass their (x, y) offsets so boxes are scaled back to the full frame.
+    """
+    images, ratios, pads, shapes = [], [], [], []
+    for frame in frames:
+        image, ratio, pad = letterbox(frame, size)
+        images.append(image)
+        ratios.append(ratio)
+        pads.append(pad)
+        shapes.append(frame.shape[:2])
+
+    batch = np.stack(images)[..., ::-1].transpose(0, 3, 1, 2)  # BHWC BGR -> BCHW RGB
+    tensor = torch.from_numpy(np.ascontiguousarray(batch)).to(device).float() / 255.0
+    return PreparedBatch(tensor, ratios, pads, shapes, offsets)
@@ -0,0 +1,135 @@
+import math
+import time
+import cv2
+from django.conf import settings
+from .frame_bus import BLOCK
+
+# Cameras that report no fps (or a nonsense one, as some RTSP servers do) are assumed to run at this
+DEFAULT_SOURCE_FPS = 25.0
+MAX_SOURCE_FPS = 120.0
+
+
+def source_fps(cap):
+    """The frame rate a capture (cv2.VideoCapture or FrameSubscription) claims to deliver, or 0 if unknown"""
+    bus = getattr(cap, 'bus', None)
+    if bus is not None:
+        return bus.fps or 0.0
+    try:
+        return cap.get(cv2.CAP_PROP_FPS) or 0.0
+    except Exception:
+        return 0.0
+
+
+class AdaptiveSampler:
+    """
+    Decides how many frames a detector loop skips so it keeps up with its
+    source. The time the loop spends on each analysed frame is measured (from
+    handing the frame out to asking for the next one) and smoothed; while that
+    frame was being processed, latency * source_fps new frames arrived, so that
+    many are skipped before the next read. Skipped frames are only grab()bed,
+    never retrieved, which saves the conversion of frames nobody looks at.
+
+    Sources that already drop frames for a slow reader (FrameSubscriptions
+    with DROP_OLDEST or DROP_NEWEST) pass can_skip=False: grab() on those
+    waits for the bus to decode a new frame, so skipping would only fall
+    further behind. The stride stays at 1 and each read instead discards
+    whatever stale frames are queued, so the newest one is analysed.
+    """
+
+    def __init__(self, fps=None, min_stride=1, max_stride=15, smoothing=0.2, adaptive=True, can_skip=True):
+        if not fps or fps <= 0 or fps > MAX_SOURCE_FPS:
+            fps = DEFAULT_SOURCE_FPS
+        if not can_skip:
+            min_stride = max_stride = 1
+            adaptive = False
+        self.source_fps = fps
+        self.can_skip = can_skip
+        self.min_stride = max(1, min_stride)
+        self.max_stride = max(self.min_stride, max_stride)
+        self.smoothing = smoothing
+        self.adaptive = adaptive
+        self.stride = self.min_stride
+        self.latency = 0.0  # Smoothed seconds spent per analysed frame
+        self.frame_index = 0  # Source frames consumed, analysed or not
+        self.returned_at = None
+
+        # Stats
+        self.frames_analysed = 0
+        self.frames_skipped = 0
+        self.analysis_fps = 0.0
+
+    def read(self, cap):
+        """Skip `stride - 1` frames, then read the next one like cap.read()"""
+        now = time.perf_counter()
+        if self.returned_at is not None:
+            self.record_latency(now - self.returned_at)
+
+        if not self.can_skip:
+            stale = cap.skip_stale()
+            self.frame_index += stale
+            self.frames_skipped += stale
+
+        for _ in range(self.stride - 1):
+            if not cap.grab():
+                return False, None
+            self.frame_index += 1
+            self.frames_skipped += 1
+
+        ret, frame = cap.read()
+        if not ret:
+            return False, None
+        self.frame_index += 1
+        self.frames_analysed += 1
+
+        returned_at = time.perf_counter()
+        if self.returned_at is not None:
+            elapsed = returned_at - self.returned_at
+            if elapsed > 0:
+                rate = 1.0 / elapsed
+                self.analysis_fps = (1 - self.smoothing) * self.analysis_fps + self.smoothing * rate if self.analysis_fps else rate
+        self.returned_at = returned_at
+        return True, frame
+
+    def set_min_stride(self, min_stride):
+        """Change the stride floor, e.g. to sample sparsely while nothing is happening"""
+        if not self.can_skip:
+            return
+        self.min_stride = max(1, min_stride)
+        self.max_stride = max(self.max_stride, self.min_stride)
+        if self.adaptive:
+            self.stride = min(self.max_stride, max(self.min_stride, self.stride))
+        else:
+            self.stride = self.min_stride
+
+    def record_latency(self, seconds):
+        self.latency = (1 - self.smoothing) * self.latency + self.smoothing * seconds if self.latency else seconds
+        if self.adaptive:
+            # Frames that arrived while the last one was processed, rounded up so the backlog never grows
+            behind = math.ceil(self.latency * self.source_fps - 1e-6)
+            self.stride = min(self.max_stride, max(self.min_stride, behind))
+
+    def stats(self):
+        return {
+            'source_fps': round(self.source_fps, 2),
+            'analysis_fps': round(self.analysis_fps, 2),
+            'stride': self.stride,
+            'latency_ms': round(self.latency * 1000, 1),
+            'frames_analysed': self.frames_analysed,
+            'frames_skipped': self.frames_skipped,
+        }
+
+
+def drops_frames(cap):
+    """Whether `cap` is a FrameSubscription that drops frames itself when its reader falls behind"""
+    return getattr(cap, 'bus', None) is not None and getattr(cap, 'drop_policy', BLOCK) != BLOCK
+
+
+def frame_sampler(cap, min_stride=1):
+    """An AdaptiveSampler for a detector loop reading from `cap`, configured from settings"""
+    return AdaptiveSampler(
+        fps=source_fps(cap),
+        min_stride=min_stride,
+        max_stride=getattr(settings, 'ADAPTIVE_SAMPLING_MAX_STRIDE', 15),
+        adaptive=getattr(settings, 'ADAPTIVE_SAMPLING', True),
+        can_skip=not drops_frames(cap),
+    )
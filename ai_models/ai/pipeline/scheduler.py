@@ -0,0 +1,298 @@
+import threading
+import time
+from django.conf import settings
+from django.db import close_old_connections
+from ai_models.models import Video, Vehicle
+from ai_models.ai.combined_detection.predict import CombinedDetector
+from ai_models.ai.car_tracking.predict import select_vehicle
+from ai_models.ai.pipeline.frame_bus import get_frame_bus, DROP_OLDEST
+from ai_models.ai.pipeline.events import EventChannel
+from ai_models.ai.pipeline.motion import motion_gate
+from ai_models.ai.pipeline.zones import load_zone_masks
+
+
+class CameraStream:
+    """
+    Per-camera state owned by the scheduler: the frame subscription, the
+    detector's tracking/alert state and the channel its events are published on.
+    """
+
+    def __init__(self, video, vehicle=None, zones=None):
+        self.video_id = str(video.id)
+        self.source = video.video_url
+        self.owner = video.owner
+        self.vehicle = vehicle
+        self.detector = CombinedDetector(owner=self.owner, zones=zones)
+        self.channel = EventChannel(name=self.video_id)
+        self.bus = get_frame_bus(self.source)
+        self.frames = None
+        self.selected_tracking_id = None
+        self.ready = False
+        # Every model runs on the same frames here, so gate with the most frequent policy (fire/smoke)
+        self.gate = motion_gate('fire')
+
+        # Stats
+        self.frames_processed = 0
+        self.fps = 0.0
+        self.last_processed_at = None
+
+    def start(self):
+        self.bus.open()
+        # Only ever keep the newest frame; the scheduler analyses the live edge
+        self.frames = self.bus.subscribe(f"scheduler:{self.video_id}", maxsize=1, drop_policy=DROP_OLDEST)
+        self.bus.start()
+        threading.Thread(target=self._select_vehicle, name=f"CameraSetup({self.video_id})", daemon=True).start()
+
+    def _select_vehicle(self):
+        try:
+            if self.vehicle and self.vehicle.vehicle_location_x is not None and self.vehicle.vehicle_location_y is not None:
+                # Warms up the detector's own tracker, which the workers go on using
+                self.selected_tracking_id, _ = select_vehicle(
+                    self.frames, self.vehicle.vehicle_location_x, self.vehicle.vehicle_location_y,
+                    self.detector.tracker, self.detector.car_detector,
+                    zones=self.detector.zones
+                )
+                print(f"Camera {self.video_id} tracking vehicle ID: {self.selected_tracking_id}")
+        except Exception as e:
+            print(f"Error selecting vehicle for camera {self.video_id}: {str(e)}")
+        finally:
+            self.ready = True
+
+    def next_frame(self):
+        """The newest undelivered frame, or None if there isn't one yet"""
+        item = self.frames.get(timeout=0)
+        return item[1] if item else None
+
+    def wants_frame(self, frame):
+        """Whether a frame is worth a batch slot; a fire/smoke candidate is followed up even if the scene stopped moving"""
+        return self.gate.should_infer(frame) or self.detector.fire_confirmer.active
+
+    def is_finished(self):
+        return self.frames is not None and not self.frames.isOpened()
+
+    def record_frame(self):
+        now = time.perf_counter()
+        if self.last_processed_at is not None:
+            elapsed = now - self.last_processed_at
+            if elapsed > 0:
+                self.fps = 0.9 * self.fps + 0.1 * (1.0 / elapsed) if self.fps else 1.0 / elapsed
+        self.last_processed_at = now
+        self.frames_processed += 1
+
+    def stop(self):
+        if self.frames is not None:
+            self.frames.release()
+        self.channel.close()
+
+    def stats(self):
+        return {
+            'video_id': self.video_id,
+            'owner': str(self.owner.id),
+            'ready': self.ready,
+            'source_fps': round(self.bus.fps, 2),
+            'analysis_fps': round(self.fps, 2),
+            'frames_processed': self.frames_processed,
+            'queue_depth': self.frames.qsize() if self.frames else 0,
+            'frames_dropped': self.frames.frames_dropped if self.frames else 0,
+            'subscribers': self.channel.subscriber_count(),
+            'motion_gate': self.gate.stats(),
+            'zones': self.detector.zones.stats(),
+            'fire_confirmation': self.detector.fire_confirmer.stats(),
+        }
+
+
+class StreamScheduler:
+    """
+    Runs CombinedDetector over every registered live stream with a bounded pool
+    of inference workers. Cameras are spread over the workers; each worker
+    round-robins over its cameras, stacks the newest frame of up to batch_size
+    of them into one forward pass per model, and publishes the resulting events
+    on each camera's EventChannel for SSE views to subscribe to.
+    """
+
+    def __init__(self, max_workers=2, batch_size=4, sync_interval=60):
+        self.max_workers = max(1, max_workers)
+        self.batch_size = max(1, batch_size)
+        self.sync_interval = sync_interval
+        self.cameras = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.threads = []
+        self.start_lock = threading.Lock()
+
+    def start(self):
+        with self.start_lock:
+            if not self.threads:
+                self._start_workers()
+        return self
+
+    def _start_workers(self):
+        self.sync()
+        for worker_index in range(self.max_workers):
+            thread = threading.Thread(target=self._worker_loop, args=(worker_index,), name=f"StreamWorker-{worker_index}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        thread = threading.Thread(target=self._sync_loop, name="StreamSchedulerSync", daemon=True)
+        thread.start()
+        self.threads.append(thread)
+        print(f"Stream scheduler started with {self.max_workers} workers, batch size {self.batch_size}")
+
+    def stop(self):
+        self.stopped.set()
+        with self.lock:
+            cameras, self.cameras = list(self.cameras.values()), {}
+        for camera in cameras:
+            camera.stop()
+
+    def sync(self):
+        """Pick up newly registered streams and drop deleted ones, and reload every camera's zones"""
+        close_old_connections()
+        videos = list(Video.objects.filter(video_type='stream').select_related('owner'))
+        video_ids = {str(video.id) for video in videos}
+        zones = load_zone_masks([video.id for video in videos])
+
+        # Workers add and remove cameras concurrently; add_camera re-checks under the lock
+        with self.lock:
+            cameras = dict(self.cameras)
+        for video in videos:
+            camera = cameras.get(str(video.id))
+            if camera is not None:
+                camera.detector.zones = zones[str(video.id)]
+                continue
+            try:
+                self.add_camera(video, zones=zones[str(video.id)])
+            except Exception as e:
+                print(f"Error adding camera {video.id}: {str(e)}")
+
+        with self.lock:
+            removed = [camera for video_id, camera in self.cameras.items() if video_id not in video_ids]
+            for camera in removed:
+                del self.cameras[camera.video_id]
+        for camera in removed:
+            camera.stop()
+
+    def add_camera(self, video, zones=None):
+        with self.lock:
+            camera = self.cameras.get(str(video.id))
+            if camera is not None:
+                return camera
+
+        vehicle = Vehicle.objects.filter(owner=video.owner).last()
+        if zones is None:
+            zones = load_zone_masks([video.id])[str(video.id)]
+        camera = CameraStream(video, vehicle=vehicle, zones=zones)
+        camera.start()
+
+        with self.lock:
+            existing = self.cameras.setdefault(camera.video_id, camera)
+        if existing is not camera:
+            camera.stop()
+        return existing
+
+    def channel_for(self, video):
+        """The event channel of a live stream, registering it if needed"""
+        self.start()
+        return self.add_camera(video).channel
+
+    def subscribe(self, video):
+        """Subscribe to the events of a live stream, registering it if needed"""
+        return self.channel_for(video).subscribe()
+
+    def stats(self):
+        with self.lock:
+            cameras = list(self.cameras.values())
+        return {
+            'workers': self.max_workers,
+            'batch_size': self.batch_size,
+            'cameras': [camera.stats() for camera in cameras],
+        }
+
+    def _cameras_for(self, worker_index):
+        with self.lock:
+            cameras = sorted(self.cameras.values(), key=lambda camera: camera.video_id)
+        return cameras[worker_index::self.max_workers]
+
+    def _worker_loop(self, worker_index):
+        offset = 0
+        while not self.stopped.is_set():
+            cameras = self._cameras_for(worker_index)
+            if not cameras:
+                self.stopped.wait(0.5)
+                continue
+
+            # Start each pass at a different camera so every one gets a turn
+            # even when there are more cameras than batch slots
+            offset = (offset + 1) % len(cameras)
+            batch = []
+            for camera in cameras[offset:] + cameras[:offset]:
+                if camera.is_finished():
+                    self._remove_camera(camera)
+                    continue
+                if not camera.ready:
+                    continue
+                frame = camera.next_frame()
+                if frame is not None and camera.wants_frame(frame):
+                    batch.append((camera, frame))
+                if len(batch) >= self.batch_size:
+                    break
+
+            if not batch:
+                self.stopped.wait(0.01)
+                continue
+
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                print(f"Error in stream worker {worker_index}: {str(e)}")
+
+    def _run_batch(self, batch):
+        frames = [frame for _, frame in batch]
+        track_car = any(camera.selected_tracking_id for camera, _ in batch)
+
+        # Model weights are shared process-wide, so any camera's detector can run the batch
+        # Each camera decides whether fire/smoke is due on its frame (sparse while quiet)
+        run_fire = [camera.detector.fire_schedule()[0] for camera, _ in batch]
+        zones = [camera.detector.zones for camera, _ in batch]
+        outputs = batch[0][0].detector.infer_batch(frames, track_car=track_car, run_fire=run_fire, zones=zones)
+
+        for (camera, frame), output in zip(batch, outputs):
+            _, events = camera.detector.handle_detections(
+                frame, output,
+                selected_tracking_id=camera.selected_tracking_id,
+                vehicle=camera.vehicle,
+                owner=camera.owner
+            )
+            camera.record_frame()
+            for event in events:
+                camera.channel.publish(event)
+
+    def _remove_camera(self, camera):
+        with self.lock:
+            if self.cameras.get(camera.video_id) is camera:
+                del self.cameras[camera.video_id]
+        camera.stop()
+        print(f"Camera {camera.video_id} stream ended")
+
+    def _sync_loop(self):
+        while not self.stopped.wait(self.sync_interval):
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"Error syncing streams: {str(e)}")
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_stream_scheduler():
+    """The process-wide scheduler, configured from settings and started on first use"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = StreamScheduler(
+                max_workers=getattr(settings, 'STREAM_SCHEDULER_WORKERS', 2),
+                batch_size=getattr(settings, 'STREAM_SCHEDULER_BATCH_SIZE', 4),
+                sync_interval=getattr(settings, 'STREAM_SCHEDULER_SYNC_INTERVAL', 60),
+            )
+        return _scheduler
@@ -0,0 +1,119 @@
+import math
+import numpy as np
+from ai_models.models import CameraZone
+from ai_models.ai.geometry import as_boxes, box_centers, points_in_polygon
+from .preprocess import INPUT_SIZE
+
+# YOLO inputs must be a multiple of the model stride
+MODEL_STRIDE = 32
+
+
+def shift_boxes(boxes, offset):
+    """Move (N, 4) xyxy boxes from crop to frame coordinates"""
+    x, y = offset
+    return np.asarray(boxes, dtype=np.float32).reshape(-1, 4) + np.array([x, y, x, y], dtype=np.float32)
+
+
+def shift_detections(detections, offset):
+    """Move ([left, top, w, h], ...) detections from crop to frame coordinates"""
+    x, y = offset
+    return [([left + x, top + y, w, h], *rest) for (left, top, w, h), *rest in detections]
+
+
+class ZoneMask:
+    """
+    The zones configured for one camera: polygons in frame pixels, each with a
+    zone type. Detectors run on the crop covering all of them (see crop and
+    input_size) and only keep detections whose center lies inside one.
+    A mask without zones leaves the full frame alone.
+    """
+
+    def __init__(self, zones=(), padding=16):
+        # zones: (zone_type, [[x, y], ...]) pairs
+        self.types = [zone_type for zone_type, _ in zones]
+        self.polygons = [np.asarray(polygon, dtype=np.float32).reshape(-1, 2) for _, polygon in zones]
+        self.padding = padding
+
+    def __bool__(self):
+        return bool(self.polygons)
+
+    def __len__(self):
+        return len(self.polygons)
+
+    def region(self, frame_shape):
+        """(x1, y1, x2, y2) of the padded union bounding box of the zones, clipped to the frame"""
+        h, w = frame_shape[:2]
+        if not self.polygons:
+            return 0, 0, w, h
+        points = np.vstack(self.polygons)
+        x1, y1 = np.floor(points.min(axis=0) - self.padding).astype(int)
+        x2, y2 = np.ceil(points.max(axis=0) + self.padding).astype(int)
+        x1, y1 = min(max(x1, 0), w - 1), min(max(y1, 0), h - 1)
+        x2, y2 = max(min(x2, w), x1 + 1), max(min(y2, h), y1 + 1)
+        return int(x1), int(y1), int(x2), int(y2)
+
+    def rectangles(self, offset=(0, 0)):
+        """(x1, y1, x2, y2) bounding box of each zone, relative to an (x, y) offset such as a crop's"""
+        x, y = offset
+        return [
+            (int(np.floor(points[:, 0].min())) - x, int(np.floor(points[:, 1].min())) - y,
+             int(np.ceil(points[:, 0].max())) - x, int(np.ceil(points[:, 1].max())) - y)
+            for points in self.polygons
+        ]
+
+    def crop(self, frame):
+        """The part of the frame covering every zone, and its (x, y) offset in the frame"""
+        x1, y1, x2, y2 = self.region(frame.shape)
+        return frame[y1:y2, x1:x2], (x1, y1)
+
+    def input_size(self, frame_shape, size=INPUT_SIZE):
+        """
+        Model input size for the crop that keeps the pixel density the full
+        frame had at `size`, so a camera whose zones cover a quarter of the
+        frame runs a model input a quarter the area.
+        """
+        h, w = frame_shape[:2]
+        x1, y1, x2, y2 = self.region(frame_shape)
+        fraction = max((x2 - x1) / w, (y2 - y1) / h)
+        return max(MODEL_STRIDE * 2, min(size, math.ceil(size * fraction / MODEL_STRIDE) * MODEL_STRIDE))
+
+    def contains(self, boxes):
+        """Whether the center of each (N, 4) xyxy box lies inside any zone"""
+        boxes = as_boxes(boxes)
+        if not self.polygons:
+            return np.ones(len(boxes), dtype=bool)
+        centers = box_centers(boxes)
+        inside = np.zeros(len(boxes), dtype=bool)
+        for polygon in self.polygons:
+            inside |= points_in_polygon(centers, polygon)
+        return inside
+
+    def filter_boxes(self, boxes, scores, classes):
+        """Keep the (boxes, scores, classes) detections inside a zone"""
+        keep = self.contains(boxes)
+        return np.asarray(boxes).reshape(-1, 4)[keep], np.asarray(scores)[keep], np.asarray(classes)[keep]
+
+    def filter_detections(self, detections):
+        """Keep the ([left, top, w, h], ...) detections inside a zone"""
+        if not self.polygons or not detections:
+            return detections
+        boxes = np.array([[l, t, l + w, t + h] for (l, t, w, h), *_ in detections], dtype=np.float32)
+        return [detection for detection, inside in zip(detections, self.contains(boxes)) if inside]
+
+    def stats(self):
+        return {'zones': len(self.polygons), 'zone_types': sorted(set(self.types))}
+
+
+def load_zone_mask(video):
+    """The ZoneMask for a Video (or video id) from its CameraZone rows"""
+    video_id = getattr(video, 'pk', video)
+    zones = CameraZone.objects.filter(video_id=video_id).values_list('zone_type', 'polygon')
+    return ZoneMask(list(zones))
+
+
+def load_zone_masks(video_ids):
+    """ZoneMasks for many videos with a single query, keyed by video id string"""
+    zones = {str(video_id): [] for video_id in video_ids}
+    for video_id, zone_type, polygon in CameraZone.objects.filter(video_id__in=video_ids).values_list('video_id', 'zone_type', 'polygon'):
+        zones[str(video_id)].append((zone_type, polygon))
+    return {video_id: ZoneMask(video_zones) for video_id, video_zones in zones.items()}
@@ -1,8 +1,9 @@
 from django.urls import path
-from ai_models.views.view_user import LoginUser,RegisterUser, user, GenerateFacialEmbedding, DetectionHistoryView
-from ai_models.views.view_video import VideoUploadView, VideoStreamView, FrameExtractView
+from ai_models.views.view_user import LoginUser,RegisterUser, user, GenerateFacialEmbedding, BulkFacialEmbedding, DetectionHistoryView
+from ai_models.views.view_video import VideoUploadView, VideoStreamView, FrameExtractView, CameraZoneListView, CameraZoneDetailView
 from ai_models.views.view_vehicle import VehicleView, VehicleLocationUpdateView
-from ai_models.views.view_ai import VehicleTrackingSSEView, FireSmokeDetectionSSE, AuthorizedPersonDetectionSSE, CombinedDetectionSSE
+from ai_models.views.view_ai import VehicleTrackingSSEView, FireSmokeDetectionSSE, AuthorizedPersonDetectionSSE, CombinedDetectionSSE, ModelRegistryStatsView, InferenceExecutorStatsView, StreamSchedulerStatsView, DetectionEventSinkStatsView
+from ai_models.views.view_ai_async import AsyncVehicleTrackingSSE, AsyncFireSmokeDetectionSSE, AsyncAuthorizedPersonDetectionSSE, AsyncCombinedDetectionSSE
 
 urlpatterns = [
     # User URLS
@@ -10,12 +11,15 @@ urlpatterns = [
     path('user/register/', RegisterUser.as_view()),
     path('user/details/', user),
     path('user/generate-embedding/', GenerateFacialEmbedding.as_view()),
+    path('user/generate-embedding/bulk/', BulkFacialEmbedding.as_view()),
     path('user/detection-history/', DetectionHistoryView.as_view()),
     
     # Video URLS
     path('video/upload/', VideoUploadView.as_view()),
     path('video/stream/', VideoStreamView.as_view()),
     path('video/extract-frames/', FrameExtractView.as_view()),
+    path('video/<uuid:video_id>/zones/', CameraZoneListView.as_view()),
+    path('video/<uuid:video_id>/zones/<uuid:zone_id>/', CameraZoneDetailView.as_view()),
     
     # Vehicle URLS
     path('vehicle/', VehicleView.as_view()),
@@ -26,5 +30,15 @@ urlpatterns = [
     path('ai/fire-smoke/detect/', FireSmokeDetectionSSE.as_view()),
     path('ai/authorized-person/detect/', AuthorizedPersonDetectionSSE.as_view()),
     path('ai/combined-detect/', CombinedDetectionSSE.as_view()),
+    path('ai/models/stats/', ModelRegistryStatsView.as_view()),
+    path('ai/models/executors/', InferenceExecutorStatsView.as_view()),
+    path('ai/streams/stats/', StreamSchedulerStatsView.as_view()),
+    path('ai/events/stats/', DetectionEventSinkStatsView.as_view()),
+
+    # Async AI Models Views (serve through ASGI)
+    path('ai/async/vehicle/track/', AsyncVehicleTrackingSSE.as_view()),
+    path('ai/async/fire-smoke/detect/', AsyncFireSmokeDetectionSSE.as_view()),
+    path('ai/async/authorized-person/detect/', AsyncAuthorizedPersonDetectionSSE.as_view()),
+    path('ai/async/combined-detect/', AsyncCombinedDetectionSSE.as_view()),
     # path('ai/intrusion-detect/', IntrusionDetectionSSE.as_view())
 ]
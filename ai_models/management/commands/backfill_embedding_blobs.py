@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from ai_models.models import FacialEmbedding
+from ai_models.ai.authorized_person_detection.embedding_store import embedding_fields, storage_dtype, EMBEDDING_DTYPES
+
+
+class Command(BaseCommand):
+    help = "Move facial embeddings from the JSON embedding_vector column into the binary embedding_blob column"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dtype', choices=EMBEDDING_DTYPES, default=None,
+                            help="Storage precision (defaults to FACE_EMBEDDING_DTYPE)")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--keep-json', action='store_true', help="Leave the JSON column populated")
+
+    def handle(self, *args, **options):
+        dtype = options['dtype'] or storage_dtype()
+        pending = FacialEmbedding.objects.filter(embedding_blob__isnull=True, embedding_vector__isnull=False)
+        total = pending.count()
+        self.stdout.write(f"Converting {total} embeddings to {dtype}")
+
+        converted = 0
+        while True:
+            # Converted rows drop out of the filter, so always take the first batch
+            batch = list(pending.order_by('pk')[:options['batch_size']])
+            if not batch:
+                break
+
+            for embedding in batch:
+                fields = embedding_fields(embedding.embedding_vector, dtype)
+                embedding.embedding_blob = fields['embedding_blob']
+                embedding.embedding_dtype = fields['embedding_dtype']
+                if not options['keep_json']:
+                    embedding.embedding_vector = None
+
+            FacialEmbedding.objects.bulk_update(batch, ['embedding_blob', 'embedding_dtype', 'embedding_vector'])
+            converted += len(batch)
+            self.stdout.write(f"Converted {converted}/{total}")
+
+        self.stdout.write(self.style.SUCCESS(f"Converted {converted} embeddings"))
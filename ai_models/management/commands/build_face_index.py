@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from ai_models.models import FacialEmbedding
+from ai_models.ai.authorized_person_detection.embedding_store import load_owner_embeddings
+from ai_models.ai.authorized_person_detection.gallery import build_gallery
+from ai_models.ai.authorized_person_detection.gallery_cache import gallery_index_path
+
+
+class Command(BaseCommand):
+    help = "Build and save the face gallery index of one or every owner for memory-mapped loading at startup"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', help="Owner (user) id; defaults to every owner with embeddings")
+        parser.add_argument('--kind', choices=['auto', 'exact', 'ivf'], default=None,
+                            help="Index type (defaults to FACE_GALLERY_INDEX)")
+
+    def handle(self, *args, **options):
+        if not getattr(settings, 'FACE_GALLERY_INDEX_DIR', None):
+            raise CommandError("Set FACE_GALLERY_INDEX_DIR to the directory the indexes should be saved in")
+
+        if options['owner']:
+            owner_ids = [options['owner']]
+        else:
+            owner_ids = FacialEmbedding.objects.values_list('user_id', flat=True).distinct()
+
+        for owner_id in owner_ids:
+            embeddings, usernames, ids = load_owner_embeddings(owner_id)
+            if not usernames:
+                self.stdout.write(f"No embeddings for {owner_id}, skipping")
+                continue
+
+            gallery = build_gallery(embeddings, usernames, ids=[str(row_id) for row_id in ids], kind=options['kind'])
+            path = gallery_index_path(owner_id)
+            gallery.save(path)
+            self.stdout.write(f"Saved {gallery.index.kind} index of {len(gallery)} embeddings for {owner_id} to {path}")
@@ -0,0 +1,27 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from ai_models.ai.authorized_person_detection.face_db import convert_pickle_face_db, FaceDatabase
+
+
+class Command(BaseCommand):
+    help = "Convert a pickled face database (face_db.pkl) to the memory-mapped face database format"
+
+    def add_arguments(self, parser):
+        parser.add_argument('pickle_path')
+        parser.add_argument('--output', help="Output directory (defaults to the pickle path without .pkl)")
+
+    def handle(self, *args, **options):
+        pickle_path = options['pickle_path']
+        if not os.path.exists(pickle_path):
+            raise CommandError(f"{pickle_path} does not exist")
+
+        output = options['output'] or os.path.splitext(pickle_path)[0]
+        count = convert_pickle_face_db(pickle_path, output)
+
+        # Read it back so a broken conversion fails here rather than at startup
+        face_db = FaceDatabase.load(output)
+        if len(face_db) != count:
+            raise CommandError(f"Wrote {count} people but read back {len(face_db)}")
+        if not face_db.verify():
+            raise CommandError(f"Embeddings in {output} do not match the checksum in its table")
+        self.stdout.write(self.style.SUCCESS(f"Converted {count} people to {output}"))
@@ -0,0 +1,42 @@
+import time
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from ai_models.ai.pipeline.scheduler import StreamScheduler
+from ai_models.utils.cooldown_index import get_cooldown_index
+
+
+class Command(BaseCommand):
+    help = "Run detection on every registered live stream with a bounded pool of inference workers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'STREAM_SCHEDULER_WORKERS', 2))
+        parser.add_argument('--batch-size', type=int, default=getattr(settings, 'STREAM_SCHEDULER_BATCH_SIZE', 4))
+        parser.add_argument('--sync-interval', type=int, default=getattr(settings, 'STREAM_SCHEDULER_SYNC_INTERVAL', 60),
+                            help="Seconds between checks for added or removed streams")
+        parser.add_argument('--stats-interval', type=int, default=30, help="Seconds between stats reports")
+
+    def handle(self, *args, **options):
+        # Pick up cooldowns still running from before a restart
+        restored = get_cooldown_index().warm()
+        self.stdout.write(f"Restored {restored} recent detection events into the cooldown index")
+
+        scheduler = StreamScheduler(
+            max_workers=options['workers'],
+            batch_size=options['batch_size'],
+            sync_interval=options['sync_interval'],
+        )
+        scheduler.start()
+
+        try:
+            while True:
+                time.sleep(options['stats_interval'])
+                for camera in scheduler.stats()['cameras']:
+                    self.stdout.write(
+                        f"camera {camera['video_id']}: {camera['analysis_fps']}/{camera['source_fps']} fps analysed, "
+                        f"queue depth {camera['queue_depth']}, dropped {camera['frames_dropped']}, "
+                        f"processed {camera['frames_processed']}"
+                    )
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping stream scheduler...")
+        finally:
+            scheduler.stop()
@@ -21,7 +21,9 @@ class User(AbstractBaseUser):
 class FacialEmbedding(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='embeddings')
-    embedding_vector = models.JSONField()  # Storing the 512D embedding as a JSON array of floats
+    embedding_vector = models.JSONField(null=True, blank=True)  # Legacy: the 512D embedding as a JSON array of floats
+    embedding_blob = models.BinaryField(null=True, editable=False)  # The embedding as packed floats of embedding_dtype
+    embedding_dtype = models.CharField(max_length=10, default='float32')
     created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     def __str__(self):
@@ -50,7 +52,8 @@ class DetectionEvent(models.Model):
     EVENT_TYPES = [
         ('CAR_MOVEMENT', 'Car Movement'),
         ('ENVIRONMENTAL_HAZARD', 'Fire or Smoke'),
-        ('UNAUTHORIZED_ACCESS', 'Unauthorized Access')
+        ('UNAUTHORIZED_ACCESS', 'Unauthorized Access'),
+        ('SUSPICIOUS_ACTIVITY', 'Suspicious Activity')
     ]
 
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='events')
@@ -61,6 +64,12 @@ class DetectionEvent(models.Model):
     description = models.TextField(blank=True, null=True)
     is_alert_sent = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Cooldown lookups: an owner's latest events of a given type
+            models.Index(fields=['owner', 'event_type', 'timestamp'], name='event_owner_type_time_idx')
+        ]
+
 class Video(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
     VIDEO_TYPE_CHOICES = [
@@ -77,5 +86,21 @@ class Video(models.Model):
 
     def __str__(self):
         return f"{self.video_type} by {self.owner} at {self.uploaded_at}"
-    
-    
\ No newline at end of file
+
+
+class CameraZone(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    ZONE_TYPES = [
+        ('PARKING_BAY', 'Parking Bay'),
+        ('ENTRANCE', 'Entrance'),
+        ('NO_GO', 'No-Go Area'),
+    ]
+
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='zones')
+    name = models.CharField(max_length=100)
+    zone_type = models.CharField(max_length=20, choices=ZONE_TYPES)
+    polygon = models.JSONField()  # [[x, y], ...] vertices in frame pixels
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    def __str__(self):
+        return f"{self.name} ({self.zone_type}) on {self.video_id}"
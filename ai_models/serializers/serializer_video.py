@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from ai_models.models import CameraZone
 
 class VideoUploadSerializer(serializers.Serializer):
     video = serializers.FileField()
@@ -18,4 +19,20 @@ class VideoUploadSerializer(serializers.Serializer):
 
 class VideoStreamSerializer(serializers.Serializer):
     stream_url = serializers.URLField()
-    
\ No newline at end of file
+
+
+class CameraZoneSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CameraZone
+        fields = ['id', 'name', 'zone_type', 'polygon', 'created_at']
+        read_only_fields = ['id', 'created_at']
+
+    def validate_polygon(self, value):
+        # A list of at least three [x, y] vertices in frame pixels
+        if not isinstance(value, list) or len(value) < 3:
+            raise serializers.ValidationError("A zone needs at least three [x, y] points.")
+        for point in value:
+            if (not isinstance(point, (list, tuple)) or len(point) != 2
+                    or not all(isinstance(v, (int, float)) and not isinstance(v, bool) and v >= 0 for v in point)):
+                raise serializers.ValidationError("Every point must be a pair of non-negative [x, y] pixel coordinates.")
+        return [[float(x), float(y)] for x, y in value]
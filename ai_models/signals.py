@@ -0,0 +1,18 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from ai_models.models import FacialEmbedding
+from ai_models.ai.authorized_person_detection.gallery_cache import gallery_cache
+
+
+@receiver(post_save, sender=FacialEmbedding)
+def update_embedding_gallery(sender, instance, created, **kwargs):
+    """Running recognition streams pick up the owner's new gallery on their next frame"""
+    if created:
+        gallery_cache.add(instance)
+    else:
+        gallery_cache.invalidate(instance.user_id)
+
+
+@receiver(post_delete, sender=FacialEmbedding)
+def invalidate_embedding_gallery(sender, instance, **kwargs):
+    gallery_cache.invalidate(instance.user_id)
@@ -0,0 +1,89 @@
+from datetime import timedelta
+from unittest import mock
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from ai_models.models import User, DetectionEvent
+from ai_models.utils import cooldown_index
+from ai_models.utils.cooldown_index import CooldownIndex
+
+SHARED_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default'},
+    'cooldowns': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'cooldowns'},
+}
+
+
+class CooldownIndexTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(email='owner@example.com', password='secret', username='owner')
+
+    def test_acquire_starts_a_cooldown(self):
+        index = CooldownIndex(cooldown=timedelta(minutes=5))
+        self.assertTrue(index.acquire(self.owner.pk, 'CAR_MOVEMENT'))
+        self.assertFalse(index.acquire(self.owner.pk, 'CAR_MOVEMENT'))
+        # Other event types and vehicles have their own cooldowns
+        self.assertTrue(index.acquire(self.owner.pk, 'ENVIRONMENTAL_HAZARD'))
+        self.assertTrue(index.acquire(self.owner.pk, 'CAR_MOVEMENT', vehicle_id='vehicle'))
+        self.assertEqual(index.stats()['suppressed'], 1)
+
+    def test_release_ends_the_cooldown(self):
+        index = CooldownIndex()
+        self.assertTrue(index.acquire(self.owner.pk, 'CAR_MOVEMENT'))
+        index.release(self.owner.pk, 'CAR_MOVEMENT')
+        self.assertTrue(index.acquire(self.owner.pk, 'CAR_MOVEMENT'))
+
+    def test_cooldown_expires(self):
+        index = CooldownIndex(cooldown=timedelta(seconds=60))
+        with mock.patch.object(cooldown_index.time, 'time', return_value=1000.0):
+            self.assertTrue(index.acquire(self.owner.pk, 'CAR_MOVEMENT'))
+        with mock.patch.object(cooldown_index.time, 'time', return_value=1059.0):
+            self.assertFalse(index.acquire(self.owner.pk, 'CAR_MOVEMENT'))
+        with mock.patch.object(cooldown_index.time, 'time', return_value=1061.0):
+            self.assertTrue(index.acquire(self.owner.pk, 'CAR_MOVEMENT'))
+
+    def test_warms_running_cooldowns_from_the_database(self):
+        DetectionEvent.objects.create(owner=self.owner, event_type='UNAUTHORIZED_ACCESS')
+        old = DetectionEvent.objects.create(owner=self.owner, event_type='CAR_MOVEMENT')
+        DetectionEvent.objects.filter(pk=old.pk).update(timestamp=timezone.now() - timedelta(minutes=10))
+
+        index = CooldownIndex(cooldown=timedelta(minutes=5))
+        self.assertFalse(index.acquire(self.owner.pk, 'UNAUTHORIZED_ACCESS'))
+        self.assertTrue(index.acquire(self.owner.pk, 'CAR_MOVEMENT'))
+        self.assertEqual(index.stats()['warm_queries'], 1)
+
+    def test_warm_failure_does_not_reach_the_caller(self):
+        index = CooldownIndex()
+        with mock.patch.object(index, 'warm', side_effect=DatabaseError("database is down")) as warm:
+            self.assertTrue(index.acquire(self.owner.pk, 'CAR_MOVEMENT'))
+            # Answered from memory, and the failed owner is not queried again on every event
+            self.assertFalse(index.acquire(self.owner.pk, 'CAR_MOVEMENT'))
+            self.assertEqual(warm.call_count, 1)
+        self.assertEqual(index.stats()['warm_errors'], 1)
+        self.assertNotIn(self.owner.pk, index.warmed_owners)
+
+    def test_failed_warm_is_retried(self):
+        index = CooldownIndex()
+        with mock.patch.object(cooldown_index.time, 'time', return_value=1000.0):
+            with mock.patch.object(index, 'warm', side_effect=DatabaseError("database is down")):
+                index.acquire(self.owner.pk, 'CAR_MOVEMENT')
+
+        retry_at = 1000.0 + cooldown_index.WARM_RETRY_INTERVAL + 1
+        with mock.patch.object(cooldown_index.time, 'time', return_value=retry_at):
+            index.acquire(self.owner.pk, 'ENVIRONMENTAL_HAZARD')
+        self.assertIn(self.owner.pk, index.warmed_owners)
+        self.assertEqual(index.stats()['warm_queries'], 1)
+
+    @override_settings(CACHES=SHARED_CACHE)
+    def test_shared_cache_suppresses_across_processes(self):
+        # Two indexes sharing a cache stand in for two worker processes
+        first = CooldownIndex(cache_alias='cooldowns')
+        second = CooldownIndex(cache_alias='cooldowns')
+        self.assertTrue(first.acquire(self.owner.pk, 'CAR_MOVEMENT'))
+        self.assertFalse(second.acquire(self.owner.pk, 'CAR_MOVEMENT'))
+        # The second process now answers from its own memory
+        self.assertIn((self.owner.pk, 'CAR_MOVEMENT', None), second.entries)
+
+        # Releasing in one process frees the shared cooldown for the other
+        first.release(self.owner.pk, 'CAR_MOVEMENT')
+        second.entries.clear()
+        self.assertTrue(second.acquire(self.owner.pk, 'CAR_MOVEMENT'))
@@ -0,0 +1,129 @@
+import numpy as np
+from django.test import SimpleTestCase
+from ai_models.ai import geometry
+from ai_models.ai.intrusion_detection.utils import calculate_iou, calculate_movement_speed
+
+
+def random_boxes(rng, count):
+    sizes = rng.uniform(1, 100, size=(count, 2))
+    corners = rng.uniform(0, 500, size=(count, 2))
+    return np.hstack([corners, corners + sizes]).astype(np.float32)
+
+
+def scalar_nms(boxes, scores, classes, iou_threshold=0.5):
+    """Greedy per-class NMS on the scalar IoU, the way it would be written without numpy"""
+    keep = []
+    for i in sorted(range(len(boxes)), key=lambda i: -scores[i]):
+        if all(classes[i] != classes[j] or calculate_iou(boxes[i], boxes[j]) <= iou_threshold for j in keep):
+            keep.append(i)
+    return keep
+
+
+def scalar_point_in_polygon(point, polygon):
+    x, y = point
+    inside = False
+    for (x1, y1), (x2, y2) in zip(polygon, polygon[1:] + polygon[:1]):
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+
+class BoxIouTests(SimpleTestCase):
+    def test_matches_scalar_iou(self):
+        rng = np.random.default_rng(0)
+        boxes, others = random_boxes(rng, 20), random_boxes(rng, 15)
+        # Make sure some pairs overlap
+        others[:5] = boxes[:5] + 10
+        expected = [[calculate_iou(a, b) for b in others.tolist()] for a in boxes.tolist()]
+        np.testing.assert_allclose(geometry.box_iou(boxes, others), expected, atol=1e-6)
+
+    def test_empty_inputs(self):
+        boxes = random_boxes(np.random.default_rng(1), 3)
+        self.assertEqual(geometry.box_iou(np.empty((0, 4)), boxes).shape, (0, 3))
+        self.assertEqual(geometry.box_iou(boxes, []).shape, (3, 0))
+
+    def test_zero_area_boxes(self):
+        point = [10, 10, 10, 10]
+        line = [0, 5, 20, 5]
+        box = [0, 0, 20, 20]
+        for a, b in [(point, point), (point, box), (line, box), (line, line)]:
+            self.assertAlmostEqual(float(geometry.box_iou(a, b)[0, 0]), calculate_iou(a, b))
+            self.assertEqual(float(geometry.box_iou(a, b)[0, 0]), 0.0)
+
+
+class NmsTests(SimpleTestCase):
+    def test_matches_scalar_nms(self):
+        rng = np.random.default_rng(2)
+        boxes = random_boxes(rng, 10)
+        boxes = np.vstack([boxes, boxes + rng.uniform(-5, 5, size=boxes.shape).astype(np.float32)])
+        scores = rng.uniform(size=len(boxes)).astype(np.float32)
+        classes = rng.integers(0, 2, size=len(boxes))
+        expected = scalar_nms(boxes.tolist(), scores.tolist(), classes.tolist())
+        self.assertEqual(geometry.nms(boxes, scores, classes).tolist(), expected)
+
+    def test_keeps_overlapping_boxes_of_different_classes(self):
+        boxes = [[0, 0, 10, 10], [0, 0, 10, 10]]
+        self.assertEqual(geometry.nms(boxes, [0.9, 0.8], [0, 1]).tolist(), [0, 1])
+        self.assertEqual(geometry.nms(boxes, [0.8, 0.9], [0, 0]).tolist(), [1])
+
+    def test_empty_inputs(self):
+        self.assertEqual(len(geometry.nms(np.empty((0, 4)), [], [])), 0)
+
+    def test_zero_area_boxes(self):
+        # Zero-area boxes never overlap anything, so none is suppressed
+        boxes = [[5, 5, 5, 5], [5, 5, 5, 5], [0, 0, 10, 10]]
+        self.assertEqual(geometry.nms(boxes, [0.9, 0.8, 0.7], [0, 0, 0]).tolist(), [0, 1, 2])
+
+
+class PointsInPolygonTests(SimpleTestCase):
+    def test_matches_scalar_ray_casting(self):
+        rng = np.random.default_rng(3)
+        # A concave polygon
+        polygon = [[0, 0], [100, 0], [100, 100], [50, 40], [0, 100]]
+        points = rng.uniform(-10, 110, size=(200, 2)).astype(np.float32)
+        expected = [scalar_point_in_polygon(point, polygon) for point in points.tolist()]
+        self.assertEqual(geometry.points_in_polygon(points, polygon).tolist(), expected)
+        self.assertTrue(geometry.points_in_polygon([[50, 20]], polygon)[0])
+        self.assertFalse(geometry.points_in_polygon([[50, 80]], polygon)[0])
+
+    def test_empty_inputs(self):
+        self.assertEqual(geometry.points_in_polygon(np.empty((0, 2)), [[0, 0], [1, 0], [0, 1]]).shape, (0,))
+        self.assertFalse(geometry.points_in_polygon([[0, 0]], np.empty((0, 2)))[0])
+
+    def test_zero_area_polygon(self):
+        self.assertFalse(geometry.points_in_polygon([[5, 5]], [[0, 0], [10, 10], [20, 20]])[0])
+
+
+class TrackSpeedTests(SimpleTestCase):
+    def test_matches_scalar_speed(self):
+        rng = np.random.default_rng(4)
+        start = random_boxes(rng, 6)
+        steps = rng.normal(0, 3, size=(6, 12, 2)).cumsum(axis=1)
+        histories = (start[:, None, :] + np.concatenate([steps, steps], axis=2)).astype(np.float32)
+        expected = [calculate_movement_speed(track, fps=25) for track in histories.tolist()]
+        np.testing.assert_allclose(geometry.track_speeds(histories, fps=25), expected, rtol=1e-4)
+        np.testing.assert_allclose(
+            geometry.path_lengths(histories), np.array(expected) * histories.shape[1] / 25, rtol=1e-4
+        )
+
+    def test_nan_padded_histories(self):
+        tracks = [
+            [[0, 0, 10, 10], [3, 4, 13, 14], [6, 8, 16, 18]],
+            [[0, 0, 10, 10], [0, 10, 10, 20]],
+            [[0, 0, 10, 10]],
+        ]
+        histories = np.full((3, 3, 4), np.nan, dtype=np.float32)
+        for i, track in enumerate(tracks):
+            histories[i, :len(track)] = track
+        np.testing.assert_allclose(geometry.path_lengths(histories), [10, 10, 0])
+        expected = [calculate_movement_speed(track) for track in tracks]
+        np.testing.assert_allclose(geometry.track_speeds(histories), expected, rtol=1e-5)
+        self.assertEqual(expected[2], 0)
+
+    def test_empty_inputs(self):
+        self.assertEqual(geometry.track_speeds(np.empty((0, 5, 4))).shape, (0,))
+        self.assertEqual(geometry.path_lengths(np.empty((0, 5, 4))).shape, (0,))
+
+    def test_stationary_zero_area_track(self):
+        histories = np.zeros((1, 10, 4), dtype=np.float32)
+        self.assertEqual(geometry.track_speeds(histories)[0], calculate_movement_speed(histories[0].tolist()))
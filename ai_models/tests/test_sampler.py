@@ -0,0 +1,49 @@
+import numpy as np
+from django.test import SimpleTestCase
+from ai_models.ai.pipeline.frame_bus import FrameBus, BLOCK, DROP_OLDEST
+from ai_models.ai.pipeline.sampler import frame_sampler
+
+
+def offer_frames(subscription, indices):
+    for index in indices:
+        subscription._offer(index, np.full((2, 2), index, dtype=np.uint8))
+
+
+class FrameSamplerTests(SimpleTestCase):
+    def test_drop_oldest_subscription_reads_newest_frame(self):
+        frames = FrameBus('live').subscribe('test', maxsize=4, drop_policy=DROP_OLDEST)
+        sampler = frame_sampler(frames)
+        # A slow detector would make a grab-skipping sampler wait for frames the bus has not decoded yet
+        sampler.record_latency(1.0)
+        self.assertEqual(sampler.stride, 1)
+
+        offer_frames(frames, range(1, 7))  # the bus keeps 3..6
+        ret, frame = sampler.read(frames)
+        self.assertTrue(ret)
+        self.assertEqual(frame[0, 0], 6)
+        self.assertEqual(frames.qsize(), 0)
+        self.assertEqual(sampler.frames_skipped, 3)
+
+    def test_drop_oldest_subscription_ignores_quiet_stride(self):
+        frames = FrameBus('live').subscribe('test', maxsize=2, drop_policy=DROP_OLDEST)
+        sampler = frame_sampler(frames)
+        sampler.set_min_stride(5)
+        self.assertEqual(sampler.stride, 1)
+
+        offer_frames(frames, [1])
+        ret, frame = sampler.read(frames)
+        self.assertTrue(ret)
+        self.assertEqual(frame[0, 0], 1)
+
+    def test_block_subscription_skips_by_latency(self):
+        frames = FrameBus('file').subscribe('test', maxsize=32, drop_policy=BLOCK)
+        sampler = frame_sampler(frames)
+        sampler.record_latency(3 / sampler.source_fps)
+        self.assertEqual(sampler.stride, 3)
+
+        offer_frames(frames, range(1, 7))
+        ret, frame = sampler.read(frames)
+        self.assertTrue(ret)
+        self.assertEqual(frame[0, 0], 3)
+        self.assertEqual(sampler.frame_index, 3)
+        self.assertEqual(sampler.frames_skipped, 2)
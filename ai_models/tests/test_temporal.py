@@ -0,0 +1,133 @@
+from types import SimpleNamespace
+import numpy as np
+from django.test import SimpleTestCase
+from ai_models.ai.fire_smoke_detection.temporal import TemporalConfirmer
+from ai_models.ai.pipeline.motion import MotionGate
+from ai_models.ai.pipeline.scheduler import CameraStream
+
+FIRE = [[100, 100, 140, 150]]
+NOTHING = ([], [], [])
+
+
+def seen(confirmer, boxes=FIRE, label='fire'):
+    return confirmer.update(boxes, [0.6] * len(boxes), [label] * len(boxes))
+
+
+def quiet(confirmer):
+    return confirmer.update(*NOTHING)
+
+
+class TemporalConfirmerTests(SimpleTestCase):
+    def test_confirms_after_required_of_window(self):
+        confirmer = TemporalConfirmer(window=8, required=4)
+        # Hits on alternating frames: the 4th hit is the 7th frame, still inside the window
+        results = []
+        for frame in range(7):
+            results.append(seen(confirmer) if frame % 2 == 0 else quiet(confirmer))
+        self.assertEqual([len(confirmed) for confirmed in results], [0, 0, 0, 0, 0, 0, 1])
+        self.assertEqual(confirmer.confirmed('fire')[0].hits, 4)
+        self.assertEqual(confirmer.confirmed('smoke'), [])
+
+    def test_alerts_once_per_region(self):
+        confirmer = TemporalConfirmer(window=4, required=2)
+        results = [seen(confirmer) for _ in range(6)]
+        self.assertEqual([len(confirmed) for confirmed in results], [0, 1, 0, 0, 0, 0])
+        self.assertEqual(confirmer.confirmations, 1)
+
+    def test_flicker_below_required_is_never_confirmed(self):
+        confirmer = TemporalConfirmer(window=8, required=4)
+        for frame in range(24):
+            confirmed = seen(confirmer) if frame % 3 == 0 else quiet(confirmer)
+            self.assertEqual(confirmed, [])
+        self.assertEqual(confirmer.confirmations, 0)
+
+    def test_labels_and_places_vote_separately(self):
+        confirmer = TemporalConfirmer(window=4, required=2)
+        seen(confirmer, label='fire')
+        seen(confirmer, label='smoke')
+        seen(confirmer, boxes=[[400, 400, 440, 450]], label='fire')
+        self.assertEqual(len(confirmer.regions), 3)
+        self.assertEqual(confirmer.confirmed(), [])
+
+    def test_region_is_forgotten_after_a_quiet_window(self):
+        confirmer = TemporalConfirmer(window=5, required=2)
+        seen(confirmer)
+        for _ in range(4):
+            quiet(confirmer)
+            self.assertTrue(confirmer.active)
+        quiet(confirmer)
+        self.assertFalse(confirmer.active)
+
+        # A confirmed region decays the same way, and alerts again when it comes back
+        seen(confirmer)
+        seen(confirmer)
+        self.assertEqual(len(confirmer.confirmed('fire')), 1)
+        for _ in range(5):
+            quiet(confirmer)
+        self.assertFalse(confirmer.active)
+        self.assertEqual(confirmer.confirmed(), [])
+        seen(confirmer)
+        self.assertEqual(len(seen(confirmer)), 1)
+
+    def test_active_toggles_with_candidates(self):
+        confirmer = TemporalConfirmer(window=3, required=2)
+        self.assertFalse(confirmer.active)
+        quiet(confirmer)
+        self.assertFalse(confirmer.active)
+        seen(confirmer)
+        self.assertTrue(confirmer.active)
+        for _ in range(3):
+            quiet(confirmer)
+        self.assertFalse(confirmer.active)
+
+    def test_schedule_is_sparse_while_quiet(self):
+        confirmer = TemporalConfirmer(quiet_stride=3)
+        self.assertEqual(confirmer.schedule(7), [False, False, True, False, False, True, False])
+
+        # The stride counts frames skipped since the last inference
+        confirmer.skip()
+        confirmer.skip()
+        self.assertEqual(confirmer.schedule(2), [True, False])
+        quiet(confirmer)
+        self.assertEqual(confirmer.schedule(3), [False, False, True])
+        self.assertEqual(confirmer.frames_skipped, 2)
+
+    def test_schedule_runs_every_frame_while_active(self):
+        confirmer = TemporalConfirmer(window=3, required=3, quiet_stride=5)
+        seen(confirmer)
+        self.assertEqual(confirmer.schedule(4), [True] * 4)
+        for _ in range(3):
+            quiet(confirmer)
+        self.assertEqual(confirmer.schedule(5), [False, False, False, False, True])
+
+
+class MotionGateAndConfirmerTests(SimpleTestCase):
+    """How the scheduler's motion gate and a camera's fire confirmer work together"""
+
+    def camera(self, confirmer):
+        camera = CameraStream.__new__(CameraStream)
+        # A static scene: the motion detector never reports movement
+        camera.gate = MotionGate('fire', motion=SimpleNamespace(update=lambda frame: False))
+        camera.detector = SimpleNamespace(fire_confirmer=confirmer)
+        return camera
+
+    def test_static_scene_confirms_at_full_rate_once_a_candidate_appears(self):
+        confirmer = TemporalConfirmer(window=8, required=4)
+        camera = self.camera(confirmer)
+        frame = np.zeros((120, 160, 3), dtype=np.uint8)
+
+        analysed, confirmed_at = [], None
+        for index in range(1, 60):
+            if not camera.wants_frame(frame):
+                continue
+            analysed.append(index)
+            # The detector sees fire on every analysed frame
+            if seen(confirmer):
+                confirmed_at = index
+                break
+
+        heartbeat = camera.gate.policy.heartbeat
+        # The static scene is only checked at the heartbeat until the candidate shows up
+        self.assertEqual(analysed[0], heartbeat)
+        # Then every frame is analysed, rather than one per heartbeat
+        self.assertEqual(confirmed_at, heartbeat + confirmer.required - 1)
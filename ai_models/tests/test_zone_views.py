@@ -0,0 +1,66 @@
+from uuid import uuid4
+from rest_framework import status
+from rest_framework.test import APITestCase
+from ai_models.models import User, Video, CameraZone
+
+SQUARE = [[0, 0], [100, 0], [100, 100], [0, 100]]
+
+
+class CameraZoneViewTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='secret', username='owner')
+        self.other = User.objects.create_user(email='other@example.com', password='secret', username='other')
+        self.video = Video.objects.create(owner=self.user, video_type='stream', video_url='rtsp://camera/1')
+        self.other_video = Video.objects.create(owner=self.other, video_type='stream', video_url='rtsp://camera/2')
+        self.zone = CameraZone.objects.create(video=self.video, name='Bay 1', zone_type='PARKING_BAY', polygon=SQUARE)
+        self.other_zone = CameraZone.objects.create(video=self.other_video, name='Gate', zone_type='ENTRANCE', polygon=SQUARE)
+        self.client.force_authenticate(self.user)
+
+    def list_url(self, video):
+        return f'/api/models/video/{video.id}/zones/'
+
+    def detail_url(self, zone):
+        return f'/api/models/video/{zone.video_id}/zones/{zone.id}/'
+
+    def test_list_zones(self):
+        response = self.client.get(self.list_url(self.video))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([zone['id'] for zone in response.data['zones']], [str(self.zone.id)])
+
+    def test_add_zone(self):
+        response = self.client.post(self.list_url(self.video), {'name': 'No go', 'zone_type': 'NO_GO', 'polygon': SQUARE}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.video.zones.count(), 2)
+
+    def test_add_zone_rejects_bad_polygon(self):
+        response = self.client.post(self.list_url(self.video), {'name': 'Line', 'zone_type': 'NO_GO', 'polygon': [[0, 0], [1, 1]]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_delete_zone(self):
+        response = self.client.delete(self.detail_url(self.zone))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(CameraZone.objects.filter(id=self.zone.id).exists())
+
+    def test_delete_missing_zone(self):
+        response = self.client.delete(f'/api/models/video/{self.video.id}/zones/{uuid4()}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_route_does_not_allow_delete(self):
+        response = self.client.delete(self.list_url(self.video))
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_detail_route_does_not_allow_get_or_post(self):
+        self.assertEqual(self.client.get(self.detail_url(self.zone)).status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        response = self.client.post(self.detail_url(self.zone), {'name': 'x', 'zone_type': 'NO_GO', 'polygon': SQUARE}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_other_owners_zones_are_rejected(self):
+        self.assertEqual(self.client.get(self.list_url(self.other_video)).status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.post(self.list_url(self.other_video), {'name': 'x', 'zone_type': 'NO_GO', 'polygon': SQUARE}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.delete(self.detail_url(self.other_zone)).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(CameraZone.objects.filter(id=self.other_zone.id).exists())
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(self.list_url(self.video)).status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,137 @@
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from ai_models.models import DetectionEvent
+
+EVENT_SAVE_COOLDOWN = timedelta(minutes=5)  # 5 min cooldown
+WARM_RETRY_INTERVAL = 30  # seconds before retrying a warm-up query that failed
+
+
+class CooldownIndex:
+    """
+    Answers "is this event still in its cooldown?" from memory. Entries are
+    keyed by (owner, event_type, vehicle) and hold the time the cooldown ends.
+
+    The database stays the durable record: the first time an owner is seen
+    their recent events are loaded with one indexed query, so a restart does
+    not reopen a cooldown that is still running. With a cache alias the index
+    is also shared between processes through cache.add(), which is atomic on
+    the shared backends (Redis, Memcached, database). If that query fails
+    (e.g. the database is briefly down) the index answers from memory alone
+    and retries the owner after WARM_RETRY_INTERVAL seconds.
+    """
+
+    def __init__(self, cooldown=EVENT_SAVE_COOLDOWN, cache_alias=None):
+        self.cooldown = cooldown
+        self.cache = caches[cache_alias] if cache_alias else None
+        self.entries = {}
+        self.warmed_owners = set()
+        self.warm_retry_at = {}  # owner_id -> when to retry a failed warm-up
+        self.lock = threading.Lock()
+        self.last_pruned = time.time()
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+        self.warm_queries = 0
+        self.warm_errors = 0
+
+    def acquire(self, owner_id, event_type, vehicle_id=None):
+        """Start the cooldown and return True, or return False if one is already running"""
+        if owner_id not in self.warmed_owners:
+            self._try_warm(owner_id)
+
+        key = (owner_id, event_type, vehicle_id)
+        now = time.time()
+        with self.lock:
+            if self.entries.get(key, 0) > now:
+                self.hits += 1
+                return False
+            if self.cache is not None and not self.cache.add(self._cache_key(key), 1, timeout=self.cooldown.total_seconds()):
+                # Another process saved this event; mirror its cooldown locally
+                self.entries[key] = now + self.cooldown.total_seconds()
+                self.hits += 1
+                return False
+            self.entries[key] = now + self.cooldown.total_seconds()
+            self.misses += 1
+            self._prune(now)
+            return True
+
+    def release(self, owner_id, event_type, vehicle_id=None):
+        """Forget a cooldown whose event could not be saved after all"""
+        key = (owner_id, event_type, vehicle_id)
+        with self.lock:
+            self.entries.pop(key, None)
+        if self.cache is not None:
+            self.cache.delete(self._cache_key(key))
+
+    def warm(self, owner_id=None):
+        """Load the cooldowns still running in the database, for one owner or for everyone"""
+        since = timezone.now() - self.cooldown
+        events = DetectionEvent.objects.filter(timestamp__gte=since)
+        if owner_id is not None:
+            events = events.filter(owner_id=owner_id)
+        rows = list(events.values_list('owner_id', 'event_type', 'vehicle_id', 'timestamp'))
+
+        with self.lock:
+            self.warm_queries += 1
+            for row_owner_id, event_type, vehicle_id, timestamp in rows:
+                key = (row_owner_id, event_type, vehicle_id)
+                ends = (timestamp + self.cooldown).timestamp()
+                self.entries[key] = max(self.entries.get(key, 0), ends)
+                self.warmed_owners.add(row_owner_id)
+            if owner_id is not None:
+                self.warmed_owners.add(owner_id)
+        return len(rows)
+
+    def _try_warm(self, owner_id):
+        # Runs on the detector thread; a database error must not reach the inference loop
+        if time.time() < self.warm_retry_at.get(owner_id, 0):
+            return
+        try:
+            self.warm(owner_id)
+            self.warm_retry_at.pop(owner_id, None)
+        except Exception as e:
+            print(f"Error loading event cooldowns for owner {owner_id}: {str(e)}")
+            with self.lock:
+                self.warm_errors += 1
+                self.warm_retry_at[owner_id] = time.time() + WARM_RETRY_INTERVAL
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'owners_warmed': len(self.warmed_owners),
+                'suppressed': self.hits,
+                'allowed': self.misses,
+                'warm_queries': self.warm_queries,
+                'warm_errors': self.warm_errors,
+                'shared_cache': self.cache is not None,
+            }
+
+    def _prune(self, now):
+        # Called with the lock held; drop expired entries once per cooldown period
+        if now - self.last_pruned < self.cooldown.total_seconds():
+            return
+        self.entries = {key: ends for key, ends in self.entries.items() if ends > now}
+        self.last_pruned = now
+
+    def _cache_key(self, key):
+        owner_id, event_type, vehicle_id = key
+        return f"event-cooldown:{owner_id}:{event_type}:{vehicle_id or '-'}"
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_cooldown_index():
+    """The process-wide cooldown index, configured from settings"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = CooldownIndex(cache_alias=getattr(settings, 'DETECTION_EVENT_COOLDOWN_CACHE', None))
+        return _index
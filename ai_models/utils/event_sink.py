@@ -0,0 +1,147 @@
+import atexit
+import threading
+import time
+from queue import Queue, Empty, Full
+from django.conf import settings
+from django.db import close_old_connections
+from ai_models.models import DetectionEvent
+from ai_models.utils.cooldown_index import get_cooldown_index
+
+
+class DetectionEventSink:
+    """
+    Takes detection events off the inference hot path. The cooldown is checked
+    in memory (see CooldownIndex) and only events that pass it are queued; a
+    background thread drains the queue and writes each batch with a single
+    bulk_create. When the queue is full new events are dropped (and counted)
+    rather than blocking the detector.
+    """
+
+    def __init__(self, maxsize=1000, batch_size=100, flush_interval=1.0, cooldowns=None):
+        self.cooldowns = cooldowns or get_cooldown_index()
+        self.queue = Queue(maxsize=maxsize)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.thread = None
+        self.lock = threading.Lock()
+
+        # Stats
+        self.enqueued = 0
+        self.dropped = 0
+        self.suppressed = 0
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self.high_water = 0
+
+    def submit(self, vehicle, owner, event_type, description=""):
+        """Queue an event for saving. Returns False if it is in its cooldown or the queue is full."""
+        vehicle_id = vehicle.pk if vehicle else None
+        if not self.cooldowns.acquire(owner.pk, event_type, vehicle_id):
+            self.suppressed += 1
+            return False
+
+        self._ensure_started()
+        try:
+            self.queue.put_nowait({
+                'vehicle': vehicle,
+                'owner': owner,
+                'event_type': event_type,
+                'description': description,
+            })
+        except Full:
+            self.cooldowns.release(owner.pk, event_type, vehicle_id)
+            self.dropped += 1
+            print(f"Dropping {event_type} event - event queue is full")
+            return False
+        self.enqueued += 1
+        self.high_water = max(self.high_water, self.queue.qsize())
+        return True
+
+    def flush(self, timeout=None):
+        """Block until every queued event has been written (or the timeout passes)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def stats(self):
+        return {
+            'queue_depth': self.queue.qsize(),
+            'queue_capacity': self.queue.maxsize,
+            'high_water': self.high_water,
+            'enqueued': self.enqueued,
+            'dropped': self.dropped,
+            'suppressed_by_cooldown': self.suppressed,
+            'written': self.written,
+            'batches': self.batches,
+            'failed': self.failed,
+            'cooldowns': self.cooldowns.stats(),
+        }
+
+    def _ensure_started(self):
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="DetectionEventSink", daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Empty:
+                    break
+
+            try:
+                self._write(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                print(f"Error saving detection events: {str(e)}")
+                # Let the next detection retry instead of staying silent for the whole cooldown
+                for event in batch:
+                    self.cooldowns.release(event['owner'].pk, event['event_type'], event['vehicle'].pk if event['vehicle'] else None)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _write(self, batch):
+        close_old_connections()
+        DetectionEvent.objects.bulk_create([
+            DetectionEvent(
+                vehicle=event['vehicle'],
+                event_type=event['event_type'],
+                description=event['description'],
+                owner=event['owner']
+            )
+            for event in batch
+        ])
+        self.written += len(batch)
+        self.batches += 1
+        print(f"Saved {len(batch)} detection events")
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def get_event_sink():
+    """The process-wide sink, configured from settings"""
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = DetectionEventSink(
+                maxsize=getattr(settings, 'DETECTION_EVENT_QUEUE_SIZE', 1000),
+                batch_size=getattr(settings, 'DETECTION_EVENT_BATCH_SIZE', 100),
+                flush_interval=getattr(settings, 'DETECTION_EVENT_FLUSH_INTERVAL', 1.0),
+            )
+            # Don't lose queued events on a clean shutdown
+            atexit.register(_sink.flush, 5)
+        return _sink
@@ -1,6 +1,6 @@
-from datetime import timedelta
-from django.utils import timezone
 from ai_models.models import DetectionEvent, Vehicle
+from ai_models.utils.event_sink import get_event_sink
+from ai_models.utils.cooldown_index import EVENT_SAVE_COOLDOWN
 from ai_models.utils.supabase_upload import uploadFileToSupabase, getSupabaseFilePath
 
 from rest_framework import status
@@ -10,8 +10,6 @@ import numpy as np
 from io import BytesIO
 
 
-EVENT_SAVE_COOLDOWN = timedelta(minutes=5)  # 5 min cooldown
-
 def get_image_extension_and_data(frame, format='jpeg'):
     # Encode the frame as an image (in the specified format)
     if format == 'jpeg':
@@ -28,16 +26,11 @@ def get_image_extension_and_data(frame, format='jpeg'):
     return img_bytes, format
 
 def save_detection_event(vehicle, owner, event_type, description="", video_frame=None):
-    # Check if a similar event was created recently
-    recent_event = DetectionEvent.objects.filter(
-        owner=owner,
-        event_type=event_type,
-        timestamp__gte=timezone.now() - EVENT_SAVE_COOLDOWN
-    ).first()
-
-    if recent_event:
-        print(f"Skipping {event_type} event - cooldown period active")
-        return
+    # The cooldown is answered from memory and the INSERT happens on the
+    # background sink in batches, so the detector loop never waits on the database.
+    # Frames are not queued (they aren't uploaded yet, see the commented-out
+    # upload below), which keeps the bounded queue small.
+    return get_event_sink().submit(vehicle=vehicle, owner=owner, event_type=event_type, description=description)
 
     # Get the image data (NumPy array) and extension
     # img_bytes, file_ext = get_image_extension_and_data(video_frame, format='jpeg')
@@ -56,12 +49,3 @@ def save_detection_event(vehicle, owner, event_type, description="", video_frame
     # # After uploading, get the file path from Supabase
     # file_path = getSupabaseFilePath(file_name, 'detection_images')
     # print(file_path)
-
-    # Create and save the DetectionEvent
-    DetectionEvent.objects.create(
-        vehicle=vehicle,
-        event_type=event_type,
-        description=description,
-        owner=owner
-    )
-    print(f"Saved new {event_type}")
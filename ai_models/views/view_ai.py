@@ -2,17 +2,21 @@
 
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework import status
 from django.http import StreamingHttpResponse
 from ai_models.models import Video, Vehicle
-from ai_models.ai.car_tracking.predict import track_vehicle_realtime, initialize_tracking_with_buffer
+from ai_models.ai.car_tracking.predict import track_vehicle_realtime, initialize_tracking_with_buffer, VehicleTrackingSession
 from ai_models.ai.fire_smoke_detection.predict import detect_fire_smoke
 from ai_models.ai.authorized_person_detection.predict import run_recognition
+from ai_models.ai.combined_detection.predict import start_video_detectors
+from ai_models.ai.pipeline.events import get_shared_event_stream
+from ai_models.ai.pipeline.zones import load_zone_mask
+from ai_models.ai.model_registry import get_registry_stats
+from ai_models.ai.pipeline.executor import get_executor_stats
+from ai_models.ai.pipeline.scheduler import get_stream_scheduler
+from ai_models.utils.event_sink import get_event_sink
 # from ai_models.ai.intrusion_detection.predict import detect_intrusion
-import threading
-from queue import Queue
-from concurrent.futures import ThreadPoolExecutor
-import cv2
-import time
 
 class VehicleTrackingSSEView(APIView):
     permission_classes = [IsAuthenticated]
@@ -36,10 +40,13 @@ class VehicleTrackingSSEView(APIView):
                 return StreamingHttpResponse(self.event_stream(error="Missing coordinates."), content_type='text/event-stream')
 
             # Start tracking after accumulating a few frames
-            cap, selected_tracking_id, initial_box = initialize_tracking_with_buffer(video_path, vehicle_location_x, vehicle_location_y)
+            cap, session = initialize_tracking_with_buffer(
+                video_path, vehicle_location_x, vehicle_location_y,
+                session=VehicleTrackingSession(zones=load_zone_mask(video))
+            )
 
             response = StreamingHttpResponse(
-                self.event_stream(cap = cap, selected_tracking_id = selected_tracking_id, vehicle = vehicle, owner=user),
+                self.event_stream(cap = cap, session = session, vehicle = vehicle, owner=user),
                 content_type='text/event-stream'
             )
             response['Cache-Control'] = 'no-cache'
@@ -48,13 +55,13 @@ class VehicleTrackingSSEView(APIView):
         except Exception as e:
             return StreamingHttpResponse(self.event_stream(error=str(e)), content_type='text/event-stream')
 
-    def event_stream(self, cap=None, selected_tracking_id=None, error=None, vehicle = None, owner = None):
+    def event_stream(self, cap=None, session=None, error=None, vehicle = None, owner = None):
         if error:
             yield f"event: error\ndata: {error}\n\n"
             return
 
         try:
-            for event in track_vehicle_realtime(cap, selected_tracking_id, vehicle, owner):
+            for event in track_vehicle_realtime(cap, session, vehicle, owner):
                 if event["event"] == "vehicle_moved":
                     yield f"event: vehicle_moved\ndata: {event['message']}\n\n"
         except GeneratorExit:
@@ -79,7 +86,7 @@ class FireSmokeDetectionSSE(APIView):
 
 
             response = StreamingHttpResponse(
-                self.event_stream(video_path=video_path, owner=user),
+                self.event_stream(video_path=video_path, owner=user, zones=load_zone_mask(video)),
                 content_type='text/event-stream'
             )
             response['Cache-Control'] = 'no-cache'
@@ -88,13 +95,13 @@ class FireSmokeDetectionSSE(APIView):
         except Exception as e:
             return StreamingHttpResponse(self.event_stream(error=str(e)), content_type='text/event-stream')
 
-    def event_stream(self, video_path, error=None, owner=None):
+    def event_stream(self, video_path, error=None, owner=None, zones=None):
         if error:
             yield f"event: error\ndata: {error}\n\n"
             return
 
         try:
-            for event in detect_fire_smoke(video_path, owner):
+            for event in detect_fire_smoke(video_path, owner, zones=zones):
                 if event["event"] == "fire_detected":
                     yield f"event: Fire Detected\ndata: {event['message']}\n\n"
                 if event["event"] == "smoke_detected":
@@ -116,7 +123,7 @@ class AuthorizedPersonDetectionSSE(APIView):
             video_path = video.video_url
 
             response = StreamingHttpResponse(
-                self.event_stream(video_path=video_path, owner=user),
+                self.event_stream(video_path=video_path, owner=user, zones=load_zone_mask(video)),
                 content_type='text/event-stream'
             )
             response['Cache-Control'] = 'no-cache'
@@ -125,13 +132,13 @@ class AuthorizedPersonDetectionSSE(APIView):
         except Exception as e:
             return StreamingHttpResponse(self.event_stream(error=str(e)), content_type='text/event-stream')
 
-    def event_stream(self, video_path, error=None, owner=None):
+    def event_stream(self, video_path, error=None, owner=None, zones=None):
         if error:
             yield f"event: error\ndata: {error}\n\n"
             return
 
         try:
-            for event in run_recognition(video_path, owner):
+            for event in run_recognition(video_path, owner, zones=zones):
                 if event["event"] == "authorized":
                     yield f"event: Authorized person detected \ndata: {event['message']}\n\n"
                 elif event["event"] == "unauthorized":
@@ -151,6 +158,12 @@ class CombinedDetectionSSE(APIView):
             if not video:
                 return StreamingHttpResponse(self.event_stream(error="No video found."), content_type='text/event-stream')
 
+            # Live streams are analysed once by the stream scheduler; just subscribe to its results
+            if video.video_type == 'stream':
+                response = StreamingHttpResponse(self.scheduled_event_stream(video), content_type='text/event-stream')
+                response['Cache-Control'] = 'no-cache'
+                return response
+
             video_path = video.video_url
             vehicle_location_x = vehicle.vehicle_location_x if vehicle else None
             vehicle_location_y = vehicle.vehicle_location_y if vehicle else None
@@ -161,7 +174,8 @@ class CombinedDetectionSSE(APIView):
                     vehicle_location_x=vehicle_location_x,
                     vehicle_location_y=vehicle_location_y,
                     vehicle=vehicle,
-                    owner=user
+                    owner=user,
+                    video_id=str(video.id)
                 ),
                 content_type='text/event-stream'
             )
@@ -171,90 +185,78 @@ class CombinedDetectionSSE(APIView):
         except Exception as e:
             return StreamingHttpResponse(self.event_stream(error=str(e)), content_type='text/event-stream')
 
-    def event_stream(self, video_path=None, vehicle_location_x=None, vehicle_location_y=None, error=None, vehicle=None, owner=None):
+    def scheduled_event_stream(self, video):
+        subscription = get_stream_scheduler().subscribe(video)
+        yield from self.relay_events(subscription, subscription.close)
+
+    def event_stream(self, video_path=None, vehicle_location_x=None, vehicle_location_y=None, error=None, vehicle=None, owner=None, video_id=None):
         if error:
             yield f"event: error\ndata: {error}\n\n"
             return
 
+        # Every client watching the same video shares one run of the detectors
+        stream = get_shared_event_stream(
+            video_id or video_path,
+            lambda: start_video_detectors(
+                video_path, vehicle_location_x, vehicle_location_y, vehicle, owner,
+                zones=load_zone_mask(video_id) if video_id else None
+            )
+        )
+        subscription = stream.subscribe()
         try:
-            # Create queues for each model's results
-            car_queue = Queue()
-            fire_queue = Queue()
-            person_queue = Queue()
-
-            # Initialize video capture
-            cap = cv2.VideoCapture(video_path)
-            if not cap.isOpened():
-                yield f"event: error\ndata: Unable to open video stream\n\n"
-                return
-
-            # Initialize car tracking if coordinates are provided
-            selected_tracking_id = None
-            if vehicle_location_x is not None and vehicle_location_y is not None:
-                cap_car, selected_tracking_id, initial_box = initialize_tracking_with_buffer(
-                    video_path, vehicle_location_x, vehicle_location_y
-                )
-                cap_car.release()
-
-            def car_tracking_thread():
-                try:
-                    for event in track_vehicle_realtime(cap, selected_tracking_id, vehicle, owner):
-                        car_queue.put(event)
-                except Exception as e:
-                    car_queue.put({"event": "error", "message": f"Car tracking error: {str(e)}"})
-
-            def fire_smoke_thread():
-                try:
-                    for event in detect_fire_smoke(video_path, owner):
-                        fire_queue.put(event)
-                except Exception as e:
-                    fire_queue.put({"event": "error", "message": f"Fire detection error: {str(e)}"})
-
-            def person_detection_thread():
-                try:
-                    for event in run_recognition(video_path, owner):
-                        person_queue.put(event)
-                except Exception as e:
-                    person_queue.put({"event": "error", "message": f"Person detection error: {str(e)}"})
-
-            # Start all threads
-            with ThreadPoolExecutor(max_workers=3) as executor:
-                if selected_tracking_id:
-                    executor.submit(car_tracking_thread)
-                executor.submit(fire_smoke_thread)
-                executor.submit(person_detection_thread)
-
-                # Process results from all queues
-                while True:
-                    # Check car tracking results
-                    if not car_queue.empty():
-                        event = car_queue.get()
-                        yield f"event: {event['event']}\ndata: {event['message']}\n\n"
-
-                    # Check fire/smoke detection results
-                    if not fire_queue.empty():
-                        event = fire_queue.get()
-                        yield f"event: {event['event']}\ndata: {event['message']}\n\n"
-
-                    # Check person detection results
-                    if not person_queue.empty():
-                        event = person_queue.get()
-                        yield f"event: {event['event']}\ndata: {event['message']}\n\n"
-
-                    # Check if video is still playing
-                    if not cap.isOpened():
-                        break
-
-                    # Small delay to prevent CPU overuse
-                    time.sleep(0.1)
+            stream.start()
+        except ValueError:
+            stream.unsubscribe(subscription)
+            yield f"event: error\ndata: Unable to open video stream\n\n"
+            return
 
+        yield from self.relay_events(subscription, lambda: stream.unsubscribe(subscription))
+
+    def relay_events(self, subscription, close):
+        """Forward events to the client as soon as they are published, until the producers finish"""
+        try:
+            while True:
+                event = subscription.get(timeout=15)
+                if subscription.closed:
+                    break
+                if event is None:
+                    # Keep the connection alive (and notice disconnects) while the camera is quiet
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['event']}\ndata: {event['message']}\n\n"
         except GeneratorExit:
             pass
         finally:
-            if cap:
-                cap.release()
-            cv2.destroyAllWindows()
+            close()
         
+class ModelRegistryStatsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """Load time and memory footprint of every model loaded in this process"""
+        return Response({'models': get_registry_stats()}, status=status.HTTP_200_OK)
+
+class InferenceExecutorStatsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """Queue depth and batching of the shared per-model inference executors"""
+        return Response(get_executor_stats(), status=status.HTTP_200_OK)
+
+class StreamSchedulerStatsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """Per-camera fps and queue depth of the live stream scheduler"""
+        return Response(get_stream_scheduler().stats(), status=status.HTTP_200_OK)
+
+class DetectionEventSinkStatsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """Queue depth and backpressure counters of the background event writer"""
+        return Response(get_event_sink().stats(), status=status.HTTP_200_OK)
+
 # class IntrusionDetectionSSE(APIView):
 #     permission_classes = [IsAuthenticated]
 
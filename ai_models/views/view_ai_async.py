@@ -0,0 +1,180 @@
+# Async variants of the detection SSE views, served through smart_cctv_surveillance/asgi.py.
+# An open stream only holds an asyncio subscription; inference runs on the shared per-model executors.
+
+import threading
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import StreamingHttpResponse, JsonResponse
+from django.views import View
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from ai_models.models import Video, Vehicle
+from ai_models.ai.combined_detection.predict import start_video_detectors
+from ai_models.ai.pipeline.zones import load_zone_mask
+from ai_models.ai.pipeline.events import get_shared_event_stream, StreamLimitReached
+from ai_models.ai.pipeline.scheduler import get_stream_scheduler
+
+# Each video whose detectors are running takes one slot for as long as they run, so the
+# number of concurrent pipelines is bounded no matter how many clients are connected.
+# Clients of a video that is already running share its slot; once all are taken new
+# videos get an SSE error instead of waiting. Model calls from every pipeline are
+# batched through the per-model inference executors (see pipeline/executor.py).
+stream_slots = threading.BoundedSemaphore(getattr(settings, 'ASYNC_MAX_STREAMS', 4))
+
+
+async def authenticate(request):
+    """Resolve the JWT bearer token the same way the DRF views do"""
+    try:
+        result = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+def sse_response(stream):
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def off_loop(func):
+    """
+    Run blocking ORM work on a worker thread of its own, so a slow camera does not hold
+    up the single thread-sensitive executor; that thread's connection is closed after.
+    """
+    def call(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(call, thread_sensitive=False)
+
+
+async def error_stream(error):
+    yield f"event: error\ndata: {error}\n\n"
+
+
+class AsyncDetectionSSE(View):
+    """
+    Base class for the async SSE views. Subclasses choose which detectors to run
+    and how their events are written; clients watching the same video share a
+    single run of the detectors.
+    """
+    detectors = ()
+    needs_vehicle = False
+
+    async def get(self, request, *args, **kwargs):
+        user = await authenticate(request)
+        if user is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+        try:
+            video = await Video.objects.filter(owner=user).alast()
+            vehicle = await Vehicle.objects.filter(owner=user).alast()
+
+            if not video:
+                return sse_response(error_stream("No video found."))
+
+            vehicle_location_x = vehicle.vehicle_location_x if vehicle else None
+            vehicle_location_y = vehicle.vehicle_location_y if vehicle else None
+            if self.needs_vehicle and (vehicle_location_x is None or vehicle_location_y is None):
+                return sse_response(error_stream("Missing coordinates."))
+
+            return sse_response(self.event_stream(video, vehicle, user))
+
+        except Exception as e:
+            return sse_response(error_stream(str(e)))
+
+    async def subscribe(self, video, vehicle, owner):
+        """Returns (subscription, close) for the video's event stream"""
+        stream = get_shared_event_stream(
+            f"{self.__class__.__name__}:{video.id}",
+            lambda: start_video_detectors(
+                video.video_url,
+                vehicle.vehicle_location_x if vehicle else None,
+                vehicle.vehicle_location_y if vehicle else None,
+                vehicle, owner, detectors=self.detectors,
+                zones=load_zone_mask(video), video_type=video.video_type
+            ),
+            slots=stream_slots
+        )
+        subscription = stream.subscribe_async()
+        try:
+            # Opening the source blocks, so keep it off the event loop
+            await off_loop(stream.start)()
+        except Exception:
+            stream.unsubscribe(subscription)
+            raise
+        return subscription, lambda: stream.unsubscribe(subscription)
+
+    async def event_stream(self, video, vehicle, owner):
+        try:
+            subscription, close = await self.subscribe(video, vehicle, owner)
+        except ValueError:
+            yield "event: error\ndata: Unable to open video stream\n\n"
+            return
+        except StreamLimitReached:
+            yield "event: error\ndata: Too many active streams, try again later\n\n"
+            return
+
+        try:
+            while True:
+                event = await subscription.get(timeout=15)
+                if subscription.closed:
+                    break
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                message = self.format_event(event)
+                if message:
+                    yield message
+        finally:
+            close()
+
+    def format_event(self, event):
+        return f"event: {event['event']}\ndata: {event['message']}\n\n"
+
+
+class AsyncVehicleTrackingSSE(AsyncDetectionSSE):
+    detectors = ('car',)
+    needs_vehicle = True
+
+    def format_event(self, event):
+        if event["event"] == "vehicle_moved":
+            return f"event: vehicle_moved\ndata: {event['message']}\n\n"
+        return None
+
+
+class AsyncFireSmokeDetectionSSE(AsyncDetectionSSE):
+    detectors = ('fire',)
+
+    def format_event(self, event):
+        if event["event"] == "fire_detected":
+            return f"event: Fire Detected\ndata: {event['message']}\n\n"
+        if event["event"] == "smoke_detected":
+            return f"event: Smoke Detected\ndata: {event['message']}\n\n"
+        return None
+
+
+class AsyncAuthorizedPersonDetectionSSE(AsyncDetectionSSE):
+    detectors = ('person',)
+
+    def format_event(self, event):
+        if event["event"] == "authorized":
+            return f"event: Authorized person detected \ndata: {event['message']}\n\n"
+        if event["event"] == "unauthorized":
+            return f"event: Unknown person detected\ndata: {event['message']}\n\n"
+        return None
+
+
+class AsyncCombinedDetectionSSE(AsyncDetectionSSE):
+    detectors = ('car', 'fire', 'person')
+
+    async def subscribe(self, video, vehicle, owner):
+        # Live streams are analysed once by the stream scheduler; just subscribe to its results
+        if video.video_type == 'stream':
+            channel = await off_loop(get_stream_scheduler().channel_for)(video)
+            subscription = channel.subscribe_async()
+            return subscription, subscription.close
+        return await super().subscribe(video, vehicle, owner)
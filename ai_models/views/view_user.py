@@ -12,8 +12,11 @@ from rest_framework.parsers import MultiPartParser, FormParser
 import cv2
 import torch
 import numpy as np
-from facenet_pytorch import InceptionResnetV1
-from ultralytics import YOLO
+from ai_models.ai.model_registry import get_facenet_model, get_yolo_model, inference_lock, get_device, FACE_DETECTION_WEIGHTS
+from ai_models.ai.authorized_person_detection.embedding_store import embedding_fields
+from ai_models.ai.authorized_person_detection.enrollment import BulkEnroller, images_from_request
+from ai_models.ai.authorized_person_detection.gallery_cache import gallery_cache
+from django.conf import settings
 from rest_framework.pagination import PageNumberPagination
 
 User = get_user_model()
@@ -102,10 +105,10 @@ class GenerateFacialEmbedding(APIView):
             if 'image' not in request.FILES:
                 return Response({'error': 'No image provided'}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Initialize models
-            device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-            facenet = InceptionResnetV1(pretrained='vggface2').eval().to(device)
-            model = YOLO('ai_models/ai/authorized_person_detection/face_detection.pt')
+            # Models are loaded once per process and shared with the detection pipelines
+            device = torch.device(get_device())
+            facenet = get_facenet_model()
+            model = get_yolo_model(FACE_DETECTION_WEIGHTS)
 
             # Read and process image
             image_file = request.FILES['image']
@@ -116,7 +119,8 @@ class GenerateFacialEmbedding(APIView):
                 return Response({'error': 'Could not read image'}, status=status.HTTP_400_BAD_REQUEST)
 
             # Detect face
-            results = model(img)
+            with inference_lock(model):
+                results = model(img)
             face_detected = False
             face_embedding = None
 
@@ -138,7 +142,7 @@ class GenerateFacialEmbedding(APIView):
                     # Generate embedding
                     with torch.no_grad():
                         embedding = facenet(face_tensor)
-                        face_embedding = embedding.cpu().numpy().tolist()
+                        face_embedding = embedding.cpu().numpy()
                         face_detected = True
                         break
                 if face_detected:
@@ -150,7 +154,7 @@ class GenerateFacialEmbedding(APIView):
             # Save embedding to database
             embedding_obj = FacialEmbedding.objects.create(
                 user=request.user,
-                embedding_vector=face_embedding
+                **embedding_fields(face_embedding)
             )
 
             return Response({
@@ -162,6 +166,55 @@ class GenerateFacialEmbedding(APIView):
             print(f"Error generating embedding: {str(e)}")
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class BulkFacialEmbedding(APIView):
+    permission_classes = [IsAuthenticated]
+    parser_classes = (MultiPartParser, FormParser)
+
+    def post(self, request):
+        """
+        Enroll faces from many images in one request. Send them as repeated 'images'
+        files and/or as 'archive' zip files. The best usable face of every image is
+        embedded; similar faces are averaged into one stored embedding per cluster.
+        """
+        try:
+            try:
+                images = images_from_request(request.FILES, getattr(settings, 'BULK_ENROLLMENT_MAX_IMAGES', 500))
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            if not images:
+                return Response({'error': 'No images provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+            outcomes, embeddings = BulkEnroller().enroll(images)
+            if not len(embeddings):
+                return Response({
+                    'error': 'No usable face found in any image',
+                    'images': outcomes
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            # Save every cluster's embedding with a single INSERT
+            embedding_objs = FacialEmbedding.objects.bulk_create([
+                FacialEmbedding(user=request.user, **embedding_fields(embedding))
+                for embedding in embeddings
+            ])
+
+            # bulk_create doesn't send post_save, so refresh the owner's gallery here
+            gallery_cache.invalidate(request.user.pk)
+
+            for outcome in outcomes:
+                if 'cluster' in outcome:
+                    outcome['embedding_id'] = str(embedding_objs[outcome.pop('cluster')].id)
+
+            return Response({
+                'message': f"Enrolled {len(embedding_objs)} faces from {sum(o['status'] == 'enrolled' for o in outcomes)} of {len(outcomes)} images",
+                'embedding_ids': [str(obj.id) for obj in embedding_objs],
+                'images': outcomes
+            }, status=status.HTTP_201_CREATED)
+
+        except Exception as e:
+            print(f"Error enrolling faces: {str(e)}")
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 class DetectionHistoryView(APIView):
     permission_classes = [IsAuthenticated]
     
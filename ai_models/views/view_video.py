@@ -9,9 +9,9 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 
-from ai_models.serializers.serializer_video import VideoUploadSerializer, VideoStreamSerializer
+from ai_models.serializers.serializer_video import VideoUploadSerializer, VideoStreamSerializer, CameraZoneSerializer
 from ai_models.utils.supabase_upload import uploadFileToSupabase, getSupabaseFilePath
-from ai_models.models import Video
+from ai_models.models import Video, CameraZone
 
 
 
@@ -136,6 +136,60 @@ class FrameExtractView(APIView):
         
         except Exception as err:
             print(err)
-            return Response({'error' : err}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)    
+            return Response({'error' : err}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class CameraZoneListView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, video_id):
+        """List the zones configured for one of the user's videos"""
+        try:
+            if not Video.objects.filter(id=video_id, owner=request.user).exists():
+                return Response({"error": "Video not found."}, status=status.HTTP_404_NOT_FOUND)
+
+            zones = CameraZone.objects.filter(video_id=video_id).order_by('created_at')
+            return Response({"zones": CameraZoneSerializer(zones, many=True).data}, status=status.HTTP_200_OK)
+
+        except Exception as err:
+            print(err)
+            return Response({'error': str(err)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def post(self, request, video_id):
+        """Add a zone (a polygon in frame pixels); detectors on this video only look inside its zones"""
+        try:
+            try:
+                video = Video.objects.get(id=video_id, owner=request.user)
+            except Video.DoesNotExist:
+                return Response({"error": "Video not found."}, status=status.HTTP_404_NOT_FOUND)
+
+            serializer = CameraZoneSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+            zone = serializer.save(video=video)
+            return Response({
+                "message": "Zone added successfully.",
+                "zone": CameraZoneSerializer(zone).data
+            }, status=status.HTTP_201_CREATED)
+
+        except Exception as err:
+            print(err)
+            return Response({'error': str(err)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+
+class CameraZoneDetailView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def delete(self, request, video_id, zone_id):
+        """Delete a zone"""
+        try:
+            deleted, _ = CameraZone.objects.filter(id=zone_id, video_id=video_id, video__owner=request.user).delete()
+            if not deleted:
+                return Response({"error": "Zone not found."}, status=status.HTTP_404_NOT_FOUND)
+            return Response({"message": "Zone deleted successfully."}, status=status.HTTP_200_OK)
+
+        except Exception as err:
+            print(err)
+            return Response({'error': str(err)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
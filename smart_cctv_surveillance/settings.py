@@ -95,6 +95,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'smart_cctv_surveillance.wsgi.application'
+ASGI_APPLICATION = 'smart_cctv_surveillance.asgi.application'
 
 
 # Database
@@ -119,6 +120,59 @@ DATABASES = {
 }
 
 
+# Live stream analysis
+# Every registered stream is analysed by one scheduler per process; SSE views subscribe to its results
+
+STREAM_SCHEDULER_WORKERS = int(os.getenv("STREAM_SCHEDULER_WORKERS", 2))
+STREAM_SCHEDULER_BATCH_SIZE = int(os.getenv("STREAM_SCHEDULER_BATCH_SIZE", 4))
+STREAM_SCHEDULER_SYNC_INTERVAL = int(os.getenv("STREAM_SCHEDULER_SYNC_INTERVAL", 60))
+
+# Detection events are written by a background thread in batches
+DETECTION_EVENT_QUEUE_SIZE = int(os.getenv("DETECTION_EVENT_QUEUE_SIZE", 1000))
+DETECTION_EVENT_BATCH_SIZE = int(os.getenv("DETECTION_EVENT_BATCH_SIZE", 100))
+DETECTION_EVENT_FLUSH_INTERVAL = float(os.getenv("DETECTION_EVENT_FLUSH_INTERVAL", 1.0))
+# Cache alias used to share event cooldowns between processes (in-process only when unset)
+DETECTION_EVENT_COOLDOWN_CACHE = os.getenv("DETECTION_EVENT_COOLDOWN_CACHE") or None
+
+# Most face crops embedded by FaceNet in one forward pass
+FACE_EMBEDDING_BATCH_SIZE = int(os.getenv("FACE_EMBEDDING_BATCH_SIZE", 32))
+# Storage precision of new facial embeddings: float32, or float16 for half the size
+FACE_EMBEDDING_DTYPE = os.getenv("FACE_EMBEDDING_DTYPE", "float32")
+# Most images accepted by one bulk enrollment request
+BULK_ENROLLMENT_MAX_IMAGES = int(os.getenv("BULK_ENROLLMENT_MAX_IMAGES", 500))
+DATA_UPLOAD_MAX_NUMBER_FILES = BULK_ENROLLMENT_MAX_IMAGES
+# Face gallery search: exact, ivf (approximate), or auto to use ivf for large galleries
+FACE_GALLERY_INDEX = os.getenv("FACE_GALLERY_INDEX", "auto")
+FACE_GALLERY_IVF_MIN_SIZE = int(os.getenv("FACE_GALLERY_IVF_MIN_SIZE", 2048))
+FACE_GALLERY_IVF_NPROBE = int(os.getenv("FACE_GALLERY_IVF_NPROBE", 8))
+# Galleries saved by build_face_index are memory-mapped from here at startup
+FACE_GALLERY_INDEX_DIR = os.getenv("FACE_GALLERY_INDEX_DIR") or None
+
+# Skip (or only occasionally run) detectors while a camera shows a static scene
+MOTION_GATING = os.getenv("MOTION_GATING", "true").lower() == "true"
+
+# Skip frames in proportion to measured detector latency so loops stay at the live edge
+ADAPTIVE_SAMPLING = os.getenv("ADAPTIVE_SAMPLING", "true").lower() == "true"
+ADAPTIVE_SAMPLING_MAX_STRIDE = int(os.getenv("ADAPTIVE_SAMPLING_MAX_STRIDE", 15))
+
+# Fire/smoke alerts once a region is detected on REQUIRED of the last WINDOW analysed frames;
+# while nothing is being confirmed, fire/smoke only runs on every QUIET_STRIDE-th frame
+FIRE_CONFIRM_WINDOW = int(os.getenv("FIRE_CONFIRM_WINDOW", 8))
+FIRE_CONFIRM_REQUIRED = int(os.getenv("FIRE_CONFIRM_REQUIRED", 4))
+FIRE_QUIET_STRIDE = int(os.getenv("FIRE_QUIET_STRIDE", 5))
+
+# Re-run fire/smoke at full resolution on up to MAX_CROPS crops around weak candidates, so small
+# distant plumes on high-resolution cameras are not lost to the 640px full-frame pass
+FIRE_SMOKE_ROI = os.getenv("FIRE_SMOKE_ROI", "true").lower() == "true"
+FIRE_SMOKE_ROI_MAX_CROPS = int(os.getenv("FIRE_SMOKE_ROI_MAX_CROPS", 4))
+
+# Run the intrusion (loitering near a vehicle) detector as part of combined detection
+INTRUSION_DETECTION = os.getenv("INTRUSION_DETECTION", "true").lower() == "true"
+
+# Videos the async (ASGI) SSE views run detectors for at once; further videos get an SSE error
+ASYNC_MAX_STREAMS = int(os.getenv("ASYNC_MAX_STREAMS", 4))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 